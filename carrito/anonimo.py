@@ -0,0 +1,142 @@
+import json
+from decimal import Decimal
+
+from django.core import signing
+from django.db import transaction
+
+from productos.models import Producto
+
+from .models import Carrito, ItemCarrito
+from .resumen import invalidar_resumen
+
+# Bolsa de los visitantes sin cuenta: {producto_id: cantidad} en una cookie
+# firmada, sin sesión ni filas en la base de datos. Al iniciar sesión se pasa
+# al Carrito del usuario (ver fusionar_bolsa y carrito/signals.py), así las
+# escrituras crecen con los compradores y no con las visitas.
+
+COOKIE_BOLSA = 'lumora_bolsa'
+SAL_BOLSA = 'carrito.bolsa'
+DURACION_BOLSA = 60 * 60 * 24 * 14
+# La cookie debe caber holgada en los 4 KB que admite el navegador
+MAXIMO_LINEAS = 30
+
+
+class BolsaLlena(Exception):
+    pass
+
+
+class BolsaAnonima:
+
+    def __init__(self, lineas=None):
+        self.lineas = dict(lineas or {})
+        self.modificada = False
+
+    @classmethod
+    def de_peticion(cls, request):
+        """Lee la cookie; una firma inválida, vencida o un contenido raro es una bolsa vacía."""
+        try:
+            datos = json.loads(request.get_signed_cookie(COOKIE_BOLSA, salt=SAL_BOLSA, max_age=DURACION_BOLSA))
+            lineas = {int(producto_id): int(cantidad) for producto_id, cantidad in datos.items()}
+        except (KeyError, signing.BadSignature, ValueError, TypeError, AttributeError):
+            return cls()
+        return cls({producto_id: cantidad for producto_id, cantidad in lineas.items() if cantidad > 0})
+
+    def __len__(self):
+        return len(self.lineas)
+
+    def fijar(self, producto_id, cantidad):
+        """Fija la cantidad de un producto; con 0 lo quita."""
+        if cantidad > 0:
+            if producto_id not in self.lineas and len(self.lineas) >= MAXIMO_LINEAS:
+                raise BolsaLlena(f"Tu bolsa admite hasta {MAXIMO_LINEAS} joyas distintas. Inicia sesión para agregar más.")
+            self.lineas[producto_id] = cantidad
+        else:
+            self.lineas.pop(producto_id, None)
+        self.modificada = True
+
+    def vaciar(self):
+        self.lineas = {}
+        self.modificada = True
+
+    def items(self):
+        """
+        Las líneas como ItemCarrito sin guardar, con su producto en una sola
+        consulta, para reutilizar la plantilla de la bolsa. El id de cada
+        línea es el del producto.
+        """
+        productos = Producto.objects.filter(pk__in=self.lineas, activo=True).order_by('nombre')
+        return [
+            ItemCarrito(pk=producto.pk, producto=producto, cantidad=self.lineas[producto.pk])
+            for producto in productos
+        ]
+
+    def resumen(self):
+        """{'cantidad', 'total'} como resumen_carrito."""
+        if not self.lineas:
+            return {'cantidad': 0, 'total': Decimal('0.00')}
+        return resumir(self.items())
+
+    def guardar(self, respuesta, segura):
+        if not self.modificada:
+            return
+        if self.lineas:
+            respuesta.set_signed_cookie(
+                COOKIE_BOLSA, json.dumps(self.lineas, separators=(',', ':')), salt=SAL_BOLSA,
+                max_age=DURACION_BOLSA, httponly=True, samesite='Lax', secure=segura,
+            )
+        else:
+            respuesta.delete_cookie(COOKIE_BOLSA, samesite='Lax')
+
+
+def resumir(items):
+    return {
+        'cantidad': sum(item.cantidad for item in items),
+        'total': sum((item.subtotal for item in items), Decimal('0.00')),
+    }
+
+
+def bolsa_de(request):
+    """La bolsa anónima de la petición, leída una sola vez."""
+    if not hasattr(request, '_bolsa_anonima'):
+        request._bolsa_anonima = BolsaAnonima.de_peticion(request)
+    return request._bolsa_anonima
+
+
+class BolsaAnonimaMiddleware:
+    """Escribe (o borra) la cookie de la bolsa si la petición la modificó."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        respuesta = self.get_response(request)
+        bolsa = getattr(request, '_bolsa_anonima', None)
+        if bolsa is not None:
+            bolsa.guardar(respuesta, request.is_secure())
+        return respuesta
+
+
+def fusionar_bolsa(usuario, lineas):
+    """
+    Pasa las líneas de la bolsa anónima al Carrito del usuario en una
+    transacción: una consulta por las líneas que ya tenía, un bulk_update que
+    les suma las cantidades y un bulk_create con las nuevas. Las líneas
+    llegan sin reserva: verCarrito las ajusta al stock libre.
+    Retorna la cantidad de productos fusionados.
+    """
+    productos = set(Producto.objects.filter(pk__in=lineas, activo=True).values_list('pk', flat=True))
+    if not productos:
+        return 0
+    with transaction.atomic():
+        carrito, _ = Carrito.objects.get_or_create(usuario=usuario)
+        existentes = list(carrito.items.filter(producto_id__in=productos).select_for_update())
+        for item in existentes:
+            item.cantidad += lineas[item.producto_id]
+        ItemCarrito.objects.bulk_update(existentes, ['cantidad'])
+        nuevos = productos - {item.producto_id for item in existentes}
+        ItemCarrito.objects.bulk_create([
+            ItemCarrito(carrito=carrito, producto_id=producto_id, cantidad=lineas[producto_id])
+            for producto_id in sorted(nuevos)
+        ])
+    invalidar_resumen(usuario.pk)
+    return len(productos)
@@ -0,0 +1,14 @@
+from django.utils.functional import SimpleLazyObject
+
+from .anonimo import bolsa_de
+from .resumen import resumen_carrito
+
+
+def carrito(request):
+    """Resumen del carrito para el menú; solo se consulta si la plantilla lo usa."""
+    usuario = getattr(request, 'user', None)
+    if usuario is None:
+        return {}
+    if not usuario.is_authenticated:
+        return {'resumen_carrito': SimpleLazyObject(lambda: bolsa_de(request).resumen())}
+    return {'resumen_carrito': SimpleLazyObject(lambda: resumen_carrito(usuario.pk))}
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from carrito.reservas import liberar_vencidas
+
+
+class Command(BaseCommand):
+    help = 'Devuelve al stock las unidades de las reservas vencidas en las bolsas (pensado para cron, cada minuto)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Líneas por transacción (por defecto 500)')
+
+    def handle(self, *args, **options):
+        total = liberar_vencidas(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'Se liberaron {total} reservas vencidas.'))
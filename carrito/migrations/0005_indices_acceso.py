@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carrito', '0004_remove_carrito_session_key'),
+        ('productos', '0009_indices_acceso'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='itemcarrito',
+            index=models.Index(fields=['carrito', 'producto'], name='item_carrito_carrito_prod_idx'),
+        ),
+    ]
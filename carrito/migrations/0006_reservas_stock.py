@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carrito', '0005_indices_acceso'),
+        ('productos', '0011_compra_conjunta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemcarrito',
+            name='reservado',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='itemcarrito',
+            name='reservado_hasta',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='itemcarrito',
+            index=models.Index(fields=['reservado_hasta'], name='item_carrito_reserva_idx'),
+        ),
+    ]
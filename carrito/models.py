@@ -1,5 +1,9 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import F, Sum
 from django.conf import settings
+from django.utils.functional import cached_property
 from productos.models import Producto
 
 class Carrito(models.Model):
@@ -16,24 +20,71 @@ class Carrito(models.Model):
     def __str__(self):
         return f"Carrito de {self.usuario.username if self.usuario else 'Anónimo'}"
 
+    def lineas(self):
+        """Ítems del carrito con su producto en una sola consulta (JOIN)."""
+        return self.items.con_subtotales().order_by('id')
+
+    @cached_property
+    def totales(self):
+        return self.items.totales()
+
     @property
     def total_pagar(self):
         """Calcula el gran total sumando todos los items."""
-        return sum(item.subtotal for item in self.items.all())
+        return self.totales['total']
 
     @property
     def cantidad_total(self):
         """Cuenta el total de joyas en el carrito."""
-        return sum(item.cantidad for item in self.items.all())
+        return self.totales['cantidad']
+
+class ItemCarritoQuerySet(models.QuerySet):
+    """Subtotales y totales calculados por la base de datos, no ítem por ítem en Python."""
+
+    def con_subtotales(self):
+        return self.select_related('producto').annotate(importe=F('cantidad') * F('producto__precio_final'))
+
+    def totales(self):
+        """{'cantidad', 'total'} de los ítems en un solo agregado."""
+        resultado = self.aggregate(
+            unidades=Sum('cantidad'),
+            importe=Sum(F('cantidad') * F('producto__precio_final')),
+        )
+        return {
+            'cantidad': resultado['unidades'] or 0,
+            'total': resultado['importe'] or Decimal('0.00'),
+        }
 
 class ItemCarrito(models.Model):
     carrito = models.ForeignKey(Carrito, on_delete=models.CASCADE, related_name='items')
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
     cantidad = models.PositiveIntegerField(default=1)
+    # Unidades ya descontadas de producto.stock para esta línea y hasta cuándo
+    # se retienen (ver carrito/reservas.py)
+    reservado = models.PositiveIntegerField(default=0)
+    reservado_hasta = models.DateTimeField(null=True, blank=True)
+
+    objects = ItemCarritoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # get_or_create(carrito, producto) al agregar a la bolsa
+            models.Index(fields=['carrito', 'producto'], name='item_carrito_carrito_prod_idx'),
+            # Búsqueda de reservas vencidas (liberar_reservas)
+            models.Index(fields=['reservado_hasta'], name='item_carrito_reserva_idx'),
+        ]
+
+    @property
+    def disponible(self):
+        """Máximo de unidades que puede tener la línea: el stock libre más lo que ya retiene."""
+        return self.producto.stock + self.reservado
 
     @property
     def subtotal(self):
         """Multiplica la cantidad por el precio final del producto."""
+        if hasattr(self, 'importe'):
+            # Ya calculado en la consulta (ver ItemCarritoQuerySet.con_subtotales)
+            return self.importe
         return self.producto.precio_final * self.cantidad
 
     def __str__(self):
@@ -0,0 +1,158 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from productos.models import Producto
+
+from .models import ItemCarrito
+
+# Reservas de stock por línea de la bolsa. producto.stock son las unidades
+# libres: al agregar a la bolsa se descuentan con un UPDATE condicional
+# (... WHERE stock >= n), nunca comparando en Python, así dos compradores no
+# pueden llevarse la última pieza. La reserva vence tras DURACION_RESERVA sin
+# actividad en la línea y liberar_reservas devuelve esas unidades al stock.
+# Los UPDATE de stock pasan por ProductoQuerySet.update, que marca la fecha de
+# los productos y borra solo sus fichas cacheadas: una reserva no vacía las
+# cachés del catálogo ni los resúmenes de las bolsas.
+
+DURACION_RESERVA = timedelta(minutes=15)
+
+
+class StockInsuficiente(Exception):
+
+    def __init__(self, disponible):
+        super().__init__(f'Solo hay {disponible} unidad(es) disponibles')
+        self.disponible = disponible
+
+
+def reservar(item, cantidad):
+    """
+    Fija la cantidad de la línea y la reserva por DURACION_RESERVA; con 0 la
+    línea se elimina. Solo se descuenta (o devuelve) la diferencia con lo que
+    la línea ya retenía. Lanza StockInsuficiente, sin cambiar nada, si no
+    alcanzan las unidades libres.
+    """
+    with transaction.atomic():
+        # Primero la línea y al final el producto, el mismo orden que
+        # liberar_vencidas: la fila del producto (la disputada en una
+        # promoción) queda bloqueada solo por su UPDATE y el COMMIT
+        actual = ItemCarrito.objects.select_for_update().get(pk=item.pk)
+        if not cantidad:
+            # Lo reservado lo devuelve el pre_delete (ver carrito/signals.py)
+            actual.delete()
+            return None
+
+        diferencia = cantidad - actual.reservado
+        if diferencia > 0:
+            if not _descontar(actual.producto_id, diferencia):
+                libres = Producto.objects.filter(pk=actual.producto_id).values_list('stock', flat=True).first() or 0
+                raise StockInsuficiente(libres + actual.reservado)
+        elif diferencia < 0:
+            ajustar_stock(actual.producto_id, -diferencia)
+
+        item.cantidad = item.reservado = cantidad
+        item.reservado_hasta = timezone.now() + DURACION_RESERVA
+        item.save(update_fields=['cantidad', 'reservado', 'reservado_hasta'])
+    return item
+
+
+def _descontar(producto_id, unidades):
+    """UPDATE condicional: True si había al menos ``unidades`` libres y se descontaron."""
+    return bool(
+        Producto.objects.filter(pk=producto_id, stock__gte=unidades).update(stock=F('stock') - unidades)
+    )
+
+
+def ajustar_stock(producto_id, diferencia):
+    """
+    Suma (o resta, sin bajar de cero) unidades libres de forma relativa: una
+    edición del inventario no pisa las reservas hechas mientras tanto.
+    """
+    if diferencia:
+        Producto.objects.filter(pk=producto_id).update(stock=Greatest(F('stock') + diferencia, 0))
+
+
+def fijar_stock(stocks):
+    """
+    {producto_id: unidades libres} en un solo UPDATE, para la importación. Quien
+    llama debe tener bloqueadas las filas (select_for_update) desde que leyó el
+    stock: así ninguna reserva cambia en medio y lo reservado sigue reservado.
+    """
+    if stocks:
+        Producto.objects.filter(pk__in=stocks).update(stock=Case(
+            *[When(pk=producto_id, then=Value(stock)) for producto_id, stock in stocks.items()],
+            output_field=IntegerField(),
+        ))
+
+
+def conciliar_stock(items):
+    """
+    Ajusta en bloque los ítems de ``items`` que superan lo disponible (el
+    stock libre más lo que la línea ya reserva): los agotados se eliminan y
+    cada uno de los demás toma todo lo libre, así su cantidad y su reserva
+    vuelven a coincidir. Una consulta encuentra las líneas, un UPDATE
+    condicional por producto ajustado, un bulk_update y un DELETE, todo en
+    una transacción. Retorna {'ajustados': [...], 'agotados': [...]}.
+    """
+    with transaction.atomic():
+        excedidos = list(
+            items.filter(cantidad__gt=F('producto__stock') + F('reservado'))
+            .select_related('producto')
+            .select_for_update(of=('self',))
+            .order_by('id')
+        )
+        hasta = timezone.now() + DURACION_RESERVA
+        ajustados, agotados = [], []
+        for item in excedidos:
+            libres = item.producto.stock
+            if libres > 0 and not _descontar(item.producto_id, libres):
+                # Otro comprador se llevó unidades entretanto: queda lo que ya tenía
+                libres = 0
+            item.producto.stock -= libres
+            item.cantidad = item.reservado = item.reservado + libres
+            item.reservado_hasta = hasta
+            (ajustados if item.cantidad else agotados).append(item)
+
+        if ajustados:
+            ItemCarrito.objects.bulk_update(ajustados, ['cantidad', 'reservado', 'reservado_hasta'])
+        if agotados:
+            ItemCarrito.objects.filter(pk__in=[item.pk for item in agotados]).delete()
+    return {'ajustados': ajustados, 'agotados': agotados}
+
+
+def liberar_vencidas(lote=500, ahora=None):
+    """
+    Devuelve al stock las unidades de las reservas vencidas. Por cada lote: un
+    UPDATE deja las líneas sin reserva (conservan su cantidad) y otro suma las
+    unidades a sus productos (CASE por producto). Las líneas bloqueadas en ese
+    momento se saltan: su dueño las está modificando y renovando.
+    Retorna la cantidad de líneas liberadas.
+    """
+    ahora = ahora or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            vencidas = list(
+                ItemCarrito.objects.filter(reservado__gt=0, reservado_hasta__lt=ahora)
+                .select_for_update(skip_locked=True)
+                .order_by('id')
+                .values_list('id', 'producto_id', 'reservado')[:lote]
+            )
+            if not vencidas:
+                return total
+
+            unidades = Counter()
+            for _id, producto_id, reservado in vencidas:
+                unidades[producto_id] += reservado
+            ItemCarrito.objects.filter(pk__in=[fila[0] for fila in vencidas]).update(
+                reservado=0, reservado_hasta=None,
+            )
+            Producto.objects.filter(pk__in=unidades).update(stock=F('stock') + Case(
+                *[When(pk=producto_id, then=Value(cantidad)) for producto_id, cantidad in unidades.items()],
+                output_field=IntegerField(),
+            ))
+        total += len(vencidas)
@@ -0,0 +1,28 @@
+from django.core.cache import cache
+
+from productos.cache import version_catalogo
+
+from .models import ItemCarrito
+
+DURACION_RESUMEN = 60 * 60
+
+
+def clave_resumen(usuario_id):
+    # La versión del catálogo cambia con cada cambio de precio, así el total
+    # nunca queda calculado con precios anteriores. El stock no la cambia: las
+    # reservas de otros compradores no vacían este resumen
+    return f'carrito:resumen:{usuario_id}:{version_catalogo()}'
+
+
+def resumen_carrito(usuario_id):
+    """{'cantidad', 'total'} del carrito del usuario, cacheado y calculado con un solo agregado."""
+    clave = clave_resumen(usuario_id)
+    resumen = cache.get(clave)
+    if resumen is None:
+        resumen = ItemCarrito.objects.filter(carrito__usuario_id=usuario_id).totales()
+        cache.set(clave, resumen, DURACION_RESUMEN)
+    return resumen
+
+
+def invalidar_resumen(usuario_id):
+    cache.delete(clave_resumen(usuario_id))
@@ -0,0 +1,26 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .anonimo import bolsa_de, fusionar_bolsa
+from .models import ItemCarrito
+from .reservas import ajustar_stock
+
+
+@receiver(user_logged_in)
+def fusionar_bolsa_anonima(sender, request, user, **kwargs):
+    # La bolsa que armó como visitante pasa a su carrito y la cookie se borra
+    if request is None:
+        return
+    bolsa = bolsa_de(request)
+    if bolsa:
+        fusionar_bolsa(user, bolsa.lineas)
+        bolsa.vaciar()
+
+
+@receiver(pre_delete, sender=ItemCarrito)
+def liberar_reserva_item(sender, instance, **kwargs):
+    # Cubre también el CASCADE al eliminar el carrito o el usuario: lo que la
+    # línea retenía vuelve al stock libre
+    if instance.reservado:
+        ajustar_stock(instance.producto_id, instance.reservado)
@@ -1,3 +1,296 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from carrito.anonimo import COOKIE_BOLSA
+from carrito.models import Carrito, ItemCarrito
+from carrito.reservas import liberar_vencidas
+from carrito.resumen import invalidar_resumen, resumen_carrito
+from core.explain import escaneos_completos
+from productos.cache import version_catalogo
+from productos.models import Categoria, Producto
+
+
+class PlanesDeConsultaTests(TestCase):
+    """El queryset de verCarrito debe resolverse con índices, sin recorrer la tabla completa."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        productos = [
+            Producto.objects.create(
+                codigo=f'P{i:03}', nombre=f'Anillo {i}', descripcion='Plata 925',
+                precio=Decimal(50000), categoria=categoria, stock=10,
+            )
+            for i in range(10)
+        ]
+        User = get_user_model()
+        for i in range(5):
+            usuario = User.objects.create_user(username=f'cliente{i}', password='x')
+            carrito = Carrito.objects.create(usuario=usuario)
+            ItemCarrito.objects.bulk_create([
+                ItemCarrito(carrito=carrito, producto=producto, cantidad=1) for producto in productos[i:i + 4]
+            ])
+        cls.carrito = carrito
+
+    def test_ver_carrito(self):
+        lineas = self.carrito.lineas()
+        self.assertEqual(escaneos_completos(lineas), [], lineas.explain())
+
+
+class ResumenCarritoTests(TestCase):
+
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        self.producto = Producto.objects.create(
+            codigo='R001', nombre='Anillo', descripcion='Plata 925',
+            precio=Decimal(50000), categoria=categoria, stock=10,
+        )
+        self.usuario = get_user_model().objects.create_user(username='cliente', password='x')
+        self.client.force_login(self.usuario)
+
+    def test_se_invalida_al_modificar_el_carrito(self):
+        self.assertEqual(resumen_carrito(self.usuario.pk)['cantidad'], 0)
+        self.client.post(reverse('carrito:agregar', args=[self.producto.id]), {'cantidad': 3})
+        self.assertEqual(resumen_carrito(self.usuario.pk), {'cantidad': 3, 'total': Decimal(150000)})
+
+        item = ItemCarrito.objects.get()
+        self.client.get(reverse('carrito:eliminar', args=[item.id]))
+        self.assertEqual(resumen_carrito(self.usuario.pk)['cantidad'], 0)
+
+    def test_se_invalida_al_cambiar_el_precio(self):
+        self.client.post(reverse('carrito:agregar', args=[self.producto.id]), {'cantidad': 2})
+        resumen_carrito(self.usuario.pk)
+        self.producto.precio_oferta = Decimal(40000)
+        self.producto.save()
+        self.assertEqual(resumen_carrito(self.usuario.pk)['total'], Decimal(80000))
+
+
+class VerCarritoTests(TestCase):
+
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        self.productos = [
+            Producto.objects.create(
+                codigo=f'V{i:03}', nombre=f'Anillo {i}', descripcion='Plata 925',
+                precio=Decimal(50000), precio_oferta=Decimal(40000) if i % 2 else None,
+                categoria=categoria, stock=10,
+            )
+            for i in range(12)
+        ]
+        self.usuario = get_user_model().objects.create_user(username='cliente', password='x')
+        self.client.force_login(self.usuario)
+
+    def test_sin_carrito_no_escribe(self):
+        respuesta = self.client.get(reverse('carrito:vercarrito'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFalse(Carrito.objects.exists())
+
+    def test_consultas_constantes(self):
+        carrito = Carrito.objects.create(usuario=self.usuario)
+        consultas = []
+        for lineas in (1, 12):
+            ItemCarrito.objects.all().delete()
+            ItemCarrito.objects.bulk_create([
+                ItemCarrito(carrito=carrito, producto=producto, cantidad=2) for producto in self.productos[:lineas]
+            ])
+            invalidar_resumen(self.usuario.pk)
+            with CaptureQueriesContext(connection) as capturadas:
+                self.client.get(reverse('carrito:vercarrito'))
+            consultas.append(len(capturadas))
+        self.assertEqual(consultas[0], consultas[1])
+        self.assertEqual(carrito.totales, {'cantidad': 24, 'total': Decimal(1080000)})
+
+    def test_concilia_el_stock_en_bloque(self):
+        carrito = Carrito.objects.create(usuario=self.usuario)
+        ItemCarrito.objects.bulk_create([
+            ItemCarrito(carrito=carrito, producto=producto, cantidad=5) for producto in self.productos[:6]
+        ])
+        Producto.objects.filter(pk__in=[p.pk for p in self.productos[:2]]).update(stock=0)
+        Producto.objects.filter(pk__in=[p.pk for p in self.productos[2:4]]).update(stock=3)
+
+        with CaptureQueriesContext(connection) as capturadas:
+            respuesta = self.client.get(reverse('carrito:vercarrito'))
+        escrituras = [c['sql'] for c in capturadas.captured_queries if c['sql'].startswith(('UPDATE', 'DELETE'))]
+
+        # Un UPDATE condicional por producto ajustado, el bulk_update y el DELETE
+        self.assertEqual(len(escrituras), 4)
+        self.assertEqual(len(respuesta.context['items']), 4)
+        self.assertEqual(
+            sorted(ItemCarrito.objects.values_list('cantidad', flat=True)), [3, 3, 5, 5],
+        )
+        # Las líneas recortadas reservan lo que les quedó
+        self.assertEqual(
+            sorted(ItemCarrito.objects.filter(cantidad=3).values_list('reservado', 'producto__stock')), [(3, 0), (3, 0)],
+        )
+        self.assertEqual(respuesta.context['resumen']['cantidad'], 16)
+
+
+class ReservasTests(TestCase):
+
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        self.producto = Producto.objects.create(
+            codigo='S001', nombre='Anillo', descripcion='Plata 925',
+            precio=Decimal(50000), categoria=categoria, stock=4,
+        )
+        User = get_user_model()
+        self.clientes = [User.objects.create_user(username=f'cliente{i}', password='x') for i in range(2)]
+
+    def agregar(self, usuario, cantidad):
+        self.client.force_login(usuario)
+        return self.client.post(reverse('carrito:agregar', args=[self.producto.id]), {'cantidad': cantidad})
+
+    def stock(self):
+        return Producto.objects.values_list('stock', flat=True).get(pk=self.producto.pk)
+
+    def test_la_reserva_descuenta_el_stock(self):
+        self.agregar(self.clientes[0], 3)
+        self.assertEqual(self.stock(), 1)
+
+        # El segundo cliente no puede llevarse las unidades ya reservadas
+        self.agregar(self.clientes[1], 2)
+        self.assertEqual(self.stock(), 1)
+        self.assertFalse(ItemCarrito.objects.filter(carrito__usuario=self.clientes[1]).exists())
+
+        item = ItemCarrito.objects.get()
+        self.agregar(self.clientes[0], 1)
+        self.assertEqual(self.stock(), 0)
+        self.client.get(reverse('carrito:eliminar', args=[item.id]))
+        self.assertEqual(self.stock(), 4)
+
+    def test_reservar_la_ultima_unidad_actualiza_el_catalogo(self):
+        anonimo = Client()
+        detalle = reverse('productos:productodetalle', args=[self.producto.id])
+        self.assertContains(anonimo.get(detalle), 'Tenemos 4 unidades')
+        self.assertEqual(anonimo.get(detalle)['X-Cache'], 'HIT')
+        self.assertContains(anonimo.get(reverse('productos:catalogo')), '¡SOLO QUEDAN 4!')
+        version = version_catalogo()
+        resumen = resumen_carrito(self.clientes[1].pk)
+
+        self.agregar(self.clientes[0], 4)
+        self.assertEqual(self.stock(), 0)
+
+        # Solo la ficha del producto se recalcula: la tarjeta cambia de clave
+        respuesta = anonimo.get(detalle)
+        self.assertNotEqual(respuesta['X-Cache'], 'HIT')
+        self.assertContains(respuesta, 'PRODUCTO AGOTADO TEMPORALMENTE')
+        self.assertContains(self.client.get(detalle), 'PRODUCTO AGOTADO TEMPORALMENTE')
+        self.assertNotContains(self.client.get(reverse('productos:catalogo')), 'SOLO QUEDAN')
+
+        # El resto de las cachés sigue vigente
+        self.assertEqual(version_catalogo(), version)
+        self.assertEqual(anonimo.get(reverse('productos:catalogo'))['X-Cache'], 'HIT')
+        with self.assertNumQueries(0):
+            self.assertEqual(resumen_carrito(self.clientes[1].pk), resumen)
+
+    def test_eliminar_el_usuario_devuelve_lo_reservado(self):
+        self.agregar(self.clientes[0], 3)
+        self.assertEqual(self.stock(), 1)
+        self.clientes[0].delete()
+        self.assertEqual(self.stock(), 4)
+
+    def test_editar_el_stock_no_pisa_las_reservas(self):
+        administrador = get_user_model().objects.create_user(username='admin', password='x')
+        self.client.force_login(administrador)
+        # El formulario se abrió cuando había 4 libres y el administrador escribe 10
+        datos = {
+            'codigo': 'S001', 'nombre': 'Anillo', 'descripcion': 'Plata 925', 'precio': '50000',
+            'categoria': self.producto.categoria_id, 'activo': 'on', 'stock': 10, 'stock_leido': 4,
+            'imagenes-TOTAL_FORMS': 0, 'imagenes-INITIAL_FORMS': 0,
+        }
+
+        # Mientras el administrador edita, un cliente reserva 3 unidades
+        self.agregar(self.clientes[0], 3)
+        self.client.force_login(administrador)
+        self.client.post(reverse('productos:productosedit', args=[self.producto.id]), datos)
+        self.assertEqual(self.stock(), 7)
+
+    def test_liberar_reservas_vencidas(self):
+        self.agregar(self.clientes[0], 3)
+        self.agregar(self.clientes[1], 1)
+        ItemCarrito.objects.filter(carrito__usuario=self.clientes[0]).update(
+            reservado_hasta=timezone.now() - timedelta(minutes=1),
+        )
+
+        self.assertEqual(liberar_vencidas(), 1)
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(
+            list(ItemCarrito.objects.order_by('id').values_list('cantidad', 'reservado')), [(3, 0), (1, 1)],
+        )
+
+        # La línea sin reserva se reconcilia contra el stock libre al volver a verla
+        Producto.objects.filter(pk=self.producto.pk).update(stock=2)
+        self.client.force_login(self.clientes[0])
+        self.client.get(reverse('carrito:vercarrito'))
+        self.assertEqual(ItemCarrito.objects.get(carrito__usuario=self.clientes[0]).cantidad, 2)
+
+
+class BolsaAnonimaTests(TestCase):
+
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        self.productos = [
+            Producto.objects.create(
+                codigo=f'B{i:03}', nombre=f'Anillo {i}', descripcion='Plata 925',
+                precio=Decimal(50000), categoria=categoria, stock=5,
+            )
+            for i in range(3)
+        ]
+        self.usuario = get_user_model().objects.create_user(username='cliente', password='clave-segura')
+
+    def test_sin_filas_hasta_iniciar_sesion(self):
+        for producto, cantidad in zip(self.productos, (2, 1, 3)):
+            self.client.post(reverse('carrito:agregar', args=[producto.id]), {'cantidad': cantidad})
+        self.assertIn(COOKIE_BOLSA, self.client.cookies)
+        self.assertFalse(ItemCarrito.objects.exists())
+
+        respuesta = self.client.get(reverse('carrito:vercarrito'))
+        self.assertEqual(respuesta.context['resumen'], {'cantidad': 6, 'total': Decimal(300000)})
+
+        # Al iniciar sesión la bolsa se suma a lo que ya tenía en su carrito
+        carrito = Carrito.objects.create(usuario=self.usuario)
+        ItemCarrito.objects.create(carrito=carrito, producto=self.productos[0], cantidad=1)
+        self.client.post(reverse('cuentas:login'), {'username': 'cliente', 'password': 'clave-segura'})
+
+        self.assertEqual(self.client.cookies[COOKIE_BOLSA].value, '')
+        self.assertEqual(
+            dict(ItemCarrito.objects.values_list('producto__codigo', 'cantidad')),
+            {'B000': 3, 'B001': 1, 'B002': 3},
+        )
+        self.assertEqual(resumen_carrito(self.usuario.pk)['cantidad'], 7)
+
+    def test_de_la_pagina_a_la_fusion(self):
+        visitante = Client(enforce_csrf_checks=True)
+        producto = self.productos[0]
+        detalle = reverse('productos:productodetalle', args=[producto.id])
+        agregar = reverse('carrito:agregar', args=[producto.id])
+
+        # La página cacheada trae el formulario sin token ni cookie CSRF
+        pagina = visitante.get(detalle)
+        self.assertContains(pagina, f'action="{agregar}"')
+        self.assertContains(pagina, 'data-csrf-diferido')
+        self.assertNotIn('csrftoken', pagina.cookies)
+        self.assertEqual(visitante.get(detalle)['X-Cache'], 'HIT')
+
+        # Al enviar, el script pide el token y reenvía el formulario
+        token = visitante.get(reverse('carrito:token')).json()['token']
+        self.assertEqual(visitante.post(agregar, {'cantidad': 2}).status_code, 403)
+        visitante.post(agregar, {'cantidad': 2, 'csrfmiddlewaretoken': token})
+        self.assertFalse(ItemCarrito.objects.exists())
+
+        visitante.post(reverse('cuentas:login'), {
+            'username': 'cliente', 'password': 'clave-segura', 'csrfmiddlewaretoken': token,
+        })
+        self.assertEqual(list(ItemCarrito.objects.values_list('producto_id', 'cantidad')), [(producto.id, 2)])
+
+    def test_cookie_alterada(self):
+        self.client.cookies[COOKIE_BOLSA] = '{"1":99}'
+        respuesta = self.client.get(reverse('carrito:vercarrito'))
+        self.assertEqual(respuesta.context['items'], [])
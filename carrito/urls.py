@@ -28,6 +28,7 @@ urlpatterns = [
     path('ver/', views.verCarrito, name='vercarrito'),
     path('eliminar/<int:item_id>/', views.eliminarDelCarrito, name='eliminar'),
     path('actualizar/<int:item_id>/<str:accion>/', views.actualizarCantidad, name='actualizar'),
+    path('token/', views.tokenCsrf, name='token'),
 ]
 
 # Solo para servir archivos multimedia durante el desarrollo
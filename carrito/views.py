@@ -1,10 +1,14 @@
+from django.http import Http404, JsonResponse
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import never_cache
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
 from productos.models import Producto
+from .anonimo import BolsaLlena, bolsa_de, resumir
 from .models import Carrito, ItemCarrito
+from .reservas import StockInsuficiente, conciliar_stock, reservar
+from .resumen import invalidar_resumen, resumen_carrito
 from django.contrib import messages
 
-@login_required
 def agregarAlCarrito(request, producto_id):
     producto = get_object_or_404(Producto, id=producto_id)
     
@@ -21,6 +25,10 @@ def agregarAlCarrito(request, producto_id):
     except ValueError:
         cantidad_solicitada = 1
 
+    # Visitante sin cuenta: su bolsa vive en una cookie firmada (ver carrito/anonimo.py)
+    if not request.user.is_authenticated:
+        return _agregar_a_bolsa_anonima(request, producto, cantidad_solicitada)
+
     # 3. Obtener o crear el carrito
     carrito, created = Carrito.objects.get_or_create(usuario=request.user)
     
@@ -30,71 +38,171 @@ def agregarAlCarrito(request, producto_id):
     cantidad_actual_en_carrito = 0 if item_created else item.cantidad
     cantidad_final_proyectada = cantidad_actual_en_carrito + cantidad_solicitada
 
-    # 5. VALIDACIÓN CRÍTICA: ¿La suma supera el stock real?
-    if cantidad_final_proyectada > producto.stock:
-        # Si ya no puede agregar más, restauramos la cantidad anterior si el item no era nuevo
+    # 5. VALIDACIÓN CRÍTICA: la reserva descuenta el stock con un UPDATE
+    # condicional, así dos compradores no pueden llevarse la última pieza
+    try:
+        reservar(item, cantidad_final_proyectada)
+    except StockInsuficiente as error:
         if item_created:
             item.delete() # No permitimos crear el item si no hay stock suficiente
         
         messages.error(request, 
             f"No puedes agregar {cantidad_solicitada} unidad(es). "
-            f"Solo quedan {producto.stock} en total y ya tienes {cantidad_actual_en_carrito} en tu bolsa."
+            f"Solo quedan {error.disponible} en total y ya tienes {cantidad_actual_en_carrito} en tu bolsa."
         )
         return redirect('productos:productodetalle', id=producto.id)
 
-    # 6. Si pasa todas las validaciones, guardamos
-    item.cantidad = cantidad_final_proyectada
-    item.save()
+    # 6. Reservado y guardado
+    invalidar_resumen(request.user.pk)
     
     messages.success(request, f"¡Añadido! Ahora tienes {item.cantidad} unidad(es) de {producto.nombre} en tu bolsa.")
     return redirect('carrito:vercarrito')
 
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
 from .models import Carrito, ItemCarrito
 from django.contrib import messages
 
-@login_required
 def verCarrito(request):
-    carrito, created = Carrito.objects.get_or_create(usuario=request.user)
+    if not request.user.is_authenticated:
+        return _ver_bolsa_anonima(request)
+
+    # Solo lectura: sin get_or_create, un usuario sin carrito simplemente ve la bolsa vacía
+    items = list(
+        ItemCarrito.objects.filter(carrito__usuario=request.user).con_subtotales().order_by('id')
+    )
+
+    # UX Preventivo: Validamos si el stock cambió mientras el usuario tenía la bolsa abierta.
+    # Las líneas ya traen el stock (JOIN): solo si alguna supera lo disponible se escribe, en bloque
+    if any(item.cantidad > item.disponible for item in items):
+        conciliacion = conciliar_stock(ItemCarrito.objects.filter(carrito__usuario=request.user))
+        ajustados = {item.pk: item for item in conciliacion['ajustados']}
+        agotados = {item.pk for item in conciliacion['agotados']}
+
+        for item in conciliacion['agotados']:
+            messages.warning(request, f"El producto {item.producto.nombre} se agotó y fue removido de tu bolsa.")
+        for item in conciliacion['ajustados']:
+            messages.info(request, f"La cantidad de {item.producto.nombre} se ajustó al stock disponible.")
+
+        items = [item for item in items if item.pk not in agotados]
+        for item in items:
+            if item.pk in ajustados:
+                ajustado = ajustados[item.pk]
+                item.cantidad, item.reservado, item.producto = ajustado.cantidad, ajustado.reservado, ajustado.producto
+                item.importe = item.producto.precio_final * item.cantidad
+        invalidar_resumen(request.user.pk)
+
+    # Cantidad y total en un solo agregado, el mismo (cacheado) que usa el menú
+    return render(request, 'carrito/verCarrito.html', {'items': items, 'resumen': resumen_carrito(request.user.pk)})
+
+def actualizarCantidad(request, item_id, accion):
+    if not request.user.is_authenticated:
+        return _actualizar_bolsa_anonima(request, item_id, accion)
+
+    item = get_object_or_404(ItemCarrito, id=item_id, carrito__usuario=request.user)
     
-    # UX Preventivo: Validamos si el stock cambió mientras el usuario tenía la bolsa abierta
-    for item in carrito.items.all():
-        if item.producto.stock < item.cantidad:
-            if item.producto.stock == 0:
-                item.delete()
+    try:
+        if accion == 'sumar':
+            reservar(item, item.cantidad + 1)
+        elif accion == 'restar':
+            if item.cantidad > 1:
+                reservar(item, item.cantidad - 1)
+            else:
+                reservar(item, 0)
+                messages.info(request, "Producto eliminado de la bolsa.")
+    except StockInsuficiente:
+        messages.error(request, "No hay más unidades disponibles de esta joya.")
+    invalidar_resumen(request.user.pk)
+            
+    return redirect('carrito:vercarrito')
+
+def eliminarDelCarrito(request, item_id):
+    if not request.user.is_authenticated:
+        return _eliminar_de_bolsa_anonima(request, item_id)
+
+    item = get_object_or_404(ItemCarrito, id=item_id, carrito__usuario=request.user)
+    nombre = item.producto.nombre
+    # Devuelve al stock lo que la línea tenía reservado
+    reservar(item, 0)
+    invalidar_resumen(request.user.pk)
+    messages.warning(request, f"{nombre} eliminado de la bolsa.")
+    return redirect('carrito:vercarrito')
+
+#  *************************************************************
+#         BOLSA ANÓNIMA: SIN FILAS EN LA BASE DE DATOS HASTA INICIAR SESIÓN
+#  *************************************************************
+# En la bolsa anónima el id de cada línea es el del producto
+
+def _agregar_a_bolsa_anonima(request, producto, cantidad_solicitada):
+    bolsa = bolsa_de(request)
+    cantidad_actual_en_carrito = bolsa.lineas.get(producto.id, 0)
+    cantidad_final_proyectada = cantidad_actual_en_carrito + cantidad_solicitada
+
+    # Sin reserva: las unidades se reservan al pasar la bolsa al carrito y editarla
+    if cantidad_final_proyectada > producto.stock:
+        messages.error(request, 
+            f"No puedes agregar {cantidad_solicitada} unidad(es). "
+            f"Solo quedan {producto.stock} en total y ya tienes {cantidad_actual_en_carrito} en tu bolsa."
+        )
+        return redirect('productos:productodetalle', id=producto.id)
+    try:
+        bolsa.fijar(producto.id, cantidad_final_proyectada)
+    except BolsaLlena as error:
+        messages.error(request, str(error))
+        return redirect('productos:productodetalle', id=producto.id)
+
+    messages.success(request, f"¡Añadido! Ahora tienes {cantidad_final_proyectada} unidad(es) de {producto.nombre} en tu bolsa.")
+    return redirect('carrito:vercarrito')
+
+def _ver_bolsa_anonima(request):
+    bolsa = bolsa_de(request)
+    items = bolsa.items()
+
+    # Productos que ya no están a la venta
+    for producto_id in set(bolsa.lineas) - {item.producto_id for item in items}:
+        bolsa.fijar(producto_id, 0)
+
+    # Igual que en verCarrito: la bolsa se ajusta al stock actual
+    for item in items:
+        if item.cantidad > item.disponible:
+            if item.disponible <= 0:
                 messages.warning(request, f"El producto {item.producto.nombre} se agotó y fue removido de tu bolsa.")
             else:
-                item.cantidad = item.producto.stock
-                item.save()
                 messages.info(request, f"La cantidad de {item.producto.nombre} se ajustó al stock disponible.")
-                
-    return render(request, 'carrito/verCarrito.html', {'carrito': carrito})
+            item.cantidad = max(item.disponible, 0)
+            bolsa.fijar(item.producto_id, item.cantidad)
+    items = [item for item in items if item.cantidad > 0]
+
+    return render(request, 'carrito/verCarrito.html', {'items': items, 'resumen': resumir(items)})
+
+def _actualizar_bolsa_anonima(request, producto_id, accion):
+    bolsa = bolsa_de(request)
+    if producto_id not in bolsa.lineas:
+        raise Http404
+    producto = get_object_or_404(Producto, id=producto_id)
+    cantidad = bolsa.lineas[producto_id]
 
-@login_required
-def actualizarCantidad(request, item_id, accion):
-    item = get_object_or_404(ItemCarrito, id=item_id, carrito__usuario=request.user)
-    
     if accion == 'sumar':
-        if item.cantidad < item.producto.stock:
-            item.cantidad += 1
-            item.save()
+        if cantidad < producto.stock:
+            bolsa.fijar(producto_id, cantidad + 1)
         else:
             messages.error(request, "No hay más unidades disponibles de esta joya.")
     elif accion == 'restar':
-        if item.cantidad > 1:
-            item.cantidad -= 1
-            item.save()
-        else:
-            item.delete()
+        bolsa.fijar(producto_id, cantidad - 1)
+        if cantidad <= 1:
             messages.info(request, "Producto eliminado de la bolsa.")
-            
     return redirect('carrito:vercarrito')
 
-@login_required
-def eliminarDelCarrito(request, item_id):
-    item = get_object_or_404(ItemCarrito, id=item_id, carrito__usuario=request.user)
-    nombre = item.producto.nombre
-    item.delete()
-    messages.warning(request, f"{nombre} eliminado de la bolsa.")
-    return redirect('carrito:vercarrito')
\ No newline at end of file
+def _eliminar_de_bolsa_anonima(request, producto_id):
+    bolsa = bolsa_de(request)
+    if producto_id not in bolsa.lineas:
+        raise Http404
+    producto = get_object_or_404(Producto, id=producto_id)
+    bolsa.fijar(producto_id, 0)
+    messages.warning(request, f"{producto.nombre} eliminado de la bolsa.")
+    return redirect('carrito:vercarrito')
+
+@never_cache
+def tokenCsrf(request):
+    # Los formularios de las páginas cacheadas para visitantes no llevan token:
+    # se pide aquí al enviarlos (ver core/menu.html), lo que deja la cookie CSRF
+    return JsonResponse({'token': get_token(request)})
@@ -1,3 +1,19 @@
 from django.contrib import admin
+from django.utils import timezone
+
+from .models import Tarea
 
 # Register your models here.
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'nombre', 'estado', 'intentos', 'ejecutar_desde', 'fecha_actualizacion')
+    list_filter = ('estado', 'nombre')
+    search_fields = ('nombre',)
+    readonly_fields = ('fecha_creacion', 'fecha_actualizacion')
+    actions = ['reintentar']
+
+    @admin.action(description='Reintentar las tareas seleccionadas')
+    def reintentar(self, request, queryset):
+        total = queryset.exclude(estado='PRO').update(estado='PEN', intentos=0, ejecutar_desde=timezone.now())
+        self.message_user(request, f'{total} tareas volvieron a la cola.')
@@ -0,0 +1,72 @@
+"""
+Backend MySQL (pymysql) con un pool de conexiones por proceso.
+
+Con CONN_MAX_AGE = 0 Django cierra la conexión al terminar cada petición; en
+este backend "cerrar" la devuelve al pool y la siguiente petición la reutiliza
+sin pagar el handshake ni la autenticación. Se configura con la clave POOL de
+la base de datos (ver joyeria/settings.py):
+
+    'POOL': {'TAMANO': 10, 'ESPERA': 5, 'VIDA_MAXIMA': 1800, 'PING_INACTIVA': 30}
+"""
+import os
+import threading
+
+from django.db.backends.mysql import base
+
+from .pool import PoolAgotado, PoolConexiones
+
+Database = base.Database
+
+# Un pool por alias y por proceso: tras un fork (gunicorn --preload) el hijo
+# no debe reutilizar los sockets del padre
+_pools = {}
+_candado = threading.Lock()
+
+
+def pool_para(alias, configuracion):
+    clave = (alias, os.getpid())
+    with _candado:
+        if clave not in _pools:
+            opciones = configuracion.get('POOL') or {}
+            _pools[clave] = PoolConexiones(
+                ping=lambda conexion: conexion.ping(reconnect=False),
+                cerrar=lambda conexion: conexion.close(),
+                tamano=opciones.get('TAMANO', 10),
+                espera=opciones.get('ESPERA', 5),
+                vida_maxima=opciones.get('VIDA_MAXIMA', 1800),
+                ping_inactiva=opciones.get('PING_INACTIVA', 30),
+            )
+        return _pools[clave]
+
+
+def estadisticas():
+    """{alias: resumen del pool} de este proceso."""
+    pid = os.getpid()
+    return {alias: pool.resumen() for (alias, proceso), pool in list(_pools.items()) if proceso == pid}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def pool(self):
+        return pool_para(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        try:
+            return self.pool.obtener(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        except PoolAgotado as error:
+            raise Database.OperationalError(str(error)) from error
+
+    def _close(self):
+        if self.connection is None:
+            return
+        conexion = self.connection
+        descartar = self.errors_occurred and not self.is_usable()
+        if not descartar and (self.in_atomic_block or not self.get_autocommit()):
+            # Nunca se devuelve una conexión con una transacción a medias
+            try:
+                conexion.rollback()
+                conexion.autocommit(self.settings_dict['AUTOCOMMIT'])
+            except Database.Error:
+                descartar = True
+        self.pool.devolver(conexion, descartar=descartar)
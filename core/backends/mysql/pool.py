@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class PoolAgotado(Exception):
+    pass
+
+
+class PoolConexiones:
+    """
+    Conexiones abiertas reutilizables, con un máximo por proceso. Al
+    prestarse, una conexión que superó ``vida_maxima`` se reemplaza y una que
+    estuvo inactiva más de ``ping_inactiva`` segundos se verifica con ping.
+    Si no hay conexiones libres y ya se alcanzó ``tamano`` se espera hasta
+    ``espera`` segundos a que se devuelva alguna.
+
+    ``ping`` y ``cerrar`` reciben una conexión; ``obtener`` recibe la función
+    que abre una nueva. ``estadisticas`` cuenta préstamos, esperas y fallos.
+    """
+
+    def __init__(self, ping, cerrar, tamano=10, espera=5, vida_maxima=1800, ping_inactiva=30):
+        self.ping = ping
+        self.cerrar = cerrar
+        self.tamano = tamano
+        self.espera = espera
+        self.vida_maxima = vida_maxima
+        self.ping_inactiva = ping_inactiva
+        self.condicion = threading.Condition()
+        # (conexion, creada, devuelta): la última devuelta es la primera en salir,
+        # así las conexiones sobrantes quedan quietas y expiran por vida máxima
+        self.libres = []
+        self.creadas = {}
+        self.abiertas = 0
+        self.estadisticas = Counter()
+        self.tiempo_espera = 0.0
+
+    def obtener(self, conectar):
+        libre = self._reservar()
+        if libre is not None:
+            conexion, creada, devuelta = libre
+            ahora = time.monotonic()
+            if ahora - creada > self.vida_maxima:
+                self._contar('recicladas')
+                self._descartar(conexion)
+            elif ahora - devuelta > self.ping_inactiva and not self._responde(conexion):
+                self._contar('fallos_ping')
+                self._descartar(conexion)
+            else:
+                self._contar('prestamos')
+                self.creadas[id(conexion)] = creada
+                return conexion
+            # El cupo de la conexión descartada se usa para abrir otra
+            with self.condicion:
+                self.abiertas += 1
+
+        try:
+            conexion = conectar()
+        except Exception:
+            self._contar('fallos_conexion')
+            with self.condicion:
+                self.abiertas -= 1
+                self.condicion.notify()
+            raise
+        self._contar('nuevas')
+        self._contar('prestamos')
+        self.creadas[id(conexion)] = time.monotonic()
+        return conexion
+
+    def devolver(self, conexion, descartar=False):
+        creada = self.creadas.pop(id(conexion), 0)
+        if descartar or time.monotonic() - creada > self.vida_maxima:
+            self._contar('descartadas' if descartar else 'recicladas')
+            self._descartar(conexion)
+            return
+        with self.condicion:
+            self.libres.append((conexion, creada, time.monotonic()))
+            self.condicion.notify()
+
+    def cerrar_todas(self):
+        with self.condicion:
+            libres, self.libres = self.libres, []
+        for conexion, _creada, _devuelta in libres:
+            self._descartar(conexion)
+
+    def resumen(self):
+        with self.condicion:
+            return {
+                **self.estadisticas,
+                'abiertas': self.abiertas,
+                'libres': len(self.libres),
+                'tiempo_espera': round(self.tiempo_espera, 3),
+            }
+
+    def _reservar(self):
+        """Retorna una conexión libre o None si hay cupo para abrir una nueva."""
+        limite = time.monotonic() + self.espera
+        inicio_espera = None
+        with self.condicion:
+            while True:
+                if self.libres:
+                    libre = self.libres.pop()
+                    break
+                if self.abiertas < self.tamano:
+                    self.abiertas += 1
+                    libre = None
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self.estadisticas['agotado'] += 1
+                    logger.warning('Pool de conexiones agotado (%s abiertas)', self.abiertas)
+                    raise PoolAgotado(f'No hubo una conexión libre en {self.espera} s')
+                if inicio_espera is None:
+                    inicio_espera = time.monotonic()
+                    self.estadisticas['esperas'] += 1
+                self.condicion.wait(restante)
+            if inicio_espera is not None:
+                self.tiempo_espera += time.monotonic() - inicio_espera
+        return libre
+
+    def _contar(self, nombre):
+        with self.condicion:
+            self.estadisticas[nombre] += 1
+
+    def _responde(self, conexion):
+        try:
+            self.ping(conexion)
+        except Exception:
+            return False
+        return True
+
+    def _descartar(self, conexion):
+        try:
+            self.cerrar(conexion)
+        except Exception:
+            pass
+        with self.condicion:
+            self.abiertas -= 1
+            self.condicion.notify()
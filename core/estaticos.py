@@ -0,0 +1,59 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se generan los .gz
+    brotli = None
+
+# Formatos que se benefician de la compresión; png, jpg, webp y woff2 ya vienen comprimidos
+EXTENSIONES_COMPRIMIBLES = {'.css', '.js', '.mjs', '.svg', '.ico', '.json', '.map', '.txt', '.xml', '.html'}
+
+# Un comprimido que no ahorra al menos un 5 % no vale la pena servirlo
+AHORRO_MINIMO = 0.95
+
+
+class EstaticosComprimidos(ManifestStaticFilesStorage):
+    """
+    Nombres con hash de contenido (app.3f2a9c.css) y, junto a cada archivo
+    comprimible, sus versiones .gz y .br generadas una sola vez en collectstatic.
+    EstaticosPrecomprimidosMiddleware las sirve sin comprimir por petición.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        procesados = super().post_process(paths, dry_run, **options)
+        if dry_run:
+            yield from procesados
+            return
+        for nombre, nombre_hash, procesado in procesados:
+            if not isinstance(procesado, Exception) and nombre_hash:
+                self._comprimir(nombre_hash)
+            yield nombre, nombre_hash, procesado
+
+    def _comprimir(self, nombre):
+        if os.path.splitext(nombre)[1].lower() not in EXTENSIONES_COMPRIMIBLES:
+            return
+        with self.open(nombre) as archivo:
+            contenido = archivo.read()
+
+        variantes = {'.gz': gzip.compress(contenido, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variantes['.br'] = brotli.compress(contenido, quality=11)
+
+        for extension, comprimido in variantes.items():
+            if len(comprimido) >= len(contenido) * AHORRO_MINIMO:
+                continue
+            destino = nombre + extension
+            if self.exists(destino):
+                self.delete(destino)
+            self._save(destino, ContentFile(comprimido))
+
+    def stored_name(self, name):
+        # Sin manifiesto (desarrollo o pruebas, sin collectstatic) se usa el nombre
+        # original; una vez generado el manifiesto, un archivo faltante es un error
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
@@ -0,0 +1,44 @@
+import json
+import re
+
+from django.db import connections
+
+# SQLite: "SCAN producto" sin "USING INDEX" es un recorrido completo de la tabla
+_SQLITE_SCAN = re.compile(r'\bSCAN (\w+)\b(?! USING)')
+# PostgreSQL: "Seq Scan on producto"
+_POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def escaneos_completos(queryset):
+    """
+    Ejecuta EXPLAIN sobre el queryset y retorna la lista de tablas que el plan
+    recorre completas en lugar de usar un índice.
+
+    En MySQL el optimizador prefiere un recorrido completo cuando la tabla es
+    muy pequeña, así que la verificación solo es representativa con un
+    volumen de datos parecido al de producción.
+    """
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'mysql':
+        plan = json.loads(queryset.explain(format='json'))
+        return sorted(set(_tablas_mysql_completas(plan)))
+
+    plan = queryset.explain()
+    if vendor == 'sqlite':
+        return sorted(set(_SQLITE_SCAN.findall(plan)))
+    if vendor == 'postgresql':
+        return sorted(set(_POSTGRES_SCAN.findall(plan)))
+    return []
+
+
+def _tablas_mysql_completas(nodo):
+    # El plan JSON de MySQL anida las tablas en distintos niveles (joins, subconsultas)
+    if isinstance(nodo, dict):
+        if nodo.get('access_type') == 'ALL' and 'table_name' in nodo:
+            yield nodo['table_name']
+        for valor in nodo.values():
+            yield from _tablas_mysql_completas(valor)
+    elif isinstance(nodo, list):
+        for valor in nodo:
+            yield from _tablas_mysql_completas(valor)
@@ -0,0 +1,73 @@
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.media import campos_de_archivo, recorrer_media, referenciados, variantes_referenciadas
+
+
+class Command(BaseCommand):
+    help = 'Elimina (o mueve a cuarentena) los archivos de MEDIA_ROOT que ningún registro referencia'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help='Solo reporta los huérfanos, no toca nada')
+        parser.add_argument('--cuarentena', help='Carpeta a la que se mueven los huérfanos en lugar de borrarlos')
+        parser.add_argument('--lote', type=int, default=1000, help='Rutas verificadas por consulta (por defecto 1000)')
+        parser.add_argument(
+            '--antiguedad', type=int, default=60,
+            help='Ignora archivos modificados hace menos de N minutos: pueden ser subidas en curso (por defecto 60)',
+        )
+
+    def handle(self, *args, **options):
+        raiz = settings.MEDIA_ROOT
+        campos = campos_de_archivo()
+        # Los derivados en uso se leen una vez; lo generado después queda
+        # protegido por --antiguedad
+        self.variantes = variantes_referenciadas(campos)
+        limite = time.time() - options['antiguedad'] * 60
+        self.estadisticas = {'revisados': 0, 'huerfanos': 0, 'bytes': 0}
+        inicio = time.monotonic()
+
+        lote = {}
+        for ruta, tamano, modificado in recorrer_media(raiz):
+            self.estadisticas['revisados'] += 1
+            if modificado > limite:
+                continue
+            lote[ruta] = tamano
+            if len(lote) >= options['lote']:
+                self._procesar_lote(lote, campos, raiz, options)
+                lote = {}
+        self._procesar_lote(lote, campos, raiz, options)
+
+        duracion = time.monotonic() - inicio
+        e = self.estadisticas
+        accion = 'encontrados' if options['simular'] else ('en cuarentena' if options['cuarentena'] else 'eliminados')
+        self.stdout.write(self.style.SUCCESS(
+            f"{e['revisados']} archivos revisados en {duracion:.1f} s "
+            f"({e['revisados'] / max(duracion, 0.001):.0f} archivos/s). "
+            f"Huérfanos {accion}: {e['huerfanos']} ({e['bytes'] / 1024 / 1024:.1f} MB)."
+        ))
+
+    def _procesar_lote(self, lote, campos, raiz, options):
+        if not lote:
+            return
+        en_uso = referenciados(lote, campos, self.variantes)
+        for ruta, tamano in lote.items():
+            if ruta in en_uso:
+                continue
+            self.estadisticas['huerfanos'] += 1
+            self.estadisticas['bytes'] += tamano
+            if options['verbosity'] > 1 or options['simular']:
+                self.stdout.write(f'  {ruta}')
+            if options['simular']:
+                continue
+
+            origen = os.path.join(raiz, ruta)
+            if options['cuarentena']:
+                destino = os.path.join(options['cuarentena'], ruta)
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                shutil.move(origen, destino)
+            else:
+                os.remove(origen)
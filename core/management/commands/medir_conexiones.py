@@ -0,0 +1,47 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.utils import load_backend
+
+from core.backends.mysql.base import estadisticas
+
+BACKENDS = {
+    'sin pool': 'django.db.backends.mysql',
+    'con pool': 'core.backends.mysql',
+}
+
+
+class Command(BaseCommand):
+    help = 'Compara el costo de conexión por petición con y sin el pool de conexiones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=500, help='Peticiones simuladas por backend (por defecto 500)')
+        parser.add_argument('--base', default='default', help='Alias de la base de datos a medir')
+
+    def handle(self, *args, **options):
+        configuracion = connections[options['base']].settings_dict
+        for nombre, motor in BACKENDS.items():
+            alias = f"medicion_{motor.replace('.', '_')}"
+            conexion = load_backend(motor).DatabaseWrapper({**configuracion, 'ENGINE': motor}, alias)
+            tiempos = self.medir(conexion, options['peticiones'])
+            self.stdout.write(
+                f'{nombre:>9}: media {statistics.mean(tiempos):.2f} ms, '
+                f'p50 {statistics.median(tiempos):.2f} ms, '
+                f'p95 {statistics.quantiles(tiempos, n=20)[-1]:.2f} ms'
+            )
+            if alias in estadisticas():
+                self.stdout.write(f'           pool: {estadisticas()[alias]}')
+
+    def medir(self, conexion, peticiones):
+        """Cada "petición" abre la conexión, hace una consulta y la cierra como al final de una vista."""
+        tiempos = []
+        for _ in range(peticiones):
+            inicio = time.perf_counter()
+            with conexion.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            conexion.close()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return tiempos
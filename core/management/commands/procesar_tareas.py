@@ -0,0 +1,34 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.tareas import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Worker de la cola de tareas en segundo plano (imágenes, etc.)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=10, help='Tareas reclamadas por vuelta (por defecto 10)')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--una-vez', action='store_true', help='Procesa lo pendiente y termina')
+
+    def handle(self, *args, **options):
+        self.detener = False
+        # SIGTERM (deploy, systemd) termina la tarea en curso antes de salir
+        signal.signal(signal.SIGTERM, self._detener)
+
+        while not self.detener:
+            close_old_connections()
+            completadas, fallidas = procesar_pendientes(options['lote'])
+            if completadas or fallidas:
+                self.stdout.write(f'{completadas} completadas, {fallidas} con error')
+            elif options['una_vez']:
+                break
+            else:
+                time.sleep(options['intervalo'])
+
+    def _detener(self, *args):
+        self.detener = True
@@ -0,0 +1,63 @@
+import gzip
+import os
+
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+
+from core.estaticos import EXTENSIONES_COMPRIMIBLES
+
+# Tamaño máximo en KB según el tipo de archivo
+LIMITES_KB = {
+    'imagen': 200,
+    'codigo': 150,
+    'otro': 500,
+}
+
+TIPOS = {
+    'imagen': {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.svg', '.ico'},
+    'codigo': {'.css', '.js', '.mjs'},
+}
+
+
+def tipo_de(nombre):
+    extension = os.path.splitext(nombre)[1].lower()
+    for tipo, extensiones in TIPOS.items():
+        if extension in extensiones:
+            return tipo
+    return 'otro'
+
+
+class Command(BaseCommand):
+    help = 'Reporta los archivos estáticos que superan el tamaño permitido para su tipo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estricto', action='store_true', help='Termina con error si hay archivos excedidos (para CI)')
+        for tipo, limite in LIMITES_KB.items():
+            parser.add_argument(f'--limite-{tipo}', type=int, default=limite, help=f'KB máximos para {tipo} (por defecto {limite})')
+
+    def handle(self, *args, **options):
+        vistos = set()
+        excedidos = []
+        for finder in finders.get_finders():
+            for nombre, almacenamiento in finder.list(['CVS', '.*', '*~']):
+                # El primero que encuentra cada ruta es el que publica collectstatic
+                if nombre in vistos:
+                    continue
+                vistos.add(nombre)
+                # Se mide lo que viaja por la red: la versión .gz para los comprimibles
+                tamano = almacenamiento.size(nombre)
+                if os.path.splitext(nombre)[1].lower() in EXTENSIONES_COMPRIMIBLES:
+                    with almacenamiento.open(nombre) as archivo:
+                        tamano = len(gzip.compress(archivo.read()))
+                limite = options[f'limite_{tipo_de(nombre)}'] * 1024
+                if tamano > limite:
+                    excedidos.append((tamano, limite, nombre))
+
+        for tamano, limite, nombre in sorted(excedidos, reverse=True):
+            self.stdout.write(f'  {nombre}: {tamano / 1024:.0f} KB, límite {limite / 1024:.0f} KB')
+
+        resumen = f'{len(vistos)} archivos revisados, {len(excedidos)} superan el límite.'
+        if excedidos and options['estricto']:
+            raise CommandError(resumen)
+        estilo = self.style.WARNING if excedidos else self.style.SUCCESS
+        self.stdout.write(estilo(resumen))
@@ -0,0 +1,68 @@
+import os
+
+from django.apps import apps
+from django.db.models import FileField
+
+
+def recorrer_media(raiz):
+    """
+    Genera (ruta_relativa, tamaño, mtime) de cada archivo bajo ``raiz`` sin
+    construir la lista completa: os.scandir recorre un directorio a la vez.
+    """
+    pendientes = ['']
+    while pendientes:
+        relativa = pendientes.pop()
+        try:
+            entradas = os.scandir(os.path.join(raiz, relativa))
+        except FileNotFoundError:
+            continue
+        with entradas:
+            for entrada in entradas:
+                ruta = f'{relativa}{entrada.name}'
+                if entrada.is_dir(follow_symlinks=False):
+                    pendientes.append(f'{ruta}/')
+                elif entrada.is_file(follow_symlinks=False):
+                    datos = entrada.stat(follow_symlinks=False)
+                    yield ruta, datos.st_size, datos.st_mtime
+
+
+def campos_de_archivo():
+    """(modelo, campo, campo_variantes o None) de cada FileField/ImageField del proyecto."""
+    campos = []
+    for modelo in apps.get_models():
+        nombres = {campo.name for campo in modelo._meta.get_fields()}
+        for campo in modelo._meta.get_fields():
+            if isinstance(campo, FileField):
+                variantes = f'{campo.name}_variantes'
+                campos.append((modelo, campo.name, variantes if variantes in nombres else None))
+    return campos
+
+
+def variantes_referenciadas(campos, lote=2000):
+    """
+    Rutas de todos los derivados que listan los campos ``*_variantes`` (ver
+    productos/imagenes.py). Se leen del JSON guardado y no se deducen del
+    nombre del archivo: si cambia cómo se nombran, la limpieza sigue igual.
+    """
+    rutas = set()
+    for modelo, _campo, campo_variantes in campos:
+        if not campo_variantes:
+            continue
+        for variantes in modelo.objects.values_list(campo_variantes, flat=True).iterator(chunk_size=lote):
+            for datos in (variantes or {}).get('variantes', {}).values():
+                rutas.update(valor for valor in datos.values() if isinstance(valor, str))
+    return rutas
+
+
+def referenciados(rutas, campos, variantes=frozenset()):
+    """
+    Subconjunto de ``rutas`` (un lote) que sigue referenciado en la base de
+    datos: por un campo de archivo o entre ``variantes`` (variantes_referenciadas).
+    """
+    rutas = set(rutas)
+    encontrados = rutas & variantes
+    for modelo, campo, _campo_variantes in campos:
+        encontrados.update(
+            modelo.objects.filter(**{f'{campo}__in': rutas}).values_list(campo, flat=True)
+        )
+    return rutas & encontrados
@@ -0,0 +1,87 @@
+import mimetypes
+import os
+import re
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+
+# Un año: los nombres con hash cambian cuando cambia el contenido
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+# Sin hash (p. ej. favicon.ico pedido por el navegador) se revalida a la hora
+CACHE_CORTO = 'public, max-age=3600'
+
+# nombre.<hash de 12 hex>.ext, el formato de ManifestStaticFilesStorage
+PATRON_HASH = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+
+def codificaciones_aceptadas(cabecera):
+    """
+    Accept-Encoding -> {codificacion: q} para las de CODIFICACIONES. q=0
+    significa rechazada ('br;q=0'), y '*' cubre las que no se nombran.
+    """
+    calidades = {}
+    for parte in cabecera.split(','):
+        nombre, *parametros = [trozo.strip() for trozo in parte.split(';')]
+        if not nombre:
+            continue
+        calidad = 1.0
+        for parametro in parametros:
+            clave, _, valor = parametro.partition('=')
+            if clave.strip().lower() == 'q':
+                try:
+                    calidad = float(valor)
+                except ValueError:
+                    calidad = 0.0
+        calidades[nombre.lower()] = calidad
+    comodin = calidades.get('*', 0.0)
+    return {nombre: calidades.get(nombre, comodin) for nombre, _extension in CODIFICACIONES}
+
+
+class EstaticosPrecomprimidosMiddleware:
+    """
+    Sirve STATIC_ROOT (lo generado por collectstatic) antes del resto de la
+    pila. Si el cliente acepta br o gzip y existe la versión comprimida
+    generada por EstaticosComprimidos, la entrega tal cual: nunca se comprime
+    por petición. En DEBUG no interviene y runserver sirve los archivos.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefijo = '/' + settings.STATIC_URL.lstrip('/')
+        self.raiz = settings.STATIC_ROOT
+
+    def __call__(self, request):
+        if settings.DEBUG or request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefijo):
+            return self.get_response(request)
+        respuesta = self.servir(request, unquote(request.path[len(self.prefijo):]))
+        return respuesta if respuesta is not None else self.get_response(request)
+
+    def servir(self, request, nombre):
+        try:
+            ruta = safe_join(self.raiz, nombre)
+        except (SuspiciousFileOperation, ValueError):
+            return None
+        if not os.path.isfile(ruta):
+            return None
+
+        tipo, _ = mimetypes.guess_type(ruta)
+        aceptadas = codificaciones_aceptadas(request.headers.get('Accept-Encoding', ''))
+        codificacion = None
+        # La de mayor q entre las disponibles; con la misma q, el orden de CODIFICACIONES
+        for nombre_codificacion, extension in sorted(CODIFICACIONES, key=lambda c: -aceptadas.get(c[0], 0)):
+            if aceptadas.get(nombre_codificacion, 0) > 0 and os.path.isfile(ruta + extension):
+                ruta, codificacion = ruta + extension, nombre_codificacion
+                break
+
+        respuesta = FileResponse(open(ruta, 'rb'), content_type=tipo or 'application/octet-stream')
+        if codificacion:
+            respuesta['Content-Encoding'] = codificacion
+        patch_vary_headers(respuesta, ('Accept-Encoding',))
+        respuesta['Cache-Control'] = CACHE_INMUTABLE if PATRON_HASH.search(nombre) else CACHE_CORTO
+        return respuesta
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('argumentos', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('PEN', 'Pendiente'), ('PRO', 'En Proceso'), ('COM', 'Completada'), ('FAL', 'Fallida')], default='PEN', max_length=3)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('max_intentos', models.PositiveSmallIntegerField(default=5)),
+                ('ejecutar_desde', models.DateTimeField()),
+                ('error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Tarea',
+                'verbose_name_plural': 'Tareas',
+                'db_table': 'tarea',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'ejecutar_desde'], name='tarea_estado_desde_idx')],
+            },
+        ),
+    ]
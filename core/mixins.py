@@ -0,0 +1,65 @@
+import copy
+
+from django.db.models import FileField
+
+
+class SeguimientoCambiosMixin:
+    """
+    Guarda los valores con los que se cargó la instancia (en ``from_db``) para
+    saber qué campos cambiaron sin volver a consultar la base de datos.
+
+    Uso: ``class Producto(SeguimientoCambiosMixin, models.Model)`` y luego
+    ``instancia.ha_cambiado('imagen')`` o ``instancia.campos_cambiados``.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._valores_originales = {}
+        for nombre, valor in zip(field_names, values):
+            campo = cls._meta.get_field(nombre)
+            instancia._valores_originales[campo.attname] = _normalizar(campo, valor)
+        return instancia
+
+    def valor_original(self, campo):
+        """Valor con el que se cargó el campo (el nombre, para archivos); None si no se cargó."""
+        attname = self._meta.get_field(campo).attname
+        return getattr(self, '_valores_originales', {}).get(attname)
+
+    def ha_cambiado(self, campo):
+        """
+        True si el campo difiere del valor cargado. En una instancia nueva, o en
+        un campo diferido que luego se asignó, cuenta como cambiado.
+        """
+        campo = self._meta.get_field(campo)
+        originales = getattr(self, '_valores_originales', None)
+        if originales is None or campo.attname not in originales:
+            return campo.attname in self.__dict__
+        return _normalizar(campo, getattr(self, campo.attname)) != originales[campo.attname]
+
+    @property
+    def campos_cambiados(self):
+        """Nombres de los campos que cambiaron desde la carga."""
+        return [campo.name for campo in self._meta.concrete_fields if self.ha_cambiado(campo.name)]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Lo recién guardado pasa a ser el punto de comparación
+        update_fields = kwargs.get('update_fields')
+        originales = getattr(self, '_valores_originales', {})
+        for campo in self._meta.concrete_fields:
+            if update_fields is not None and campo.name not in update_fields and campo.attname not in update_fields:
+                continue
+            if campo.attname in self.__dict__:
+                originales[campo.attname] = _normalizar(campo, getattr(self, campo.attname))
+        self._valores_originales = originales
+
+
+def _normalizar(campo, valor):
+    if isinstance(campo, FileField):
+        # En la BD es el nombre ('' si está vacío); en la instancia, un FieldFile
+        return getattr(valor, 'name', valor) or None
+    if isinstance(valor, (dict, list)):
+        # Copia: un JSONField modificado en sitio no debe cambiar el original
+        return copy.deepcopy(valor)
+    return valor
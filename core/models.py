@@ -1,3 +1,37 @@
 from django.db import models
 
 # Create your models here.
+
+# Cola de tareas en segundo plano (ver core/tareas.py). Se guarda en la misma
+# base de datos: no hace falta un broker externo y una tarea encolada dentro de
+# una transacción solo es visible para el worker si la transacción se confirma.
+class Tarea(models.Model):
+    ESTADOS = [
+        ('PEN', 'Pendiente'),
+        ('PRO', 'En Proceso'),
+        ('COM', 'Completada'),
+        ('FAL', 'Fallida'),
+    ]
+
+    nombre = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=3, choices=ESTADOS, default='PEN')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=5)
+    ejecutar_desde = models.DateTimeField()
+    error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.nombre} #{self.pk} ({self.get_estado_display()})'
+
+    class Meta:
+        db_table = 'tarea'
+        verbose_name = 'Tarea'
+        verbose_name_plural = 'Tareas'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            # El worker toma las pendientes más antiguas cuyo turno ya llegó
+            models.Index(fields=['estado', 'ejecutar_desde'], name='tarea_estado_desde_idx'),
+        ]
@@ -0,0 +1,118 @@
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Después de una escritura el visitante lee de la primaria durante esta
+# ventana (segundos), más que el retraso esperado de la replicación
+VENTANA_PRIMARIA = 10
+
+# La marca viaja en una cookie y no en la sesión: así también cubre a los
+# visitantes anónimos sin crear sesiones ni escribir en la base de datos
+COOKIE_PRIMARIA = 'lumora_primaria'
+
+# Estado de la petición en curso: None fuera de ReplicasMiddleware
+_peticion = ContextVar('peticion_replicas', default=None)
+
+
+def replicas():
+    """Alias configurados como réplica (ver DATABASES en joyeria/settings.py)."""
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+class RouterReplicas:
+    """
+    Escrituras, migraciones y transacciones siempre van a la primaria. Las
+    lecturas solo van a una réplica dentro de una vista marcada con
+    @usar_replica y mientras la petición no haya escrito nada.
+    """
+
+    def db_for_read(self, model, **hints):
+        estado = _peticion.get()
+        if not estado or not estado['replica'] or estado['escribio']:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Dentro de una transacción se lee lo que la transacción ve
+            return DEFAULT_DB_ALIAS
+        return estado['replica']
+
+    def db_for_write(self, model, **hints):
+        estado = _peticion.get()
+        if estado:
+            estado['escribio'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Todas las bases contienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación
+        return db == DEFAULT_DB_ALIAS
+
+
+def usar_replica(vista):
+    """
+    Marca una vista de solo lectura para que sus consultas vayan a una réplica.
+    Se ignora si no hay réplicas, si la petición no es GET/HEAD o si el
+    visitante escribió hace poco (cookie de COOKIE_PRIMARIA).
+    """
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        estado = _peticion.get()
+        disponibles = replicas()
+        if (estado is None or not disponibles or request.method not in ('GET', 'HEAD')
+                or COOKIE_PRIMARIA in request.COOKIES):
+            return vista(request, *args, **kwargs)
+
+        estado['replica'] = random.choice(disponibles)
+        try:
+            return vista(request, *args, **kwargs)
+        finally:
+            estado['replica'] = None
+    return envoltura
+
+
+class ReplicasMiddleware:
+    """
+    Lleva el estado de lectura/escritura de cada petición. Si la petición
+    escribió en la primaria, deja la cookie que fija las lecturas del
+    visitante a la primaria durante VENTANA_PRIMARIA segundos. En DEBUG añade
+    la cabecera X-Consultas-BD con las consultas ejecutadas por alias.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        estado = {'replica': None, 'escribio': False}
+        ficha = _peticion.set(estado)
+        consultas = {}
+        try:
+            with ExitStack() as pila:
+                if settings.DEBUG:
+                    for alias in settings.DATABASES:
+                        pila.enter_context(connections[alias].execute_wrapper(_contador(alias, consultas)))
+                respuesta = self.get_response(request)
+        finally:
+            _peticion.reset(ficha)
+
+        if estado['escribio']:
+            respuesta.set_cookie(
+                COOKIE_PRIMARIA, str(int(time.time())), max_age=VENTANA_PRIMARIA,
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+        if settings.DEBUG:
+            respuesta['X-Consultas-BD'] = ', '.join(f'{alias}={total}' for alias, total in sorted(consultas.items()))
+        return respuesta
+
+
+def _contador(alias, consultas):
+    def contar(execute, sql, params, many, context):
+        consultas[alias] = consultas.get(alias, 0) + 1
+        return execute(sql, params, many, context)
+    return contar
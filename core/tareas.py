@@ -0,0 +1,89 @@
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Tarea
+
+# Nombre -> función. Cada app registra sus tareas con @tarea al importar su
+# módulo de tareas (desde AppConfig.ready)
+TAREAS = {}
+
+# Reintentos con espera creciente: 30 s, 1 min, 2 min, 4 min...
+ESPERA_BASE = 30
+
+# Una tarea 'En Proceso' sin cambios en este tiempo quedó huérfana (worker caído)
+TIEMPO_MAXIMO = timedelta(minutes=15)
+
+
+def tarea(nombre):
+    """Registra una función como tarea. Sus argumentos deben ser serializables a JSON."""
+    def decorador(funcion):
+        TAREAS[nombre] = funcion
+        return funcion
+    return decorador
+
+
+def encolar(nombre, **argumentos):
+    if nombre not in TAREAS:
+        raise KeyError(f'Tarea no registrada: {nombre}')
+    return Tarea.objects.create(nombre=nombre, argumentos=argumentos, ejecutar_desde=timezone.now())
+
+
+def reclamar(lote=10):
+    """
+    Marca como 'En Proceso' hasta ``lote`` tareas listas y las retorna.
+    SKIP LOCKED permite varios workers sin que dos tomen la misma tarea.
+    """
+    ahora = timezone.now()
+    # Tareas huérfanas de un worker que murió a mitad de camino. El intento
+    # cortado cuenta: una tarea que tumba al worker no se reintenta para siempre
+    huerfanas = Tarea.objects.filter(estado='PRO', fecha_actualizacion__lt=ahora - TIEMPO_MAXIMO)
+    huerfanas.filter(intentos__gte=F('max_intentos') - 1).update(
+        estado='FAL', intentos=F('intentos') + 1, fecha_actualizacion=ahora,
+        error=f'El worker no terminó la tarea en {TIEMPO_MAXIMO}',
+    )
+    huerfanas.update(estado='PEN', intentos=F('intentos') + 1, fecha_actualizacion=ahora)
+    with transaction.atomic():
+        tareas = list(
+            Tarea.objects.select_for_update(skip_locked=True)
+            .filter(estado='PEN', ejecutar_desde__lte=ahora)
+            .order_by('ejecutar_desde', 'id')[:lote]
+        )
+        Tarea.objects.filter(pk__in=[t.pk for t in tareas]).update(estado='PRO', fecha_actualizacion=ahora)
+    return tareas
+
+
+def ejecutar(tarea_pendiente):
+    """Ejecuta una tarea reclamada y registra el resultado. Retorna True si terminó bien."""
+    tarea_pendiente.intentos += 1
+    try:
+        TAREAS[tarea_pendiente.nombre](**tarea_pendiente.argumentos)
+    except Exception:
+        tarea_pendiente.error = traceback.format_exc()
+        if tarea_pendiente.intentos >= tarea_pendiente.max_intentos:
+            tarea_pendiente.estado = 'FAL'
+        else:
+            tarea_pendiente.estado = 'PEN'
+            espera = ESPERA_BASE * 2 ** (tarea_pendiente.intentos - 1)
+            tarea_pendiente.ejecutar_desde = timezone.now() + timedelta(seconds=espera)
+        tarea_pendiente.save(update_fields=['estado', 'intentos', 'error', 'ejecutar_desde', 'fecha_actualizacion'])
+        return False
+
+    tarea_pendiente.estado = 'COM'
+    tarea_pendiente.error = ''
+    tarea_pendiente.save(update_fields=['estado', 'intentos', 'error', 'fecha_actualizacion'])
+    return True
+
+
+def procesar_pendientes(lote=10):
+    """Reclama y ejecuta un lote. Retorna (completadas, fallidas)."""
+    completadas = fallidas = 0
+    for pendiente in reclamar(lote):
+        if ejecutar(pendiente):
+            completadas += 1
+        else:
+            fallidas += 1
+    return completadas, fallidas
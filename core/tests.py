@@ -1,3 +1,230 @@
-from django.test import TestCase
+import os
+import tempfile
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core.backends.mysql.pool import PoolAgotado, PoolConexiones
+from core.middleware import EstaticosPrecomprimidosMiddleware
+from core.models import Tarea
+from core.replicas import COOKIE_PRIMARIA, ReplicasMiddleware, RouterReplicas, _peticion
+from core.tareas import TAREAS, TIEMPO_MAXIMO, encolar, procesar_pendientes, reclamar, tarea
+from productos.models import Categoria, Producto
 
 # Create your tests here.
+
+class ColaDeTareasTests(TestCase):
+
+    def setUp(self):
+        self.llamadas = []
+
+        @tarea('pruebas.anotar')
+        def anotar(valor):
+            self.llamadas.append(valor)
+
+        @tarea('pruebas.fallar')
+        def fallar():
+            raise ValueError('falla de prueba')
+
+        self.addCleanup(TAREAS.pop, 'pruebas.anotar')
+        self.addCleanup(TAREAS.pop, 'pruebas.fallar')
+
+    def test_ejecuta_y_completa(self):
+        pendiente = encolar('pruebas.anotar', valor=7)
+        self.assertEqual(procesar_pendientes(), (1, 0))
+        self.assertEqual(self.llamadas, [7])
+        pendiente.refresh_from_db()
+        self.assertEqual(pendiente.estado, 'COM')
+
+    def test_reintenta_y_luego_falla(self):
+        pendiente = encolar('pruebas.fallar')
+        pendiente.max_intentos = 2
+        pendiente.save()
+
+        self.assertEqual(procesar_pendientes(), (0, 1))
+        pendiente.refresh_from_db()
+        self.assertEqual((pendiente.estado, pendiente.intentos), ('PEN', 1))
+        self.assertIn('falla de prueba', pendiente.error)
+        # El reintento queda programado a futuro
+        self.assertEqual(procesar_pendientes(), (0, 0))
+
+        Tarea.objects.filter(pk=pendiente.pk).update(ejecutar_desde=timezone.now())
+        procesar_pendientes()
+        pendiente.refresh_from_db()
+        self.assertEqual((pendiente.estado, pendiente.intentos), ('FAL', 2))
+
+    def test_huerfana_cuenta_el_intento(self):
+        pendiente = encolar('pruebas.anotar', valor=1)
+        pendiente.max_intentos = 2
+        pendiente.save()
+
+        def morir_el_worker():
+            Tarea.objects.filter(pk=pendiente.pk).update(fecha_actualizacion=timezone.now() - TIEMPO_MAXIMO * 2)
+
+        reclamar()
+        morir_el_worker()
+        self.assertEqual(reclamar(), [pendiente])
+        pendiente.refresh_from_db()
+        self.assertEqual((pendiente.estado, pendiente.intentos), ('PRO', 1))
+
+        morir_el_worker()
+        self.assertEqual(reclamar(), [])
+        pendiente.refresh_from_db()
+        self.assertEqual((pendiente.estado, pendiente.intentos), ('FAL', 2))
+        self.assertEqual(self.llamadas, [])
+
+
+class SeguimientoCambiosTests(TestCase):
+
+    def test_detecta_cambios_sin_consultar(self):
+        Categoria.objects.create(nombre='Anillos', slug='anillos')
+        categoria = Categoria.objects.get(slug='anillos')
+        with self.assertNumQueries(0):
+            self.assertEqual(categoria.campos_cambiados, [])
+            categoria.nombre = 'Sortijas'
+            self.assertTrue(categoria.ha_cambiado('nombre'))
+            self.assertEqual(categoria.valor_original('nombre'), 'Anillos')
+
+        # Después de guardar, lo guardado es el nuevo punto de comparación
+        categoria.save()
+        self.assertFalse(categoria.ha_cambiado('nombre'))
+
+    def test_instancia_nueva_cuenta_como_cambiada(self):
+        categoria = Categoria(nombre='Cadenas', slug='cadenas')
+        self.assertTrue(categoria.ha_cambiado('nombre'))
+        self.assertIsNone(categoria.valor_original('nombre'))
+
+
+class RouterReplicasTests(SimpleTestCase):
+
+    def test_lee_de_la_primaria_despues_de_escribir(self):
+        router = RouterReplicas()
+        ficha = _peticion.set({'replica': 'replica1', 'escribio': False})
+        self.addCleanup(_peticion.reset, ficha)
+
+        self.assertEqual(router.db_for_read(Categoria), 'replica1')
+        self.assertEqual(router.db_for_write(Categoria), 'default')
+        self.assertEqual(router.db_for_read(Categoria), 'default')
+
+    def test_fuera_de_una_peticion_todo_va_a_la_primaria(self):
+        self.assertEqual(RouterReplicas().db_for_read(Categoria), 'default')
+
+    def test_la_escritura_deja_la_cookie_de_primaria(self):
+        def vista(request):
+            RouterReplicas().db_for_write(Categoria)
+            return HttpResponse()
+
+        respuesta = ReplicasMiddleware(vista)(RequestFactory().post('/'))
+        self.assertIn(COOKIE_PRIMARIA, respuesta.cookies)
+        respuesta = ReplicasMiddleware(lambda request: HttpResponse())(RequestFactory().get('/'))
+        self.assertNotIn(COOKIE_PRIMARIA, respuesta.cookies)
+
+
+class EstaticosPrecomprimidosTests(SimpleTestCase):
+
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        for nombre in ('app.js', 'app.js.br', 'app.js.gz'):
+            with open(os.path.join(carpeta.name, nombre), 'w') as archivo:
+                archivo.write(nombre)
+        ajustes = override_settings(DEBUG=False, STATIC_ROOT=carpeta.name, STATIC_URL='/static/')
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.middleware = EstaticosPrecomprimidosMiddleware(lambda request: HttpResponse(status=404))
+
+    def codificacion(self, aceptadas):
+        respuesta = self.middleware(RequestFactory().get('/static/app.js', HTTP_ACCEPT_ENCODING=aceptadas))
+        respuesta.close()
+        return respuesta.get('Content-Encoding')
+
+    def test_respeta_los_valores_q(self):
+        self.assertEqual(self.codificacion('gzip, deflate, br'), 'br')
+        self.assertEqual(self.codificacion('gzip, br;q=0'), 'gzip')
+        self.assertEqual(self.codificacion('br;q=0.5, gzip;q=0.8'), 'gzip')
+        self.assertEqual(self.codificacion('*;q=0.1, br;q=0'), 'gzip')
+        self.assertIsNone(self.codificacion('br;q=0, gzip;q=0'))
+        self.assertIsNone(self.codificacion(''))
+
+
+class LimpiarMediaTests(TestCase):
+
+    def test_borra_huerfanos_y_conserva_derivados_en_uso(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=carpeta.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        en_uso = ['productos/x.png', 'productos/variantes/x-png-card.webp', 'productos/variantes/x-png-card.avif']
+        huerfano = 'productos/variantes/y-jpg-card.webp'
+        hace_dos_horas = time.time() - 7200
+        for ruta in [*en_uso, huerfano]:
+            absoluta = os.path.join(carpeta.name, ruta)
+            os.makedirs(os.path.dirname(absoluta), exist_ok=True)
+            with open(absoluta, 'wb') as archivo:
+                archivo.write(b'x')
+            os.utime(absoluta, (hace_dos_horas, hace_dos_horas))
+
+        categoria = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        producto = Producto.objects.create(
+            codigo='M1', nombre='Anillo', descripcion='Plata', precio=100, categoria=categoria, imagen=en_uso[0],
+        )
+        Producto.objects.filter(pk=producto.pk).update(imagen_variantes={
+            'origen': en_uso[0], 'variantes': {'card': {'ancho': 480, 'alto': 480, 'webp': en_uso[1], 'avif': en_uso[2]}},
+        })
+
+        call_command('limpiar_media', stdout=StringIO())
+        for ruta in en_uso:
+            self.assertTrue(os.path.isfile(os.path.join(carpeta.name, ruta)), ruta)
+        self.assertFalse(os.path.exists(os.path.join(carpeta.name, huerfano)))
+
+
+class PoolConexionesTests(SimpleTestCase):
+
+    class Conexion:
+        def __init__(self, viva=True):
+            self.viva = viva
+            self.cerrada = False
+
+        def ping(self):
+            if not self.viva:
+                raise ConnectionError
+
+    def pool(self, **opciones):
+        return PoolConexiones(
+            ping=lambda conexion: conexion.ping(),
+            cerrar=lambda conexion: setattr(conexion, 'cerrada', True),
+            **opciones,
+        )
+
+    def test_reutiliza_la_conexion_devuelta(self):
+        pool = self.pool()
+        conexion = pool.obtener(self.Conexion)
+        pool.devolver(conexion)
+        self.assertIs(pool.obtener(self.Conexion), conexion)
+        self.assertEqual((pool.resumen()['nuevas'], pool.resumen()['prestamos']), (1, 2))
+
+    def test_reemplaza_conexiones_caidas_o_viejas(self):
+        pool = self.pool(ping_inactiva=0)
+        caida = pool.obtener(lambda: self.Conexion(viva=False))
+        pool.devolver(caida)
+        self.assertIsNot(pool.obtener(self.Conexion), caida)
+        self.assertTrue(caida.cerrada)
+
+        pool = self.pool(vida_maxima=0)
+        vieja = pool.obtener(self.Conexion)
+        pool.devolver(vieja)
+        self.assertTrue(vieja.cerrada)
+        self.assertEqual(pool.resumen()['abiertas'], 0)
+
+    def test_respeta_el_tamano_maximo(self):
+        pool = self.pool(tamano=1, espera=0.01)
+        pool.obtener(self.Conexion)
+        with self.assertRaises(PoolAgotado), self.assertLogs('core.backends.mysql.pool', 'WARNING'):
+            pool.obtener(self.Conexion)
+        self.assertEqual(pool.resumen()['agotado'], 1)
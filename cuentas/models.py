@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
+from core.mixins import SeguimientoCambiosMixin
+
 # 1. Modelo de Usuario Personalizado (CustomUser)
 class CustomUser(AbstractUser):
     """Extiende el modelo User por defecto de Django.
@@ -64,7 +66,7 @@ class Municipio(models.Model):
 # 3. Modelo de Direcciones (para envío y facturación)
 # En cuentas/models.py
 
-class Direccion(models.Model):
+class Direccion(SeguimientoCambiosMixin, models.Model):
     """Almacena las diferentes direcciones de un usuario."""
     usuario = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='direcciones', verbose_name="Usuario")
     etiqueta = models.CharField(max_length=50, help_text="Ej: Casa, Oficina, Dirección de Regalo")
@@ -96,16 +98,17 @@ class Direccion(models.Model):
         return self.pedidos_realizados.exists()
     
     def save(self, *args, **kwargs):
-        # Si esta dirección se está guardando como predeterminada
-        if self.es_predeterminada:
+        # Si esta dirección se está guardando como predeterminada (y antes no lo era)
+        if self.es_predeterminada and (self._state.adding or self.ha_cambiado('es_predeterminada')):
             # Buscamos todas las otras direcciones predeterminadas del usuario y las desactivamos
             Direccion.objects.filter(
                 usuario=self.usuario, 
                 es_predeterminada=True
             ).exclude(pk=self.pk).update(es_predeterminada=False)
         
-        # Si es la única dirección que tiene el usuario, obligamos a que sea predeterminada
-        if not Direccion.objects.filter(usuario=self.usuario).exists():
+        # Si es la única dirección que tiene el usuario, obligamos a que sea predeterminada.
+        # Una dirección ya guardada siempre se cuenta a sí misma: solo aplica al crearla
+        if self._state.adding and not Direccion.objects.filter(usuario=self.usuario).exists():
             self.es_predeterminada = True
             
         super().save(*args, **kwargs)
\ No newline at end of file
@@ -11,6 +11,7 @@ from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.template.loader import render_to_string
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import EmailMessage
+from core.replicas import usar_replica
 
 # --- FUNCIÓN AUXILIAR DE ENVÍO ---
 def enviar_email_activacion(request, usuario):
@@ -195,6 +196,7 @@ def marcar_predeterminada(request, pk):
     messages.success(request, f'"{direccion.etiqueta}" es ahora tu dirección predeterminada.')
     return redirect('cuentas:perfil')
             
+@usar_replica
 def ajax_cargar_municipios(request):
     departamento_id = request.GET.get('departamento_id')
     municipios = Municipio.objects.filter(codigo_departamento_id=departamento_id).order_by('nombre_municipio')
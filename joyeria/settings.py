@@ -51,11 +51,17 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Estáticos con hash y precomprimidos (ver core/estaticos.py), antes de sesiones y auth
+    'core.middleware.EstaticosPrecomprimidosMiddleware',
+    # Lecturas en réplicas y lectura en la primaria después de escribir (ver core/replicas.py)
+    'core.replicas.ReplicasMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    # Bolsa de los visitantes sin cuenta en una cookie firmada (ver carrito/anonimo.py)
+    'carrito.anonimo.BolsaAnonimaMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -72,6 +78,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                # Cantidad y total del carrito para el menú (ver carrito/resumen.py)
+                'carrito.context_processors.carrito',
             ],
         },
     },
@@ -83,14 +91,47 @@ WSGI_APPLICATION = 'joyeria.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Backend MySQL con pool de conexiones por proceso (ver core/backends/mysql).
+# CONN_MAX_AGE = 0: al terminar cada petición la conexión vuelve al pool
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'core.backends.mysql',
         'NAME': 'joyeria',
         'USER': 'root',
         'PASSWORD': 'root00',
         'HOST': 'localhost',
         'PORT': '3306',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'TAMANO': int(os.getenv('DB_POOL_TAMANO', 10)),  # Conexiones por proceso
+            'ESPERA': 5,             # Segundos esperando una conexión libre
+            'VIDA_MAXIMA': 1800,     # Segundos antes de reciclar una conexión (< wait_timeout)
+            'PING_INACTIVA': 30,     # Ping antes de prestar una conexión inactiva por más tiempo
+        },
+    }
+}
+
+# Réplicas de solo lectura: hosts separados por coma en DB_REPLICAS. Solo las
+# vistas marcadas con @usar_replica leen de ellas (ver core/replicas.py)
+for numero, host in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{numero}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.replicas.RouterReplicas']
+
+
+# Caché
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# LocMem es por proceso: con varios workers en producción conviene una caché
+# compartida (Redis o Memcached) para que las invalidaciones lleguen a todos.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lumora',
     }
 }
 
@@ -158,6 +199,17 @@ MEDIA_URL = '/media/'
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic genera nombres con hash de contenido y versiones .gz/.br
+# (.br solo si el paquete brotli está instalado)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'core.estaticos.EstaticosComprimidos',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pedidos.recomendaciones import actualizar_compras_conjuntas
+
+
+class Command(BaseCommand):
+    help = 'Suma los pedidos nuevos (y resta los cancelados) en las recomendaciones "comprados juntos" (pensado para cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Pedidos por transacción (por defecto 1000)')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+
+        def al_avanzar(total):
+            self.stdout.write(f'  {total} pedidos procesados...')
+
+        total = actualizar_compras_conjuntas(lote=options['lote'], al_avanzar=al_avanzar)
+
+        duracion = time.monotonic() - inicio
+        self.stdout.write(
+            self.style.SUCCESS(f'Se procesaron {total} pedidos en {duracion:.1f} s.')
+        )
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-18 06:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cuentas', '0001_initial'),
+        ('pedidos', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['usuario', '-fecha_creacion'], name='pedido_usuario_fecha_idx'),
+        ),
+    ]
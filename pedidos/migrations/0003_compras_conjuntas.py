@@ -0,0 +1,43 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:11
+
+from django.db import migrations, models
+
+
+def descartar_cancelados(apps, schema_editor):
+    # Los pedidos existentes quedan pendientes de sumarse a compras_conjuntas;
+    # los cancelados no cuentan
+    Pedido = apps.get_model('pedidos', 'Pedido')
+    Pedido.objects.filter(estado='CAN').update(conjuntas='DES')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0002_indices_acceso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcesoIncremental',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Proceso Incremental',
+                'verbose_name_plural': 'Procesos Incrementales',
+                'db_table': 'proceso_incremental',
+            },
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='conjuntas',
+            field=models.CharField(choices=[('PEN', 'Pendiente'), ('SUM', 'Sumado'), ('DES', 'Descartado')], default='PEN', editable=False, max_length=3),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['conjuntas', 'estado'], name='pedido_conjuntas_idx'),
+        ),
+        migrations.RunPython(descartar_cancelados, migrations.RunPython.noop),
+    ]
@@ -57,6 +57,16 @@ class Pedido(models.Model):
     # Estado actual
     estado = models.CharField(max_length=3, choices=ESTADOS, default='PEN', verbose_name="Estado")
 
+    # Si sus pares de productos ya están sumados en CompraConjunta (ver
+    # pedidos/recomendaciones.py). Un pedido cancelado pasa a 'Descartado' y
+    # ya no vuelve a contarse
+    CONJUNTAS = [
+        ('PEN', 'Pendiente'),
+        ('SUM', 'Sumado'),
+        ('DES', 'Descartado'),
+    ]
+    conjuntas = models.CharField(max_length=3, choices=CONJUNTAS, default='PEN', editable=False)
+
     # Campo para comentarios adicionales del cliente o administrador
     notas = models.TextField(blank=True, null=True, verbose_name="Notas del Pedido")
 
@@ -65,6 +75,12 @@ class Pedido(models.Model):
         verbose_name = "Pedido"
         verbose_name_plural = "Pedidos"
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Historial de pedidos de un cliente, del más reciente al más antiguo
+            models.Index(fields=['usuario', '-fecha_creacion'], name='pedido_usuario_fecha_idx'),
+            # Pedidos por sumar y sumados que luego se cancelaron
+            models.Index(fields=['conjuntas', 'estado'], name='pedido_conjuntas_idx'),
+        ]
 
     def __str__(self):
         return f"Pedido {self.referencia} - {self.usuario.get_full_name() if self.usuario else 'Anónimo'}"
@@ -115,4 +131,21 @@ class PedidoItem(models.Model):
 
     @property
     def get_subtotal(self):
-        return self.precio_al_momento * self.cantidad
\ No newline at end of file
+        return self.precio_al_momento * self.cantidad
+
+# ==================================
+# Progreso de procesos incrementales
+# ==================================
+
+class ProcesoIncremental(models.Model):
+    """Fila de control de un trabajo incremental: bloquearla impide dos ejecuciones a la vez."""
+    nombre = models.CharField(max_length=50, unique=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'proceso_incremental'
+        verbose_name = "Proceso Incremental"
+        verbose_name_plural = "Procesos Incrementales"
+
+    def __str__(self):
+        return self.nombre
@@ -0,0 +1,131 @@
+from collections import Counter, defaultdict
+from itertools import permutations
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from productos.cache import invalidar_catalogo
+from productos.models import CompraConjunta, Producto
+
+from .models import Pedido, PedidoItem, ProcesoIncremental
+
+PROCESO = 'compras_conjuntas'
+
+# Vecinos que se conservan por producto. La página muestra menos; el margen
+# evita que un vecino que va subiendo se pierda apenas entra a la lista.
+VECINOS_GUARDADOS = 50
+
+
+def actualizar_compras_conjuntas(lote=1000, al_avanzar=None):
+    """
+    Lleva a CompraConjunta los pedidos que cambiaron desde la última
+    ejecución: suma los pares de los pedidos nuevos y resta los de los ya
+    sumados que luego se cancelaron. El costo depende de esos pedidos, no
+    del historial completo. Retorna la cantidad de pedidos procesados.
+    """
+    ProcesoIncremental.objects.get_or_create(nombre=PROCESO)
+    procesados = 0
+    tocados = set()
+    while True:
+        with transaction.atomic():
+            # El bloqueo impide que dos ejecuciones cuenten los mismos pedidos
+            ProcesoIncremental.objects.select_for_update().get(nombre=PROCESO)
+            # Cada pedido guarda si ya se sumó, en vez de una marca de agua por
+            # id: uno que se confirma tarde, con un id menor a otros ya
+            # contados, igual aparece aquí
+            pedidos = list(
+                Pedido.objects.filter(Q(conjuntas='PEN') | Q(conjuntas='SUM', estado='CAN'))
+                .select_for_update()
+                .order_by('pk').values_list('pk', 'estado', 'conjuntas')[:lote]
+            )
+            if not pedidos:
+                break
+            nuevos = [pk for pk, estado, _conjuntas in pedidos if estado != 'CAN']
+            cancelados = [pk for pk, estado, conjuntas in pedidos if estado == 'CAN' and conjuntas == 'SUM']
+            sumas = contar_pares(nuevos)
+            restas = contar_pares(cancelados)
+            sumar_conteos(sumas)
+            restar_conteos(restas)
+            Pedido.objects.filter(pk__in=nuevos).update(conjuntas='SUM')
+            Pedido.objects.filter(pk__in=[pk for pk, estado, _conjuntas in pedidos if estado == 'CAN']).update(
+                conjuntas='DES',
+            )
+
+        tocados.update(producto for producto, _relacionado in sumas)
+        tocados.update(producto for producto, _relacionado in restas)
+        procesados += len(pedidos)
+        if al_avanzar:
+            al_avanzar(procesados)
+
+    recortar_vecinos(tocados)
+    if tocados:
+        # La página de cada producto tocado muestra otros "comprados juntos":
+        # su fecha cambia su ETag y su Last-Modified (ver validadores_detalle)
+        Producto.objects.filter(pk__in=tocados).update(fecha_actualizacion=timezone.now())
+        invalidar_catalogo()
+    return procesados
+
+
+def contar_pares(pedidos):
+    """{(producto, relacionado): pedidos} para los pedidos dados, en ambos sentidos."""
+    canastas = defaultdict(set)
+    items = (
+        PedidoItem.objects.filter(pedido_id__in=pedidos, producto__isnull=False)
+        .values_list('pedido_id', 'producto_id')
+    )
+    for pedido_id, producto_id in items:
+        canastas[pedido_id].add(producto_id)
+
+    conteos = Counter()
+    for productos in canastas.values():
+        conteos.update(permutations(sorted(productos), 2))
+    return conteos
+
+
+def sumar_conteos(conteos):
+    if not conteos:
+        return
+    existentes = {
+        (fila.producto_id, fila.relacionado_id): fila
+        for fila in CompraConjunta.objects.filter(producto_id__in={p for p, _r in conteos})
+    }
+    nuevos, modificados = [], []
+    for par, veces in conteos.items():
+        fila = existentes.get(par)
+        if fila is None:
+            nuevos.append(CompraConjunta(producto_id=par[0], relacionado_id=par[1], veces=veces))
+        else:
+            fila.veces += veces
+            modificados.append(fila)
+    CompraConjunta.objects.bulk_create(nuevos, batch_size=1000)
+    CompraConjunta.objects.bulk_update(modificados, ['veces'], batch_size=1000)
+
+
+def restar_conteos(conteos):
+    """
+    Descuenta los pares de los pedidos cancelados. Los pares que llegan a
+    cero se eliminan; los que recortar_vecinos ya quitó no se tocan.
+    """
+    if not conteos:
+        return
+    filas = [
+        fila for fila in CompraConjunta.objects.filter(producto_id__in={p for p, _r in conteos})
+        if (fila.producto_id, fila.relacionado_id) in conteos
+    ]
+    for fila in filas:
+        fila.veces -= conteos[(fila.producto_id, fila.relacionado_id)]
+    CompraConjunta.objects.filter(pk__in=[fila.pk for fila in filas if fila.veces <= 0]).delete()
+    CompraConjunta.objects.bulk_update([fila for fila in filas if fila.veces > 0], ['veces'], batch_size=1000)
+
+
+def recortar_vecinos(productos, limite=VECINOS_GUARDADOS):
+    """Deja solo los ``limite`` vecinos más frecuentes de cada producto."""
+    for producto_id in productos:
+        sobrantes = list(
+            CompraConjunta.objects.filter(producto_id=producto_id)
+            .order_by('-veces', 'relacionado_id')
+            .values_list('pk', flat=True)[limite:]
+        )
+        if sobrantes:
+            CompraConjunta.objects.filter(pk__in=sobrantes).delete()
@@ -1,3 +1,105 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from pedidos.models import Pedido, PedidoItem
+from pedidos.recomendaciones import actualizar_compras_conjuntas, recortar_vecinos
+from productos.models import Categoria, CompraConjunta, Producto
 
 # Create your tests here.
+
+class ComprasConjuntasTests(TestCase):
+
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        self.productos = [
+            Producto.objects.create(
+                codigo=f'C{i}', nombre=f'Anillo {i}', slug=f'anillo-{i}',
+                descripcion='Plata', precio=100, categoria=categoria,
+            )
+            for i in range(4)
+        ]
+
+    def pedido(self, *indices, estado='PAG', pk=None):
+        pedido = Pedido.objects.create(pk=pk, referencia=f'REF-{Pedido.objects.count()}', estado=estado)
+        for i in indices:
+            producto = self.productos[i]
+            PedidoItem.objects.create(
+                pedido=pedido, producto=producto, nombre_producto=producto.nombre,
+                precio_al_momento=producto.precio, cantidad=1,
+            )
+        return pedido
+
+    def veces(self, a, b):
+        fila = CompraConjunta.objects.filter(producto=self.productos[a], relacionado=self.productos[b]).first()
+        return fila.veces if fila else 0
+
+    def test_solo_procesa_pedidos_nuevos(self):
+        self.pedido(0, 1)
+        self.pedido(0, 1, 2)
+        self.pedido(0, 3, estado='CAN')
+        self.assertEqual(actualizar_compras_conjuntas(), 3)
+        self.assertEqual((self.veces(0, 1), self.veces(1, 0), self.veces(0, 2), self.veces(0, 3)), (2, 2, 1, 0))
+
+        # Una segunda ejecución sin pedidos nuevos no vuelve a contar nada
+        self.assertEqual(actualizar_compras_conjuntas(), 0)
+        self.pedido(1, 0)
+        self.assertEqual(actualizar_compras_conjuntas(), 1)
+        self.assertEqual(self.veces(0, 1), 3)
+
+    def test_confirmado_tarde_y_cancelado(self):
+        self.pedido(0, 1, 2, pk=100)
+        actualizar_compras_conjuntas()
+        # Un pedido de id menor que se confirmó después de la ejecución
+        tardio = self.pedido(0, 1, pk=50)
+        self.assertEqual(actualizar_compras_conjuntas(), 1)
+        self.assertEqual(self.veces(0, 1), 2)
+
+        Pedido.objects.filter(pk=tardio.pk).update(estado='CAN')
+        self.assertEqual(actualizar_compras_conjuntas(), 1)
+        self.assertEqual((self.veces(0, 1), self.veces(1, 0), self.veces(0, 2)), (1, 1, 1))
+        Pedido.objects.exclude(pk=tardio.pk).update(estado='CAN')
+        actualizar_compras_conjuntas()
+        self.assertFalse(CompraConjunta.objects.exists())
+        self.assertEqual(actualizar_compras_conjuntas(), 0)
+
+    def test_la_ficha_revalida_con_sus_recomendados(self):
+        # Fechas en el pasado: Last-Modified tiene resolución de segundos
+        Producto.objects.update(fecha_actualizacion=timezone.now() - timedelta(hours=1))
+        url = reverse('productos:productodetalle', args=[self.productos[0].pk])
+
+        def revalidar(anterior):
+            return [
+                self.client.get(url, HTTP_IF_NONE_MATCH=anterior['ETag']).status_code,
+                self.client.get(url, HTTP_IF_MODIFIED_SINCE=anterior['Last-Modified']).status_code,
+            ]
+
+        anterior = self.client.get(url)
+        self.assertEqual(revalidar(anterior), [304, 304])
+
+        # Aparece un "comprado junto"
+        self.pedido(0, 1)
+        actualizar_compras_conjuntas()
+        self.assertEqual(revalidar(anterior), [200, 200])
+
+        # Cambia el precio del recomendado
+        Producto.objects.update(fecha_actualizacion=timezone.now() - timedelta(hours=1))
+        anterior = self.client.get(url)
+        self.assertContains(anterior, self.productos[1].nombre)
+        relacionado = self.productos[1]
+        relacionado.precio = 150
+        relacionado.save()
+        self.assertEqual(revalidar(anterior), [200, 200])
+
+    def test_conserva_los_vecinos_mas_frecuentes(self):
+        self.pedido(0, 1)
+        self.pedido(0, 1)
+        self.pedido(0, 2, 3)
+        actualizar_compras_conjuntas()
+        recortar_vecinos([self.productos[0].pk], limite=1)
+        self.assertEqual(
+            list(CompraConjunta.objects.filter(producto=self.productos[0]).values_list('relacionado', flat=True)),
+            [self.productos[1].pk],
+        )
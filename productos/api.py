@@ -0,0 +1,136 @@
+from django.core.files.storage import default_storage
+from django.db.models import Count, Prefetch, Q
+from django.urls import reverse
+
+from .models import Categoria, Producto, ProductoImagen
+
+# API JSON de solo lectura. Cada campo declara las columnas que necesita: con
+# ?fields= solo se cargan esas (más las del orden), así un listado sin
+# descripción nunca la trae de la base de datos.
+
+# Las variantes que se exponen, de menor a mayor (ver productos/imagenes.py)
+VARIANTES_API = ('thumb', 'card', 'detail', 'zoom')
+
+LIMITE_MAXIMO = 100
+
+
+class CampoInvalido(ValueError):
+    pass
+
+
+def precio(valor):
+    """Decimal -> texto compacto sin ceros de relleno: 1500.00 -> '1500', 12.50 -> '12.5'."""
+    if valor is None:
+        return None
+    return format(valor.normalize(), 'f')
+
+
+def imagen(objeto):
+    """URL de la original y de cada derivado disponible (AVIF/WebP) con su ancho."""
+    if not objeto.imagen:
+        return None
+    datos = {'original': objeto.imagen.url}
+    derivados = objeto.imagen_variantes or {}
+    if derivados.get('origen') != objeto.imagen.name:
+        # Aún no generados o de una imagen anterior: solo la original es válida
+        return datos
+    variantes = derivados.get('variantes') or {}
+    for nombre in VARIANTES_API:
+        variante = variantes.get(nombre)
+        if not variante:
+            continue
+        datos[nombre] = {'ancho': variante['ancho']}
+        for formato in ('avif', 'webp'):
+            if variante.get(formato):
+                datos[nombre][formato] = default_storage.url(variante[formato])
+    return datos
+
+
+def _medida(valor, unidad):
+    if valor is None:
+        return None
+    return {'valor': precio(valor), 'unidad': unidad.simbolo if unidad else None}
+
+
+# nombre -> (columnas para .only(), relaciones para select_related, serializador)
+CAMPOS = {
+    'id': (['id'], [], lambda p: p.id),
+    'codigo': (['codigo'], [], lambda p: p.codigo),
+    'nombre': (['nombre'], [], lambda p: p.nombre),
+    'slug': (['slug'], [], lambda p: p.slug),
+    'descripcion': (['descripcion'], [], lambda p: p.descripcion),
+    'precio': (['precio'], [], lambda p: precio(p.precio)),
+    'precio_oferta': (['precio_oferta'], [], lambda p: precio(p.precio_oferta)),
+    'precio_final': (['precio_final'], [], lambda p: precio(p.precio_final)),
+    'categoria': (['categoria__slug'], ['categoria'], lambda p: p.categoria.slug),
+    'stock': (['stock'], [], lambda p: p.stock),
+    'tamano': (['tamano', 'unidad_tamano__simbolo'], ['unidad_tamano'], lambda p: _medida(p.tamano, p.unidad_tamano)),
+    'grosor': (['grosor', 'unidad_grosor__simbolo'], ['unidad_grosor'], lambda p: _medida(p.grosor, p.unidad_grosor)),
+    'imagen': (['imagen', 'imagen_variantes'], [], imagen),
+    'galeria': ([], [], lambda p: [imagen(img) for img in p.imagenes.all()]),
+    'url': (['id'], [], lambda p: reverse('productos:productodetalle', args=[p.id])),
+    'actualizado': (['fecha_actualizacion'], [], lambda p: p.fecha_actualizacion.isoformat()),
+}
+
+CAMPOS_LISTADO = ['id', 'codigo', 'nombre', 'precio', 'precio_oferta', 'precio_final', 'categoria', 'imagen', 'url']
+CAMPOS_DETALLE = [campo for campo in CAMPOS if campo != 'slug']
+
+
+def leer_campos(valor, por_defecto):
+    """Interpreta ?fields=a,b,c. Lanza CampoInvalido con los nombres desconocidos."""
+    if not valor:
+        return list(por_defecto)
+    campos = list(dict.fromkeys(campo.strip() for campo in valor.split(',') if campo.strip()))
+    desconocidos = [campo for campo in campos if campo not in CAMPOS]
+    if desconocidos:
+        raise CampoInvalido(f"Campos desconocidos: {', '.join(desconocidos)}")
+    return campos
+
+
+def seleccionar(queryset, campos, orden=()):
+    """Restringe el queryset a las columnas de ``campos`` y de ``orden``."""
+    columnas = {'id'}
+    relaciones = set()
+    for campo in campos:
+        columnas.update(CAMPOS[campo][0])
+        relaciones.update(CAMPOS[campo][1])
+    for campo in orden:
+        nombre = campo.lstrip('-')
+        if nombre != 'relevancia':
+            columnas.add(nombre)
+
+    queryset = queryset.select_related(None)
+    if relaciones:
+        queryset = queryset.select_related(*sorted(relaciones))
+    if 'galeria' in campos:
+        queryset = queryset.prefetch_related(Prefetch(
+            'imagenes', queryset=ProductoImagen.objects.only('producto_id', 'imagen', 'imagen_variantes').order_by('id'),
+        ))
+    return queryset.only(*sorted(columnas))
+
+
+def serializar(producto, campos):
+    return {campo: CAMPOS[campo][2](producto) for campo in campos}
+
+
+def leer_limite(valor, por_defecto):
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        return por_defecto
+    return max(1, min(limite, LIMITE_MAXIMO))
+
+
+def producto_api(producto_id, campos):
+    return seleccionar(Producto.objects.filter(id=producto_id, activo=True), campos).first()
+
+
+def categorias_api():
+    """Categorías con la cantidad de productos activos, en una sola consulta."""
+    return [
+        {'id': categoria.id, 'nombre': categoria.nombre, 'slug': categoria.slug, 'productos': categoria.total}
+        for categoria in Categoria.objects.annotate(
+            total=Count('producto', filter=Q(producto__activo=True)),
+        ).order_by('nombre')
+    ]
+
@@ -5,4 +5,5 @@ class ProductosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'productos'
     def ready(self):
-        import productos.signals
\ No newline at end of file
+        import productos.signals
+        import productos.tareas
\ No newline at end of file
@@ -0,0 +1,163 @@
+import re
+import unicodedata
+
+from django.db.models import IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Producto, TerminoBusqueda
+
+# Peso de cada campo en la relevancia: una coincidencia en el código pesa más
+# que una en el nombre, y esta más que una en la descripción
+PESOS = {
+    'codigo': 8,
+    'nombre': 4,
+    'categoria': 2,
+    'descripcion': 1,
+}
+
+PALABRAS_VACIAS = {
+    'a', 'al', 'con', 'de', 'del', 'e', 'el', 'en', 'la', 'las', 'lo', 'los',
+    'o', 'para', 'por', 'que', 'su', 'sus', 'u', 'un', 'una', 'unas', 'unos', 'y',
+}
+
+# Debe coincidir con TerminoBusqueda.termino
+LONGITUD_MAXIMA = 40
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'Cadéna' y 'cadena' producen el mismo término."""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_tildes = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return sin_tildes.lower()
+
+
+def _raiz(palabra):
+    # Plurales simples del español para que 'anillos' encuentre 'anillo'
+    if len(palabra) > 4 and palabra.endswith('es') and palabra[-3] in 'rlndj':
+        return palabra[:-2]
+    if len(palabra) > 3 and palabra.endswith('s') and not palabra[-2].isdigit():
+        return palabra[:-1]
+    return palabra
+
+
+def _palabras(texto):
+    return [p for p in re.findall(r'[a-z0-9]+', normalizar(texto)) if p not in PALABRAS_VACIAS]
+
+
+def tokenizar(texto):
+    """Divide un texto en los términos que se guardan en el índice y que se buscan."""
+    return [_raiz(palabra)[:LONGITUD_MAXIMA] for palabra in _palabras(texto)]
+
+
+def _plural_a_medias(palabra):
+    # Quien escribe 'collare' va camino de 'collares', que se indexó como
+    # 'collar': ningún término empieza por 'collare', así que también se
+    # acepta exacta la palabra sin esa 'e'. Retorna None si no aplica
+    if len(palabra) > 3 and palabra.endswith('e') and palabra[-2] in 'rlndj':
+        return palabra[:-1][:LONGITUD_MAXIMA]
+    return None
+
+
+def _compactar(texto):
+    return re.sub(r'[^a-z0-9]', '', normalizar(texto))[:LONGITUD_MAXIMA]
+
+
+def terminos_producto(producto):
+    """Retorna {termino: peso} acumulando el peso de cada campo donde aparece."""
+    campos = {
+        'codigo': producto.codigo,
+        'nombre': producto.nombre,
+        'categoria': producto.categoria.nombre,
+        'descripcion': producto.descripcion,
+    }
+    terminos = {}
+    for campo, texto in campos.items():
+        for termino in tokenizar(texto):
+            terminos[termino] = terminos.get(termino, 0) + PESOS[campo]
+
+    # El código completo también se indexa como un solo término ('A-097' -> 'a097')
+    codigo = _compactar(producto.codigo)
+    if codigo:
+        terminos[codigo] = terminos.get(codigo, 0) + PESOS['codigo']
+    return terminos
+
+
+def indexar_productos(productos):
+    """Reconstruye las entradas del índice para los productos dados."""
+    productos = list(productos)
+    if not productos:
+        return
+    TerminoBusqueda.objects.filter(producto__in=[p.pk for p in productos]).delete()
+    TerminoBusqueda.objects.bulk_create([
+        TerminoBusqueda(producto_id=producto.pk, termino=termino, peso=min(peso, 32767))
+        for producto in productos
+        for termino, peso in terminos_producto(producto).items()
+    ])
+
+
+def reindexar_todo(lote=500):
+    """Recorre el catálogo completo por bloques de pk. Retorna la cantidad de productos indexados."""
+    total = 0
+    ultimo_id = 0
+    while True:
+        productos = list(
+            Producto.objects.select_related('categoria')
+            .only('id', 'codigo', 'nombre', 'descripcion', 'categoria__nombre')
+            .filter(pk__gt=ultimo_id)
+            .order_by('pk')[:lote]
+        )
+        if not productos:
+            return total
+        indexar_productos(productos)
+        total += len(productos)
+        ultimo_id = productos[-1].pk
+
+
+def _sucesor(prefijo):
+    # Los términos solo contienen [a-z0-9], así que el prefijo 'cad' abarca
+    # el rango ['cad', 'cae'): una búsqueda por rango que sí usa el índice
+    return prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+
+
+def buscar(queryset, consulta, anotar=True):
+    """
+    Filtra el queryset a los productos que contienen todos los términos de la
+    consulta (por prefijo) y lo anota con ``relevancia``. Con ``anotar=False``
+    solo filtra, útil para conteos y agregados. Cada palabra puede estar a
+    medio escribir: se busca por el prefijo de su raíz y, si quedó cortada
+    dentro de un plural en 'es', también por el singular exacto.
+    """
+    terminos = {
+        _raiz(palabra)[:LONGITUD_MAXIMA]: _plural_a_medias(palabra)
+        for palabra in _palabras(consulta)
+    }
+    compacto = _compactar(consulta)
+    if re.search(r'\d', compacto) and len(consulta.split()) == 1:
+        # Parece un código ('A-097'): se busca como un solo término
+        terminos = {compacto: None}
+    if not terminos:
+        if not anotar:
+            return queryset
+        return queryset.annotate(relevancia=Value(0, output_field=IntegerField()))
+
+    relevancia = Value(0, output_field=IntegerField())
+    for termino, singular in terminos.items():
+        condicion = Q(termino__gte=termino, termino__lt=_sucesor(termino))
+        if singular:
+            condicion |= Q(termino=singular)
+        coincidencias = TerminoBusqueda.objects.filter(condicion)
+        queryset = queryset.filter(pk__in=coincidencias.values('producto_id'))
+        if not anotar:
+            continue
+
+        puntaje = (
+            coincidencias.filter(producto=OuterRef('pk'))
+            .values('producto')
+            .annotate(total=Sum('peso'))
+            .values('total')
+        )
+        relevancia = relevancia + Coalesce(Subquery(puntaje, output_field=IntegerField()), 0)
+
+    if not anotar:
+        return queryset
+    return queryset.annotate(relevancia=relevancia)
@@ -0,0 +1,131 @@
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+
+# Número de versión del catálogo: toda clave derivada del catálogo lo incluye,
+# así un solo incremento invalida todas las entradas sin tener que borrarlas
+CLAVE_VERSION_CATALOGO = 'productos:catalogo:version'
+
+
+def version_catalogo():
+    version = cache.get(CLAVE_VERSION_CATALOGO)
+    if version is None:
+        # Partimos de la hora actual para no reutilizar números de versión
+        # anteriores si la clave fue expulsada de la caché
+        cache.add(CLAVE_VERSION_CATALOGO, int(time.time()), None)
+        version = cache.get(CLAVE_VERSION_CATALOGO)
+    return version
+
+
+def invalidar_catalogo():
+    try:
+        cache.incr(CLAVE_VERSION_CATALOGO)
+    except ValueError:
+        cache.set(CLAVE_VERSION_CATALOGO, int(time.time()), None)
+
+
+#  *************************************************************
+#         CACHÉ DE PÁGINA COMPLETA (VISITANTES ANÓNIMOS)
+#  *************************************************************
+# Cada entrada guarda la versión con la que se generó. Cuando la versión
+# cambia la entrada queda vieja pero no se borra: mientras una sola petición
+# la recalcula, las demás siguen recibiendo la copia anterior.
+
+DURACION_PAGINA = 60 * 60
+
+# Tiempo máximo que el candado de recálculo bloquea a las demás peticiones
+DURACION_CANDADO = 30
+
+# Si no hay copia vieja, cuánto se espera a que otra petición termine de calcular
+ESPERA_MAXIMA = 2.0
+INTERVALO_ESPERA = 0.05
+
+
+def clave_pagina(request, nombre_vista):
+    """Ruta y querystring normalizado: el orden de los parámetros no cambia la clave."""
+    parametros = [(clave, valor) for clave, valores in request.GET.lists() for valor in valores]
+    return clave_pagina_ruta(request.path, nombre_vista, parametros)
+
+
+def clave_pagina_ruta(ruta, nombre_vista, parametros=()):
+    firma = hashlib.md5(f'{ruta}?{urlencode(sorted(parametros))}'.encode()).hexdigest()
+    return f'productos:pagina:{nombre_vista}:{firma}'
+
+
+def es_visita_anonima(request):
+    """GET de un visitante anónimo sin bolsa ni mensajes pendientes: su respuesta no es personal."""
+    if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+        return False
+    # Con bolsa anónima el menú muestra sus joyas: la página ya es personal
+    from carrito.anonimo import COOKIE_BOLSA
+    if COOKIE_BOLSA in request.COOKIES:
+        return False
+    # Un mensaje pendiente (p. ej. tras cerrar sesión) se muestra una sola vez
+    return not len(messages.get_messages(request))
+
+
+def _guardar_pagina(clave, version, respuesta):
+    # Solo respuestas completas y sin cookies: nada propio del visitante
+    if respuesta.status_code != 200 or respuesta.streaming or respuesta.cookies:
+        return
+    cache.set(clave, (version, respuesta.content, respuesta['Content-Type']), DURACION_PAGINA)
+
+
+def _respuesta(entrada, estado):
+    _version, contenido, tipo = entrada
+    respuesta = HttpResponse(contenido, content_type=tipo)
+    respuesta['X-Cache'] = estado
+    return respuesta
+
+
+def cache_pagina_anonima(vista):
+    """
+    Cachea la respuesta completa de una vista pública para visitantes anónimos.
+    La clave no incluye la versión del catálogo: se compara al leer, lo que
+    permite servir la copia vieja mientras se recalcula.
+    """
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if not es_visita_anonima(request):
+            return vista(request, *args, **kwargs)
+
+        version = version_catalogo()
+        clave = clave_pagina(request, vista.__name__)
+        entrada = cache.get(clave)
+        if entrada is not None and entrada[0] == version:
+            return _respuesta(entrada, 'HIT')
+
+        candado = f'{clave}:candado'
+        if not cache.add(candado, 1, DURACION_CANDADO):
+            # Otra petición ya está recalculando esta página
+            if entrada is not None:
+                return _respuesta(entrada, 'STALE')
+            entrada = _esperar_pagina(clave, version)
+            if entrada is not None:
+                return _respuesta(entrada, 'HIT')
+            return vista(request, *args, **kwargs)
+
+        try:
+            respuesta = vista(request, *args, **kwargs)
+            _guardar_pagina(clave, version, respuesta)
+        finally:
+            cache.delete(candado)
+        respuesta['X-Cache'] = 'MISS'
+        return respuesta
+
+    return envoltura
+
+
+def _esperar_pagina(clave, version):
+    limite = time.monotonic() + ESPERA_MAXIMA
+    while time.monotonic() < limite:
+        time.sleep(INTERVALO_ESPERA)
+        entrada = cache.get(clave)
+        if entrada is not None and entrada[0] == version:
+            return entrada
+    return None
@@ -0,0 +1,226 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+from .busqueda import buscar
+from .models import Producto
+
+# Tamaño fijo de página del catálogo público
+PRODUCTOS_POR_PAGINA = 24
+
+# Orden estable del catálogo: más recientes primero y el id como desempate
+ORDEN_CATALOGO = ('-fecha_creacion', 'id')
+
+# Con una búsqueda activa primero va lo más relevante
+ORDEN_BUSQUEDA = ('-relevancia', '-fecha_creacion', 'id')
+
+# Mismo criterio que precio_final: un precio_oferta de 0 cuenta como sin oferta
+CON_OFERTA = Q(precio_oferta__gt=0)
+SIN_OFERTA = Q(precio_oferta__isnull=True) | Q(precio_oferta__lte=0)
+
+# Órdenes que el cliente puede elegir; precio_final es una columna indexada
+ORDENES = {
+    'precio_asc': ('precio_final', 'id'),
+    'precio_desc': ('-precio_final', 'id'),
+}
+
+
+def leer_filtros(params):
+    """Normaliza los filtros del GET; los valores vacíos o inválidos quedan en None."""
+    oferta = params.get('oferta')
+    orden = params.get('orden')
+    return {
+        'q': (params.get('q') or '').strip() or None,
+        'categoria': params.get('categoria') or None,
+        'oferta': oferta if oferta in ('si', 'no') else None,
+        'min_p': _decimal(params.get('min_p')),
+        'max_p': _decimal(params.get('max_p')),
+        'orden': orden if orden in ORDENES else None,
+    }
+
+
+def base_catalogo(filtros, anotar=True):
+    """Productos activos que coinciden con la búsqueda, antes de los filtros del sidebar."""
+    productos = Producto.objects.select_related('categoria').filter(activo=True)
+    if filtros['q']:
+        productos = buscar(productos, filtros['q'], anotar=anotar)
+    return productos
+
+
+def condiciones_catalogo(filtros):
+    """
+    Retorna una condición Q por cada dimensión del sidebar (categoría, oferta y
+    precio). Las facetas las combinan por separado para contar cada opción.
+    """
+    condiciones = {'categoria': Q(), 'oferta': Q(), 'precio': Q()}
+
+    if filtros['categoria']:
+        condiciones['categoria'] = Q(categoria__slug=filtros['categoria'])
+
+    if filtros['oferta'] == 'si':
+        condiciones['oferta'] = CON_OFERTA
+    elif filtros['oferta'] == 'no':
+        condiciones['oferta'] = SIN_OFERTA
+
+    if filtros['min_p'] is not None:
+        condiciones['precio'] &= Q(precio_final__gte=filtros['min_p'])
+
+    if filtros['max_p'] is not None:
+        condiciones['precio'] &= Q(precio_final__lte=filtros['max_p'])
+
+    return condiciones
+
+
+def filtrar_catalogo(params):
+    """
+    Construye el queryset del catálogo público a partir de los parámetros GET.
+    Retorna el queryset (sin ordenar) y un diccionario con los filtros aplicados.
+    """
+    filtros = leer_filtros(params)
+    productos = base_catalogo(filtros)
+    for condicion in condiciones_catalogo(filtros).values():
+        if condicion:
+            productos = productos.filter(condicion)
+    return productos, filtros
+
+
+def filtrar_inventario(params):
+    """
+    Listado del inventario (administración): incluye productos inactivos y
+    filtra por búsqueda, id de categoría y oferta. Retorna (queryset ordenado, filtros).
+    """
+    categoria_id = params.get('categoria') or ''
+    filtros = {
+        'q': (params.get('q') or '').strip() or None,
+        'categoria_id': categoria_id if categoria_id.isdigit() else None,
+        'oferta': params.get('oferta') or None,
+    }
+    productos = Producto.objects.select_related('categoria').order_by('-fecha_creacion')
+
+    if filtros['q']:
+        # Búsqueda sobre el índice invertido, ordenada por relevancia
+        productos = buscar(productos, filtros['q']).order_by('-relevancia', '-fecha_creacion')
+
+    if filtros['categoria_id']:
+        productos = productos.filter(categoria_id=filtros['categoria_id'])
+
+    if filtros['oferta'] == 'si':
+        productos = productos.filter(CON_OFERTA)
+    elif filtros['oferta'] == 'no':
+        productos = productos.filter(SIN_OFERTA)
+
+    return productos, filtros
+
+
+def orden_catalogo(filtros):
+    if filtros['orden']:
+        return ORDENES[filtros['orden']]
+    return ORDEN_BUSQUEDA if filtros['q'] else ORDEN_CATALOGO
+
+
+def _decimal(valor):
+    """Convierte un precio del GET; los valores vacíos o inválidos se ignoran."""
+    if not valor:
+        return None
+    try:
+        numero = Decimal(valor)
+    except InvalidOperation:
+        return None
+    return numero if numero.is_finite() else None
+
+
+#  *************************************************************
+#         PAGINACIÓN POR CURSOR (KEYSET)
+#  *************************************************************
+# En lugar de OFFSET (que obliga a la BD a recorrer y descartar todas las
+# filas anteriores) se filtra a partir de la última fila entregada, así la
+# página N cuesta lo mismo que la primera.
+
+def paginar_keyset(queryset, orden, cursor=None, tamano=PRODUCTOS_POR_PAGINA):
+    """
+    Retorna (filas, siguiente_cursor). ``siguiente_cursor`` es None cuando no hay más filas.
+    Un cursor inválido o manipulado se ignora y se entrega la primera página.
+    """
+    valores = decodificar_cursor(cursor, queryset.model, orden)
+    if valores is not None:
+        queryset = queryset.filter(_condicion_keyset(orden, valores))
+
+    # Pedimos una fila extra solo para saber si existe una página siguiente
+    filas = list(queryset.order_by(*orden)[:tamano + 1])
+    siguiente = None
+    if len(filas) > tamano:
+        filas = filas[:tamano]
+        siguiente = codificar_cursor(filas[-1], orden)
+    return filas, siguiente
+
+
+def _condicion_keyset(orden, valores):
+    """
+    Traduce la comparación de tuplas (a, b) > (x, y) respetando la dirección
+    de cada campo: a > x OR (a = x AND b > y).
+    """
+    condicion = Q()
+    for i, campo in enumerate(orden):
+        nombre = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        parcial = Q(**{f'{nombre}__{operador}': valores[i]})
+        for previo, valor in zip(orden[:i], valores[:i]):
+            parcial &= Q(**{previo.lstrip('-'): valor})
+        condicion |= parcial
+
+    # Cota redundante sobre la primera columna para que el optimizador
+    # resuelva la consulta como un rango sobre el índice
+    primero = orden[0]
+    cota = 'lte' if primero.startswith('-') else 'gte'
+    return Q(**{f'{primero.lstrip("-")}__{cota}': valores[0]}) & condicion
+
+
+def _valor_cursor(valor):
+    if isinstance(valor, (datetime, date)):
+        # isoformat completo: conservar los microsegundos es indispensable
+        # para que la igualdad del desempate sea exacta
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def codificar_cursor(fila, orden):
+    valores = [_valor_cursor(getattr(fila, campo.lstrip('-'))) for campo in orden]
+    crudo = json.dumps(valores, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, modelo, orden):
+    if not cursor:
+        return None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(valores, list) or len(valores) != len(orden):
+        return None
+
+    convertidos = []
+    for campo, valor in zip(orden, valores):
+        if valor is None:
+            return None
+        try:
+            field = modelo._meta.get_field(campo.lstrip('-'))
+        except FieldDoesNotExist:
+            # Anotaciones (p. ej. relevancia) viajan como números planos
+            if not isinstance(valor, (int, float)):
+                return None
+            convertidos.append(valor)
+            continue
+        try:
+            convertidos.append(field.to_python(valor))
+        except ValidationError:
+            return None
+    return convertidos
@@ -0,0 +1,140 @@
+import hashlib
+from functools import wraps
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .api import CampoInvalido, leer_campos
+from .cache import es_visita_anonima, version_catalogo
+from .catalogo import base_catalogo, condiciones_catalogo, leer_filtros
+from .detalle import RELACIONADOS_DETALLE, vecinos
+from .models import Producto
+
+# Peticiones condicionales (ETag / Last-Modified): si el navegador o un proxy
+# ya tiene la versión vigente de la página se responde 304 sin renderizar.
+# Solo aplica a visitantes anónimos; para un usuario autenticado la página
+# incluye su carrito y su token CSRF, que no se reflejan en estos validadores.
+
+# Los validadores del catálogo se guardan bajo la versión vigente
+DURACION_VALIDADORES = 60 * 60
+
+
+def respuesta_condicional(validadores):
+    """
+    ``validadores(request, *args, **kwargs)`` retorna (etag, ultima_modificacion)
+    o None si no puede calcularlos (p. ej. el producto no existe); en ese caso
+    la vista responde normalmente.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if not es_visita_anonima(request):
+                return vista(request, *args, **kwargs)
+
+            calculados = validadores(request, *args, **kwargs)
+            if calculados is None:
+                return vista(request, *args, **kwargs)
+
+            etag = quote_etag(calculados[0])
+            ultima_modificacion = int(calculados[1].timestamp()) if calculados[1] else None
+            respuesta = get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+            if respuesta is None:
+                respuesta = vista(request, *args, **kwargs)
+
+            if respuesta.status_code in (200, 304):
+                respuesta.headers.setdefault('ETag', etag)
+                if ultima_modificacion is not None:
+                    respuesta.headers.setdefault('Last-Modified', http_date(ultima_modificacion))
+                # Se puede guardar, pero hay que revalidar antes de reutilizarla
+                patch_cache_control(respuesta, no_cache=True)
+            return respuesta
+
+        return envoltura
+    return decorador
+
+
+def _firma(*partes):
+    return hashlib.md5('|'.join(str(parte) for parte in partes).encode()).hexdigest()
+
+
+def validadores_detalle(request, id):
+    """
+    Fecha del producto, de su galería, el nombre de la categoría y los
+    "comprados juntos" que muestra la página: cuáles son y la fecha de cada
+    uno (nombre, precio e imagen). Recalcular las recomendaciones marca la
+    fecha de los productos tocados (ver pedidos/recomendaciones.py).
+    """
+    fila = (
+        Producto.objects.filter(id=id, activo=True)
+        .annotate(ultima_imagen=Max('imagenes__fecha_creacion'))
+        .values('fecha_actualizacion', 'ultima_imagen', 'categoria__nombre')
+        .first()
+    )
+    if fila is None:
+        return None
+    relacionados = list(
+        vecinos(id).values_list('relacionado_id', 'relacionado__fecha_actualizacion')[:RELACIONADOS_DETALLE]
+    )
+    fechas = [fila['fecha_actualizacion'], fila['ultima_imagen'], *(fecha for _id, fecha in relacionados)]
+    ultima = max(f for f in fechas if f is not None)
+    etag = _firma(
+        'detalle', id, fila['fecha_actualizacion'].isoformat(), ultima.isoformat(), fila['categoria__nombre'],
+        [(relacionado_id, fecha.isoformat()) for relacionado_id, fecha in relacionados],
+    )
+    return etag, ultima
+
+
+def validadores_catalogo(request):
+    """
+    Last-Modified es el MAX(fecha_actualizacion) del conjunto filtrado. El ETag
+    además cubre todo lo que ve el sidebar (la búsqueda sin sus filtros) y su
+    tamaño, para detectar productos eliminados o desactivados; la versión del
+    catálogo cubre los cambios de categorías, que no tienen fecha propia.
+    """
+    version = version_catalogo()
+    clave = f'productos:validadores:{version}:{_firma(sorted(request.GET.lists()))}'
+    calculados = cache.get(clave)
+    if calculados is not None:
+        return calculados
+
+    filtros = leer_filtros(request.GET)
+    filtro = Q()
+    for condicion in condiciones_catalogo(filtros).values():
+        filtro &= condicion
+
+    # Un solo agregado: el máximo del conjunto filtrado es condicional
+    resumen = base_catalogo(filtros, anotar=False).aggregate(
+        ultima=Max('fecha_actualizacion', filter=filtro or None),
+        ultima_base=Max('fecha_actualizacion'),
+        total_base=Count('id'),
+    )
+    etag = _firma('catalogo', version, sorted(request.GET.lists()), resumen['ultima_base'], resumen['total_base'])
+    calculados = (etag, resumen['ultima'])
+    cache.set(clave, calculados, DURACION_VALIDADORES)
+    return calculados
+
+
+def validadores_categorias(request):
+    # Categoria no tiene fecha propia: la versión del catálogo cambia con cada edición
+    return _firma('categorias', version_catalogo()), None
+
+
+def validadores_api(validadores, campos_por_defecto):
+    """
+    Los mismos validadores para la versión JSON de un recurso. El JSON es otra
+    representación, y cada ?fields= otra más: el ETag se firma con 'api' y los
+    campos pedidos ya normalizados, así nunca coincide con el de la página HTML.
+    """
+    def calcular(request, *args, **kwargs):
+        calculados = validadores(request, *args, **kwargs)
+        if calculados is None:
+            return None
+        try:
+            campos = leer_campos(request.GET.get('fields'), campos_por_defecto)
+        except CampoInvalido:
+            # La vista responde 400
+            return None
+        return _firma('api', calculados[0], ','.join(campos)), calculados[1]
+    return calcular
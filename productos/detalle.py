@@ -0,0 +1,173 @@
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import Prefetch
+from django.http import Http404
+from django.urls import reverse
+
+from .cache import clave_pagina_ruta, version_catalogo
+from .models import CompraConjunta, Producto, ProductoImagen
+
+DURACION_DETALLE = 60 * 60 * 24
+
+# Productos del bloque "comprados juntos con frecuencia"
+RELACIONADOS_DETALLE = 4
+
+
+@dataclass(frozen=True)
+class Archivo:
+    """Lo que la plantilla usa de un ImageField: nombre y URL."""
+    name: str
+    url: str
+
+    def __bool__(self):
+        return bool(self.name)
+
+
+@dataclass(frozen=True)
+class Imagen:
+    # Mismos atributos que espera {% imagen_responsive %}
+    imagen: Archivo
+    imagen_variantes: dict
+
+
+@dataclass(frozen=True)
+class Relacionado:
+    id: int
+    nombre: str
+    precio: Decimal
+    precio_final: Decimal
+    imagen: Archivo
+    imagen_variantes: dict
+
+
+@dataclass(frozen=True)
+class ProductoDetalle:
+    """
+    Datos ya resueltos de la página de un producto. Se arma con un número fijo
+    de consultas y se guarda en la caché: la plantilla no dispara consultas
+    sin importar el tamaño de la galería.
+    """
+    id: int
+    codigo: str
+    nombre: str
+    descripcion: str
+    categoria: str
+    precio: Decimal
+    precio_oferta: Decimal | None
+    ahorro_porcentaje: int
+    stock: int
+    tamano: Decimal | None
+    unidad_tamano: str
+    grosor: Decimal | None
+    unidad_grosor: str
+    imagen: Archivo
+    imagen_variantes: dict
+    galeria: tuple[Imagen, ...]
+    relacionados: tuple[Relacionado, ...]
+
+
+def clave_detalle(producto_id):
+    # La versión del catálogo cambia con cada señal de producto, categoría,
+    # unidad o galería y con las operaciones masivas. Un UPDATE de stock
+    # borra solo las fichas de sus productos (ver invalidar_fichas)
+    return f'productos:detalle:{version_catalogo()}:{producto_id}'
+
+
+def invalidar_fichas(producto_ids):
+    """
+    Borra la ficha cacheada y la página anónima de cada producto, lo que hace
+    un cambio de stock en lugar de invalidar_catalogo: una reserva no vacía
+    las cachés de todo el catálogo. Las tarjetas cambian solas de clave con
+    fecha_actualizacion; un listado cacheado para anónimos puede mostrar el
+    stock anterior hasta que venza, y al agregar a la bolsa manda el UPDATE
+    condicional de carrito/reservas.py.
+    """
+    claves = []
+    for producto_id in producto_ids:
+        claves.append(clave_detalle(producto_id))
+        claves.append(clave_pagina_ruta(reverse('productos:productodetalle', args=[producto_id]), 'productoDetalle'))
+    if claves:
+        cache.delete_many(claves)
+
+
+def detalle_producto(producto_id):
+    """Retorna el ProductoDetalle de un producto activo o lanza Http404."""
+    clave = clave_detalle(producto_id)
+    detalle = cache.get(clave)
+    if detalle is None:
+        detalle = construir_detalle(producto_id)
+        cache.set(clave, detalle, DURACION_DETALLE)
+    return detalle
+
+
+def construir_detalle(producto_id):
+    # Tres consultas: el producto con sus llaves foráneas, la galería completa
+    # y los vecinos precalculados (ver pedidos/recomendaciones.py)
+    producto = (
+        Producto.objects.select_related('categoria', 'unidad_tamano', 'unidad_grosor')
+        .prefetch_related(Prefetch('imagenes', queryset=ProductoImagen.objects.order_by('id')))
+        .filter(id=producto_id, activo=True)
+        .first()
+    )
+    if producto is None:
+        raise Http404('Producto no encontrado')
+
+    return ProductoDetalle(
+        id=producto.id,
+        codigo=producto.codigo,
+        nombre=producto.nombre,
+        descripcion=producto.descripcion,
+        categoria=producto.categoria.nombre,
+        precio=producto.precio,
+        precio_oferta=producto.precio_oferta,
+        ahorro_porcentaje=ahorro_porcentaje(producto.precio, producto.precio_oferta),
+        stock=producto.stock,
+        tamano=producto.tamano,
+        unidad_tamano=producto.unidad_tamano.simbolo if producto.unidad_tamano else '',
+        grosor=producto.grosor,
+        unidad_grosor=producto.unidad_grosor.simbolo if producto.unidad_grosor else '',
+        imagen=_archivo(producto.imagen),
+        imagen_variantes=producto.imagen_variantes,
+        galeria=tuple(
+            Imagen(imagen=_archivo(img.imagen), imagen_variantes=img.imagen_variantes)
+            for img in producto.imagenes.all()
+        ),
+        relacionados=relacionados(producto.id),
+    )
+
+
+def vecinos(producto_id):
+    """CompraConjunta que muestra la página, los más frecuentes primero (ver validadores_detalle)."""
+    return (
+        CompraConjunta.objects.filter(producto_id=producto_id, relacionado__activo=True)
+        .order_by('-veces', 'relacionado_id')
+    )
+
+
+def relacionados(producto_id, limite=RELACIONADOS_DETALLE):
+    return tuple(
+        Relacionado(
+            id=vecino.relacionado.id,
+            nombre=vecino.relacionado.nombre,
+            precio=vecino.relacionado.precio,
+            precio_final=vecino.relacionado.precio_final,
+            imagen=_archivo(vecino.relacionado.imagen),
+            imagen_variantes=vecino.relacionado.imagen_variantes,
+        )
+        for vecino in vecinos(producto_id).select_related('relacionado')[:limite]
+    )
+
+
+def ahorro_porcentaje(precio, precio_oferta):
+    if not precio_oferta or precio <= 0:
+        return 0
+    return round((precio - precio_oferta) / precio * 100)
+
+
+def _archivo(campo):
+    if not campo:
+        return Archivo(name='', url='')
+    return Archivo(name=campo.name, url=default_storage.url(campo.name))
@@ -0,0 +1,133 @@
+import hashlib
+import json
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .cache import version_catalogo
+from .catalogo import CON_OFERTA, SIN_OFERTA, base_catalogo, condiciones_catalogo
+from .models import Categoria
+
+# Límites de los rangos de precio del sidebar (pesos colombianos)
+LIMITES_PRECIO = (50000, 100000, 200000, 500000)
+
+DURACION_CACHE = 60 * 10
+
+
+def rangos_precio():
+    """
+    Retorna [(min_p, max_p), ...]. Los precios tienen dos decimales, así que
+    cerrar cada rango en límite - 0.01 evita que un precio cuente en dos rangos.
+    """
+    bordes = [None] + [Decimal(limite) for limite in LIMITES_PRECIO] + [None]
+    rangos = []
+    for desde, hasta in zip(bordes, bordes[1:]):
+        rangos.append((desde, hasta - Decimal('0.01') if hasta is not None else None))
+    return rangos
+
+
+def categorias_catalogo():
+    """Lista de categorías para el sidebar, cacheada con la versión del catálogo."""
+    clave = f'productos:categorias:{version_catalogo()}'
+    categorias = cache.get(clave)
+    if categorias is None:
+        categorias = list(Categoria.objects.order_by('nombre'))
+        cache.set(clave, categorias, DURACION_CACHE)
+    return categorias
+
+
+def calcular_facetas(filtros):
+    """
+    Cuenta productos por categoría, con/sin oferta y por rango de precio en una
+    sola consulta agregada. Cada grupo ignora su propio filtro (para mostrar las
+    alternativas) pero respeta los demás.
+    """
+    # El orden no cambia los conteos, así que no forma parte de la firma
+    firma_filtros = {nombre: valor for nombre, valor in filtros.items() if nombre != 'orden'}
+    firma = hashlib.md5(json.dumps(firma_filtros, sort_keys=True, default=str).encode()).hexdigest()
+    clave = f'productos:facetas:{version_catalogo()}:{firma}'
+    facetas = cache.get(clave)
+    if facetas is not None:
+        return facetas
+
+    categorias = categorias_catalogo()
+    condiciones = condiciones_catalogo(filtros)
+    sin_categoria = condiciones['oferta'] & condiciones['precio']
+    sin_oferta = condiciones['categoria'] & condiciones['precio']
+    sin_precio = condiciones['categoria'] & condiciones['oferta']
+
+    agregados = {'total': Count('pk', filter=sin_categoria & condiciones['categoria'])}
+    for categoria in categorias:
+        agregados[f'categoria_{categoria.pk}'] = Count('pk', filter=sin_categoria & Q(categoria_id=categoria.pk))
+    agregados['oferta_si'] = Count('pk', filter=sin_oferta & CON_OFERTA)
+    agregados['oferta_no'] = Count('pk', filter=sin_oferta & SIN_OFERTA)
+    rangos = rangos_precio()
+    for i, (desde, hasta) in enumerate(rangos):
+        rango = Q()
+        if desde is not None:
+            rango &= Q(precio_final__gte=desde)
+        if hasta is not None:
+            rango &= Q(precio_final__lte=hasta)
+        agregados[f'rango_{i}'] = Count('pk', filter=sin_precio & rango)
+
+    conteos = base_catalogo(filtros, anotar=False).aggregate(**agregados)
+
+    facetas = {
+        'total': conteos['total'],
+        'categorias': [(categoria, conteos[f'categoria_{categoria.pk}']) for categoria in categorias],
+        'oferta': {'si': conteos['oferta_si'], 'no': conteos['oferta_no']},
+        'rangos': [(desde, hasta, conteos[f'rango_{i}']) for i, (desde, hasta) in enumerate(rangos)],
+    }
+    cache.set(clave, facetas, DURACION_CACHE)
+    return facetas
+
+
+def _querystring(params, **cambios):
+    """Copia los filtros actuales aplicando los cambios; siempre vuelve a la primera página."""
+    nuevos = params.copy()
+    nuevos.pop('cursor', None)
+    for nombre, valor in cambios.items():
+        nuevos.pop(nombre, None)
+        if valor is not None:
+            nuevos[nombre] = str(valor)
+    return nuevos.urlencode()
+
+
+def opciones_sidebar(params, filtros, facetas):
+    """Arma las opciones del sidebar (etiqueta, conteo, querystring y si está activa)."""
+    categorias = [
+        {
+            'nombre': categoria.nombre,
+            'conteo': conteo,
+            'qs': _querystring(params, categoria=categoria.slug),
+            'activa': filtros['categoria'] == categoria.slug,
+        }
+        for categoria, conteo in facetas['categorias']
+    ]
+    oferta = [
+        {
+            'nombre': nombre,
+            'conteo': facetas['oferta'][valor],
+            'qs': _querystring(params, oferta=None if filtros['oferta'] == valor else valor),
+            'activa': filtros['oferta'] == valor,
+        }
+        for valor, nombre in (('si', 'En oferta'), ('no', 'Precio regular'))
+    ]
+    rangos = []
+    for desde, hasta, conteo in facetas['rangos']:
+        activa = filtros['min_p'] == desde and filtros['max_p'] == hasta
+        rangos.append({
+            'desde': desde,
+            'hasta': hasta,
+            'conteo': conteo,
+            'qs': _querystring(params, min_p=None, max_p=None) if activa else _querystring(params, min_p=desde, max_p=hasta),
+            'activa': activa,
+        })
+    return {
+        'total': facetas['total'],
+        'todas_qs': _querystring(params, categoria=None),
+        'categorias': categorias,
+        'oferta': oferta,
+        'rangos': rangos,
+    }
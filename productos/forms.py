@@ -1,4 +1,6 @@
 from django import forms
+from django.db import transaction
+from carrito.reservas import ajustar_stock
 from .models import UnidadMedida, Categoria, Producto, ProductoImagen
 from django.forms import inlineformset_factory 
 
@@ -43,6 +45,31 @@ class ProductoForm(forms.ModelForm):
             'stock': forms.NumberInput(attrs={'class': 'form-control'}),
             'activo': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
+        labels = {'stock': 'Stock libre'}
+        help_texts = {
+            'stock': 'Unidades disponibles para la venta, sin contar las reservadas en bolsas de clientes.',
+        }
+
+    # stock es el libre y cambia con cada reserva: se guarda la diferencia con
+    # el valor que vio el administrador, no el número absoluto
+    stock_leido = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['stock_leido'].initial = self.instance.stock
+
+    def save(self, commit=True):
+        leido = self.cleaned_data.get('stock_leido')
+        if self.instance._state.adding or not commit or leido is None:
+            return super().save(commit)
+        producto = super().save(commit=False)
+        campos = [campo.name for campo in Producto._meta.concrete_fields if not campo.primary_key and campo.name != 'stock']
+        with transaction.atomic():
+            producto.save(update_fields=campos)
+            ajustar_stock(producto.pk, self.cleaned_data['stock'] - leido)
+        self._save_m2m()
+        producto.refresh_from_db(fields=['stock'])
+        return producto
 
 # Creamos el conjunto de formularios para las imágenes
 ProductoImagenFormSet = inlineformset_factory(
@@ -51,4 +78,30 @@ ProductoImagenFormSet = inlineformset_factory(
     fields=['imagen'], 
     extra=3,      # Número de espacios vacíos para nuevas imágenes
     can_delete=True # Permite borrar imágenes en la edición
-)
\ No newline at end of file
+)
+# Formulario de operaciones masivas de precios (ver productos/precios.py)
+class PreciosMasivosForm(forms.Form):
+    OPERACIONES = [
+        ('descuento', 'Aplicar descuento (%) como precio de oferta'),
+        ('quitar_ofertas', 'Quitar ofertas'),
+        ('lista', 'Cargar lista de precios (CSV)'),
+    ]
+
+    operacion = forms.ChoiceField(choices=OPERACIONES, widget=forms.Select(attrs={'class': 'form-select'}))
+    porcentaje = forms.DecimalField(
+        required=False, min_value=0.01, max_value=99.99, decimal_places=2,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'placeholder': 'Ej: 15'}),
+    )
+    archivo = forms.FileField(
+        required=False, help_text='Columnas: codigo, precio y opcionalmente precio_oferta',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'}),
+    )
+
+    def clean(self):
+        datos = super().clean()
+        operacion = datos.get('operacion')
+        if operacion == 'descuento' and datos.get('porcentaje') is None:
+            self.add_error('porcentaje', 'Indica el porcentaje de descuento.')
+        if operacion == 'lista' and not datos.get('archivo'):
+            self.add_error('archivo', 'Adjunta la lista de precios.')
+        return datos
@@ -0,0 +1,109 @@
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .cache import invalidar_catalogo
+from .models import Producto
+
+# Ancho máximo en px de cada derivado; el alto conserva la proporción
+VARIANTES = {
+    'thumb': 96,
+    'card': 480,
+    'detail': 960,
+    'zoom': 1600,
+}
+
+CALIDAD = {'avif': 55, 'webp': 80}
+
+
+def formatos_disponibles():
+    """AVIF solo si Pillow fue compilado con soporte; WebP siempre."""
+    return [formato for formato in ('avif', 'webp') if features.check(formato)]
+
+
+def _ruta_variante(nombre, variante, formato):
+    # La extensión del original queda en el nombre: 'a.jpg' y 'a.png' en la
+    # misma carpeta no comparten (ni se pisan) los derivados
+    carpeta, archivo = posixpath.split(nombre)
+    base, extension = posixpath.splitext(archivo)
+    if extension:
+        base = f'{base}-{extension[1:]}'
+    return posixpath.join(carpeta, 'variantes', f'{base}-{variante}.{formato}')
+
+
+def _preparar(imagen):
+    imagen = ImageOps.exif_transpose(imagen)
+    if imagen.mode in ('P', 'LA'):
+        return imagen.convert('RGBA')
+    if imagen.mode not in ('RGB', 'RGBA'):
+        return imagen.convert('RGB')
+    return imagen
+
+
+def generar_variantes(archivo):
+    """
+    Genera los derivados de un ImageField en cada formato disponible. Retorna
+    el diccionario que se guarda en ``imagen_variantes``:
+    {'origen': nombre, 'variantes': {'card': {'ancho': .., 'alto': .., 'webp': ruta}, ...}}
+    """
+    with archivo.open('rb') as origen:
+        original = _preparar(Image.open(origen))
+        original.load()
+
+    variantes = {}
+    for variante, ancho in VARIANTES.items():
+        copia = original.copy()
+        # Nunca se amplía: una imagen pequeña genera derivados de su tamaño
+        copia.thumbnail((ancho, ancho * 4), Image.LANCZOS)
+        datos = {'ancho': copia.width, 'alto': copia.height}
+        for formato in formatos_disponibles():
+            ruta = _ruta_variante(archivo.name, variante, formato)
+            contenido = ContentFile(b'')
+            copia.save(contenido, format=formato.upper(), quality=CALIDAD[formato])
+            if default_storage.exists(ruta):
+                default_storage.delete(ruta)
+            datos[formato] = default_storage.save(ruta, contenido)
+        variantes[variante] = datos
+    return {'origen': archivo.name, 'variantes': variantes}
+
+
+def _rutas(imagen_variantes):
+    return {
+        datos[formato]
+        for datos in (imagen_variantes or {}).get('variantes', {}).values()
+        for formato in ('avif', 'webp')
+        if datos.get(formato)
+    }
+
+
+def eliminar_variantes(imagen_variantes, conservar=()):
+    for ruta in _rutas(imagen_variantes) - set(conservar):
+        if default_storage.exists(ruta):
+            default_storage.delete(ruta)
+
+
+def variantes_pendientes(instancia):
+    """True si la imagen actual aún no tiene derivados (nueva o reemplazada)."""
+    if not instancia.imagen:
+        return False
+    return (instancia.imagen_variantes or {}).get('origen') != instancia.imagen.name
+
+
+def procesar_imagen(instancia):
+    """
+    Genera los derivados de ``instancia.imagen`` (un Producto o ProductoImagen)
+    y los guarda con un UPDATE, sin volver a disparar las señales de guardado.
+    """
+    anteriores = instancia.imagen_variantes
+    instancia.imagen_variantes = generar_variantes(instancia.imagen)
+    # Derivados de la imagen reemplazada, o guardados con otro nombre
+    eliminar_variantes(anteriores, conservar=_rutas(instancia.imagen_variantes))
+    type(instancia).objects.filter(pk=instancia.pk).update(imagen_variantes=instancia.imagen_variantes)
+
+    # Las tarjetas, páginas y ETags cacheados dependen de la fecha del producto
+    producto_id = getattr(instancia, 'producto_id', instancia.pk)
+    Producto.objects.filter(pk=producto_id).update(fecha_actualizacion=timezone.now())
+    invalidar_catalogo()
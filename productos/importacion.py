@@ -0,0 +1,270 @@
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from carrito.reservas import fijar_stock
+
+from .busqueda import indexar_productos
+from .models import Categoria, Producto, UnidadMedida
+
+# Columnas del archivo, en el orden en que se exportan. stock son las unidades
+# libres, sin las reservadas en bolsas de clientes (ver carrito/reservas.py):
+# al importar, lo reservado sigue reservado y vuelve al stock si se libera
+COLUMNAS = [
+    'codigo', 'nombre', 'descripcion', 'precio', 'precio_oferta',
+    'tamano', 'unidad_tamano', 'grosor', 'unidad_grosor',
+    'categoria', 'stock', 'activo', 'imagen',
+]
+
+# Columnas que se validan con el campo del modelo tal cual
+CAMPOS_DIRECTOS = ['codigo', 'nombre', 'descripcion', 'precio', 'precio_oferta', 'tamano', 'grosor', 'stock', 'imagen']
+
+# Una fila que crea un producto debe traer al menos estas columnas
+REQUERIDOS_NUEVOS = {'nombre', 'descripcion', 'precio', 'categoria'}
+
+# Si una actualización no toca estos campos no hace falta reindexar la búsqueda
+CAMPOS_BUSQUEDA = {'codigo', 'nombre', 'descripcion', 'categoria'}
+
+VERDADEROS = {'1', 'si', 'sí', 'true', 'x', 'activo'}
+FALSOS = {'0', 'no', 'false', 'inactivo'}
+
+
+class ErrorFila(Exception):
+    pass
+
+
+def leer_filas(archivo, formato):
+    """Genera (numero_de_linea, dict) sin cargar el archivo completo en memoria."""
+    if formato == 'csv':
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            yield lector.line_num, fila
+        return
+    for numero, linea in enumerate(archivo, start=1):
+        if not linea.strip():
+            continue
+        try:
+            fila = json.loads(linea)
+        except ValueError as error:
+            yield numero, error
+            continue
+        yield numero, fila
+
+
+def por_bloques(filas, tamano):
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) == tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+class Importador:
+    """
+    Inserta o actualiza productos por bloques, usando ``codigo`` como clave.
+    Cada bloque va en su propia transacción: un bloque con errores de base de
+    datos se reintenta fila por fila para aislar las filas problemáticas.
+    """
+
+    def __init__(self, al_error=None):
+        self.al_error = al_error or (lambda numero, codigo, mensaje: None)
+        # Categorías y unidades son pocas: se resuelven en memoria por nombre/símbolo
+        self.categorias = {normalizar(c.nombre): c for c in Categoria.objects.all()}
+        self.unidades = {}
+        for unidad in UnidadMedida.objects.all():
+            self.unidades.setdefault(normalizar(unidad.simbolo), unidad)
+            self.unidades.setdefault(normalizar(unidad.nombre), unidad)
+        self.campos = {nombre: Producto._meta.get_field(nombre) for nombre in CAMPOS_DIRECTOS}
+        self.creados = self.actualizados = self.sin_cambios = self.errores = 0
+
+    def importar_bloque(self, bloque):
+        """``bloque`` es una lista de (numero, fila). Retorna la cantidad de filas procesadas."""
+        validas = {}
+        for numero, fila in bloque:
+            try:
+                if not isinstance(fila, dict):
+                    raise ErrorFila(f'Fila ilegible: {fila}')
+                valores = self.convertir(fila)
+                if valores['codigo'] in validas:
+                    raise ErrorFila('Código repetido dentro del mismo bloque')
+            except ErrorFila as error:
+                self.registrar_error(numero, fila, str(error))
+                continue
+            validas[valores['codigo']] = (numero, valores)
+
+        # Los contadores se suman solo cuando la transacción se confirmó: un
+        # bloque que falla se reintenta fila por fila y no debe contar dos veces
+        try:
+            with transaction.atomic():
+                rechazadas, conteos = self.guardar(list(validas.values()))
+        except IntegrityError:
+            rechazadas = []
+            for numero, valores in validas.values():
+                try:
+                    with transaction.atomic():
+                        rechazadas_fila, conteos = self.guardar([(numero, valores)])
+                except IntegrityError as error:
+                    rechazadas.append((numero, valores, str(error)))
+                else:
+                    rechazadas += rechazadas_fila
+                    self.contar(*conteos)
+        else:
+            self.contar(*conteos)
+        for numero, valores, mensaje in rechazadas:
+            self.registrar_error(numero, valores, mensaje)
+        return len(bloque)
+
+    def guardar(self, filas):
+        """
+        Escribe las filas válidas. Retorna las rechazadas como (numero, valores,
+        mensaje) y los conteos (creados, actualizados, sin_cambios).
+        """
+        rechazadas = []
+        if not filas:
+            return rechazadas, (0, 0, 0)
+        ahora = timezone.now()
+        # Filas bloqueadas hasta el final del bloque: ninguna reserva cambia el
+        # stock entre la lectura y la escritura
+        existentes = Producto.objects.select_related('categoria').select_for_update(of=('self',)).in_bulk(
+            [valores['codigo'] for _numero, valores in filas], field_name='codigo',
+        )
+        nuevos, modificados, campos = [], [], set()
+        sin_cambios = 0
+        for numero, valores in filas:
+            producto = existentes.get(valores['codigo'])
+            if producto is None:
+                faltantes = REQUERIDOS_NUEVOS.difference(valores)
+                if faltantes:
+                    rechazadas.append((numero, valores, f"Producto nuevo sin: {', '.join(sorted(faltantes))}"))
+                    continue
+                producto = Producto(**valores)
+                # El código es único, así que el slug también lo es
+                producto.slug = slugify(f"{valores['nombre']} {valores['codigo']}")[:250]
+                producto.fecha_actualizacion = ahora
+                nuevos.append(producto)
+                continue
+            for campo, valor in valores.items():
+                setattr(producto, campo, valor)
+            # Reimportar un archivo sin cambios no escribe nada
+            cambiados = producto.campos_cambiados
+            if not cambiados:
+                sin_cambios += 1
+                continue
+            campos.update(cambiados)
+            # bulk_update no aplica auto_now: la fecha invalida tarjetas y ETags cacheados
+            producto.fecha_actualizacion = ahora
+            modificados.append(producto)
+
+        if nuevos:
+            Producto.objects.bulk_create(nuevos)
+            # MySQL no retorna los ids de un INSERT múltiple
+            ids = dict(Producto.objects.filter(codigo__in=[p.codigo for p in nuevos]).values_list('codigo', 'id'))
+            for producto in nuevos:
+                producto.pk = ids[producto.codigo]
+        if modificados:
+            Producto.objects.bulk_update(modificados, [*sorted(campos - {'stock'}), 'fecha_actualizacion'])
+            # El stock va por el módulo de reservas, como toda escritura de stock
+            fijar_stock({p.pk: p.stock for p in modificados if 'stock' in p.campos_cambiados})
+
+        indexar_productos(nuevos + [p for p in modificados if CAMPOS_BUSQUEDA.intersection(p.campos_cambiados)])
+        return rechazadas, (len(nuevos), len(modificados), sin_cambios)
+
+    def contar(self, creados, actualizados, sin_cambios):
+        self.creados += creados
+        self.actualizados += actualizados
+        self.sin_cambios += sin_cambios
+
+    def convertir(self, fila):
+        """Valida una fila y retorna solo las columnas presentes, ya convertidas."""
+        fila = {clave.strip().lower(): valor for clave, valor in fila.items() if clave}
+        if not str(fila.get('codigo') or '').strip():
+            raise ErrorFila('Falta el código')
+
+        valores = {}
+        for nombre, campo in self.campos.items():
+            if nombre not in fila:
+                continue
+            valor = fila[nombre]
+            valor = valor.strip() if isinstance(valor, str) else valor
+            if valor in ('', None):
+                valor = None if campo.null else ('' if nombre == 'imagen' else valor)
+            try:
+                valores[nombre] = campo.clean(valor, None)
+            except ValidationError as error:
+                raise ErrorFila(f"{nombre}: {' '.join(error.messages)}")
+
+        if 'categoria' in fila:
+            categoria = self.categorias.get(normalizar(fila['categoria']))
+            if categoria is None:
+                raise ErrorFila(f"Categoría desconocida: {fila['categoria']}")
+            valores['categoria'] = categoria
+
+        for columna in ('unidad_tamano', 'unidad_grosor'):
+            if columna in fila:
+                valores[columna] = self.unidad(fila[columna])
+
+        if 'activo' in fila:
+            valores['activo'] = booleano(fila['activo'])
+        return valores
+
+    def unidad(self, valor):
+        if valor in ('', None):
+            return None
+        unidad = self.unidades.get(normalizar(valor))
+        if unidad is None:
+            raise ErrorFila(f'Unidad de medida desconocida: {valor}')
+        return unidad
+
+    def registrar_error(self, numero, fila, mensaje):
+        self.errores += 1
+        codigo = fila.get('codigo', '') if isinstance(fila, dict) else ''
+        self.al_error(numero, codigo, mensaje)
+
+
+def normalizar(texto):
+    return str(texto or '').strip().lower()
+
+
+def booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    texto = normalizar(valor)
+    if texto in VERDADEROS:
+        return True
+    if texto in FALSOS or texto == '':
+        return False
+    raise ErrorFila(f'activo: valor no reconocido ({valor})')
+
+
+def fila_exportada(producto):
+    """Producto -> dict con las mismas columnas que acepta la importación."""
+    return {
+        'codigo': producto.codigo,
+        'nombre': producto.nombre,
+        'descripcion': producto.descripcion,
+        'precio': str(producto.precio),
+        'precio_oferta': str(producto.precio_oferta) if producto.precio_oferta is not None else '',
+        'tamano': str(producto.tamano) if producto.tamano is not None else '',
+        'unidad_tamano': producto.unidad_tamano.simbolo if producto.unidad_tamano else '',
+        'grosor': str(producto.grosor) if producto.grosor is not None else '',
+        'unidad_grosor': producto.unidad_grosor.simbolo if producto.unidad_grosor else '',
+        'categoria': producto.categoria.nombre,
+        'stock': producto.stock,
+        'activo': 'si' if producto.activo else 'no',
+        'imagen': producto.imagen.name or '',
+    }
+
+
+def productos_exportables(lote=2000):
+    return (
+        Producto.objects.select_related('categoria', 'unidad_tamano', 'unidad_grosor')
+        .order_by('pk')
+        .iterator(chunk_size=lote)
+    )
@@ -0,0 +1,45 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from productos.importacion import COLUMNAS, fila_exportada, productos_exportables
+
+
+class Command(BaseCommand):
+    help = 'Exporta los productos a CSV o JSONL con las columnas que acepta importar_productos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta de salida ('-' para la salida estándar)")
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Por defecto se deduce de la extensión')
+        parser.add_argument('--lote', type=int, default=2000, help='Filas leídas por consulta (por defecto 2000)')
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        formato = options['formato'] or ('jsonl' if ruta.endswith(('.jsonl', '.ndjson')) else 'csv')
+        salida = sys.stdout if ruta == '-' else open(ruta, 'w', encoding='utf-8', newline='')
+
+        inicio = time.monotonic()
+        total = 0
+        try:
+            if formato == 'csv':
+                escritor = csv.DictWriter(salida, fieldnames=COLUMNAS)
+                escritor.writeheader()
+                escribir = escritor.writerow
+            else:
+                escribir = lambda fila: salida.write(json.dumps(fila, ensure_ascii=False) + '\n')
+
+            for producto in productos_exportables(options['lote']):
+                escribir(fila_exportada(producto))
+                total += 1
+        finally:
+            if salida is not sys.stdout:
+                salida.close()
+
+        if ruta != '-':
+            duracion = time.monotonic() - inicio
+            self.stdout.write(self.style.SUCCESS(
+                f'Se exportaron {total} productos en {duracion:.1f} s ({total / max(duracion, 0.001) * 60:.0f} filas/min).'
+            ))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from productos.imagenes import procesar_imagen, variantes_pendientes
+from productos.models import Producto, ProductoImagen
+
+
+class Command(BaseCommand):
+    help = 'Genera los derivados (thumb, card, detail, zoom) de las imágenes que aún no los tienen'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true', help='Regenera también las imágenes que ya tienen derivados')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        total = 0
+        for modelo in (Producto, ProductoImagen):
+            instancias = modelo.objects.exclude(imagen='').exclude(imagen__isnull=True).order_by('pk')
+            for instancia in instancias.iterator(chunk_size=200):
+                if not options['todas'] and not variantes_pendientes(instancia):
+                    continue
+                try:
+                    procesar_imagen(instancia)
+                except (OSError, ValueError) as error:
+                    self.stderr.write(f'  {modelo.__name__} {instancia.pk}: {error}')
+                    continue
+                total += 1
+
+        duracion = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(f'Se generaron derivados de {total} imágenes en {duracion:.1f} s.'))
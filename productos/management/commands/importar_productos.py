@@ -0,0 +1,55 @@
+import csv
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.cache import invalidar_catalogo
+from productos.importacion import Importador, leer_filas, por_bloques
+
+
+class Command(BaseCommand):
+    help = 'Importa productos desde CSV o JSONL (inserta o actualiza por código)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo .csv o .jsonl')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Por defecto se deduce de la extensión')
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por transacción (por defecto 1000)')
+        parser.add_argument('--errores', help='CSV donde se escriben las filas rechazadas (por defecto <archivo>.errores.csv)')
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        if not os.path.isfile(ruta):
+            raise CommandError(f'No existe el archivo {ruta}')
+        formato = options['formato'] or ('jsonl' if ruta.endswith(('.jsonl', '.ndjson')) else 'csv')
+        ruta_errores = options['errores'] or f'{ruta}.errores.csv'
+
+        inicio = time.monotonic()
+        total = 0
+        with open(ruta, encoding='utf-8-sig', newline='') as archivo, \
+                open(ruta_errores, 'w', encoding='utf-8', newline='') as salida_errores:
+            errores = csv.writer(salida_errores)
+            errores.writerow(['linea', 'codigo', 'error'])
+            importador = Importador(al_error=lambda numero, codigo, mensaje: errores.writerow([numero, codigo, mensaje]))
+
+            for bloque in por_bloques(leer_filas(archivo, formato), options['lote']):
+                total += importador.importar_bloque(bloque)
+                duracion = time.monotonic() - inicio
+                self.stdout.write(
+                    f'  {total} filas ({importador.creados} nuevos, {importador.actualizados} actualizados, '
+                    f'{importador.sin_cambios} sin cambios, {importador.errores} con error) - {total / max(duracion, 0.001) * 60:.0f} filas/min'
+                )
+
+        # Escrituras masivas: sin señales, las cachés del catálogo se invalidan una vez
+        invalidar_catalogo()
+
+        duracion = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'Importación terminada en {duracion:.1f} s: {importador.creados} nuevos, '
+            f'{importador.actualizados} actualizados, {importador.sin_cambios} sin cambios, '
+            f'{importador.errores} con error.'
+        ))
+        if importador.errores:
+            self.stdout.write(self.style.WARNING(f'Filas rechazadas en {ruta_errores}'))
+        else:
+            os.remove(ruta_errores)
@@ -0,0 +1,69 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.catalogo import filtrar_inventario
+from productos.models import Categoria
+from productos.precios import aplicar_descuento, cargar_lista_precios, leer_lista_precios, quitar_ofertas
+
+
+class Command(BaseCommand):
+    help = 'Operaciones masivas de precios: descuentos, quitar ofertas o cargar una lista de precios'
+
+    def add_arguments(self, parser):
+        operaciones = parser.add_subparsers(dest='operacion', required=True)
+
+        descuento = operaciones.add_parser('descuento', help='Fija el precio de oferta como precio menos un porcentaje')
+        descuento.add_argument('porcentaje', type=float, help='Porcentaje de descuento (0-100)')
+        quitar = operaciones.add_parser('quitar-ofertas', help='Elimina el precio de oferta')
+        for subparser in (descuento, quitar):
+            subparser.add_argument('--categoria', help='Slug de la categoría')
+            subparser.add_argument('--q', help='Búsqueda, igual que en el inventario')
+            subparser.add_argument('--oferta', choices=['si', 'no'], help='Solo productos con o sin oferta')
+
+        lista = operaciones.add_parser('lista', help='Carga precios por código desde CSV o JSONL')
+        lista.add_argument('archivo', help='Columnas: codigo, precio y opcionalmente precio_oferta')
+        lista.add_argument('--formato', choices=['csv', 'jsonl'], help='Por defecto se deduce de la extensión')
+
+    def handle(self, *args, **options):
+        if options['operacion'] == 'lista':
+            resumen = self.cargar_lista(options)
+            self.stdout.write(self.style.SUCCESS(f"{resumen['actualizados']} productos actualizados."))
+            if resumen['no_encontrados']:
+                self.stdout.write(self.style.WARNING(
+                    f"{len(resumen['no_encontrados'])} códigos no encontrados: {', '.join(resumen['no_encontrados'][:20])}"
+                ))
+            return
+
+        productos = self.productos(options)
+        try:
+            if options['operacion'] == 'descuento':
+                resumen = aplicar_descuento(productos, str(options['porcentaje']))
+            else:
+                resumen = quitar_ofertas(productos)
+        except ValueError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(f"{resumen['actualizados']} productos actualizados."))
+
+    def productos(self, options):
+        params = {'q': options['q'], 'oferta': options['oferta']}
+        if options['categoria']:
+            categoria = Categoria.objects.filter(slug=options['categoria']).first()
+            if categoria is None:
+                raise CommandError(f"No existe la categoría {options['categoria']}")
+            params['categoria'] = str(categoria.pk)
+        productos, _filtros = filtrar_inventario(params)
+        return productos
+
+    def cargar_lista(self, options):
+        ruta = options['archivo']
+        if not os.path.isfile(ruta):
+            raise CommandError(f'No existe el archivo {ruta}')
+        formato = options['formato'] or ('jsonl' if ruta.endswith(('.jsonl', '.ndjson')) else 'csv')
+        with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+            filas, errores = leer_lista_precios(archivo, formato)
+        if errores:
+            for error in errores[:20]:
+                self.stderr.write(error)
+            raise CommandError(f'La lista tiene {len(errores)} filas con error; no se aplicó ningún cambio.')
+        return cargar_lista_precios(filas)
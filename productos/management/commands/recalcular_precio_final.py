@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from productos.cache import invalidar_catalogo
+from productos.precios import recalcular_precio_final
+
+
+class Command(BaseCommand):
+    help = 'Recalcula por bloques la columna precio_final de todos los productos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por UPDATE (por defecto 1000)')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+
+        def al_avanzar(total):
+            self.stdout.write(f'  {total} productos actualizados...')
+
+        total = recalcular_precio_final(lote=options['lote'], al_avanzar=al_avanzar)
+        # UPDATE masivo: no hay señales, invalidamos las cachés del catálogo una vez
+        invalidar_catalogo()
+
+        duracion = time.monotonic() - inicio
+        self.stdout.write(
+            self.style.SUCCESS(f'Se recalculó precio_final de {total} productos en {duracion:.1f} s.')
+        )
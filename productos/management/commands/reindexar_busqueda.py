@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from productos.busqueda import reindexar_todo
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de productos (nombre, código, descripción y categoría)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Productos por bloque (por defecto 500)')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        total = reindexar_todo(lote=options['lote'])
+        duracion = time.monotonic() - inicio
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Se indexaron {total} productos en {duracion:.1f} s.')
+        )
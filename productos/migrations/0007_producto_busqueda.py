@@ -0,0 +1,30 @@
+# Generated by Django 5.1.4 on 2026-10-18 06:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0006_alter_productoimagen_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=40)),
+                ('peso', models.PositiveSmallIntegerField(default=1)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos_busqueda', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Término de Búsqueda',
+                'verbose_name_plural': 'Términos de Búsqueda',
+                'db_table': 'producto_busqueda',
+                'indexes': [models.Index(fields=['termino', 'producto'], name='producto_busq_termino_idx')],
+                'unique_together': {('producto', 'termino')},
+            },
+        ),
+    ]
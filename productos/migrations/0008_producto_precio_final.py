@@ -0,0 +1,53 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:05
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Coalesce, NullIf
+
+
+def poblar_precio_final(apps, schema_editor):
+    # Misma regla que Producto.save(): una oferta vacía o en 0 no cuenta.
+    # Se actualiza por bloques de pk para no bloquear toda la tabla a la vez.
+    Producto = apps.get_model('productos', 'Producto')
+    campo = DecimalField(max_digits=10, decimal_places=2)
+    precio_final = Coalesce(NullIf(F('precio_oferta'), Value(0, output_field=campo)), F('precio'), output_field=campo)
+
+    lote = 1000
+    ultimo_id = 0
+    while True:
+        ids = list(
+            Producto.objects.filter(pk__gt=ultimo_id).order_by('pk').values_list('pk', flat=True)[:lote]
+        )
+        if not ids:
+            break
+        Producto.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]).update(precio_final=precio_final)
+        ultimo_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0007_producto_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='precio_final',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.RunPython(poblar_precio_final, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='producto',
+            name='precio_final',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['activo', 'precio_final'], name='producto_activo_pfinal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['activo', 'categoria', 'precio_final'], name='producto_act_cat_pfinal_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0008_producto_precio_final'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['activo', '-fecha_creacion', 'id'], name='producto_activo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['activo', 'categoria', '-fecha_creacion', 'id'], name='producto_act_cat_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['-fecha_creacion'], name='producto_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['categoria', '-fecha_creacion'], name='producto_cat_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['precio_oferta', '-fecha_creacion'], name='producto_oferta_fecha_idx'),
+        ),
+    ]
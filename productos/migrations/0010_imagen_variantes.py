@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 06:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0009_indices_acceso'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='imagen_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='productoimagen',
+            name='imagen_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
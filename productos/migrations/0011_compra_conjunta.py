@@ -0,0 +1,30 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0010_imagen_variantes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompraConjunta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('veces', models.PositiveIntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compras_conjuntas', to='productos.producto')),
+                ('relacionado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Compra Conjunta',
+                'verbose_name_plural': 'Compras Conjuntas',
+                'db_table': 'producto_compra_conjunta',
+                'indexes': [models.Index(fields=['producto', '-veces'], name='producto_compra_conj_idx')],
+                'unique_together': {('producto', 'relacionado')},
+            },
+        ),
+    ]
@@ -0,0 +1,86 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+# Copia del tokenizador de productos/busqueda.py tal como estaba al escribir
+# esta migración: si el código cambia después, la migración sigue generando
+# los mismos términos. reindexar_busqueda reconstruye con la versión vigente
+PESOS = {'codigo': 8, 'nombre': 4, 'categoria': 2, 'descripcion': 1}
+
+PALABRAS_VACIAS = {
+    'a', 'al', 'con', 'de', 'del', 'e', 'el', 'en', 'la', 'las', 'lo', 'los',
+    'o', 'para', 'por', 'que', 'su', 'sus', 'u', 'un', 'una', 'unas', 'unos', 'y',
+}
+
+LONGITUD_MAXIMA = 40
+
+
+def normalizar(texto):
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+
+def _raiz(palabra):
+    if len(palabra) > 4 and palabra.endswith('es') and palabra[-3] in 'rlndj':
+        return palabra[:-2]
+    if len(palabra) > 3 and palabra.endswith('s') and not palabra[-2].isdigit():
+        return palabra[:-1]
+    return palabra
+
+
+def tokenizar(texto):
+    palabras = [p for p in re.findall(r'[a-z0-9]+', normalizar(texto)) if p not in PALABRAS_VACIAS]
+    return [_raiz(palabra)[:LONGITUD_MAXIMA] for palabra in palabras]
+
+
+def terminos_producto(producto):
+    campos = {
+        'codigo': producto.codigo,
+        'nombre': producto.nombre,
+        'categoria': producto.categoria.nombre,
+        'descripcion': producto.descripcion,
+    }
+    terminos = {}
+    for campo, texto in campos.items():
+        for termino in tokenizar(texto):
+            terminos[termino] = terminos.get(termino, 0) + PESOS[campo]
+    codigo = re.sub(r'[^a-z0-9]', '', normalizar(producto.codigo))[:LONGITUD_MAXIMA]
+    if codigo:
+        terminos[codigo] = terminos.get(codigo, 0) + PESOS['codigo']
+    return terminos
+
+
+def indexar_productos(apps, schema_editor):
+    # 0007 creó el índice vacío: sin esto la búsqueda no encuentra nada hasta
+    # que alguien corra reindexar_busqueda
+    Producto = apps.get_model('productos', 'Producto')
+    TerminoBusqueda = apps.get_model('productos', 'TerminoBusqueda')
+    ultimo_id = 0
+    while True:
+        productos = list(
+            Producto.objects.select_related('categoria')
+            .only('id', 'codigo', 'nombre', 'descripcion', 'categoria__nombre')
+            .filter(pk__gt=ultimo_id)
+            .order_by('pk')[:500]
+        )
+        if not productos:
+            return
+        TerminoBusqueda.objects.filter(producto__in=[p.pk for p in productos]).delete()
+        TerminoBusqueda.objects.bulk_create([
+            TerminoBusqueda(producto_id=producto.pk, termino=termino, peso=min(peso, 32767))
+            for producto in productos
+            for termino, peso in terminos_producto(producto).items()
+        ])
+        ultimo_id = productos[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0011_compra_conjunta'),
+    ]
+
+    operations = [
+        migrations.RunPython(indexar_productos, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,11 @@
 from django.db import models
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
 from django.utils.text import slugify
 
+from core.mixins import SeguimientoCambiosMixin
+
 # Tabla de Unidades de Medida para tamaño y grosor
 class UnidadMedida(models.Model):
     id = models.AutoField(primary_key=True)
@@ -16,7 +21,7 @@ class UnidadMedida(models.Model):
         verbose_name_plural = 'Unidades de Medida'
 
 # Tabla de Categorías
-class Categoria(models.Model):
+class Categoria(SeguimientoCambiosMixin, models.Model):
     id = models.AutoField(primary_key=True)
     nombre = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=150, unique=True) # URLs amigables
@@ -29,8 +34,71 @@ class Categoria(models.Model):
         verbose_name = 'Categoría'
         verbose_name_plural = 'Categorías'
 
+def calcular_precio_final(precio, precio_oferta):
+    """Retorna el precio de oferta si existe, de lo contrario el normal."""
+    return precio_oferta if precio_oferta else precio
+
+
+def expresion_precio_final(precio=F('precio'), precio_oferta=F('precio_oferta')):
+    """Equivalente SQL de calcular_precio_final (una oferta en 0 cuenta como sin oferta)."""
+    campo = DecimalField(max_digits=10, decimal_places=2)
+    if not hasattr(precio, 'resolve_expression'):
+        precio = Value(precio, output_field=campo)
+    if not hasattr(precio_oferta, 'resolve_expression'):
+        precio_oferta = Value(precio_oferta, output_field=campo)
+    return Coalesce(NullIf(precio_oferta, Value(0, output_field=campo)), precio, output_field=campo)
+
+
+class ProductoQuerySet(models.QuerySet):
+    """
+    Mantiene precio_final sincronizado también en las escrituras masivas. Un
+    UPDATE de stock (reservas de la bolsa, liberaciones) marca la fecha de
+    sus productos, que cambia sus tarjetas y ETags, y borra solo sus fichas
+    cacheadas (productos/detalle.py): el resto del catálogo sigue en caché.
+    """
+
+    def update(self, **kwargs):
+        if 'precio' in kwargs or 'precio_oferta' in kwargs:
+            # precio_final va primero: MySQL aplica las asignaciones de izquierda a
+            # derecha, así la expresión se evalúa con los valores anteriores de la fila
+            precio_final = expresion_precio_final(
+                kwargs.get('precio', F('precio')),
+                kwargs.get('precio_oferta', F('precio_oferta')),
+            )
+            kwargs = {'precio_final': precio_final, **kwargs}
+        if 'stock' not in kwargs:
+            return super().update(**kwargs)
+
+        from .detalle import invalidar_fichas
+        kwargs.setdefault('fecha_actualizacion', timezone.now())
+        # Los ids antes del UPDATE: de más solo se borra alguna ficha sin cambios
+        producto_ids = list(self.values_list('pk', flat=True))
+        filas = super().update(**kwargs)
+        if filas:
+            invalidar_fichas(producto_ids)
+        return filas
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        if 'precio' in fields or 'precio_oferta' in fields:
+            for obj in objs:
+                obj.precio_final = calcular_precio_final(obj.precio, obj.precio_oferta)
+            if 'precio_final' not in fields:
+                fields = [*fields, 'precio_final']
+        return super().bulk_update(objs, fields, batch_size=batch_size)
+
+    def bulk_create(self, objs, *args, update_fields=None, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.precio_final = calcular_precio_final(obj.precio, obj.precio_oferta)
+        if update_fields and ('precio' in update_fields or 'precio_oferta' in update_fields):
+            if 'precio_final' not in update_fields:
+                update_fields = [*update_fields, 'precio_final']
+        return super().bulk_create(objs, *args, update_fields=update_fields, **kwargs)
+
+
 # Tabla de Productos
-class Producto(models.Model):
+class Producto(SeguimientoCambiosMixin, models.Model):
     id = models.AutoField(primary_key=True)
     codigo = models.CharField(max_length=10, unique=True)   
     nombre = models.CharField(max_length=40)
@@ -40,6 +108,9 @@ class Producto(models.Model):
     # Precios y Ofertas
     precio = models.DecimalField(max_digits=10, decimal_places=2)
     precio_oferta = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Precio que paga el cliente, materializado para filtrar y ordenar en SQL.
+    # No se edita: lo calculan save() y ProductoQuerySet
+    precio_final = models.DecimalField(max_digits=10, decimal_places=2, editable=False)
     
     # Medidas (opcionales)
     tamano = models.DecimalField(max_digits=8, decimal_places=3, null=True, blank=True)
@@ -62,21 +133,24 @@ class Producto(models.Model):
     
     categoria = models.ForeignKey(Categoria, on_delete=models.PROTECT)
     imagen = models.ImageField(upload_to='productos/', null=True, blank=True)
+    # Derivados redimensionados de la imagen (ver productos/imagenes.py)
+    imagen_variantes = models.JSONField(default=dict, blank=True, editable=False)
     stock = models.IntegerField(default=0)
     activo = models.BooleanField(default=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
 
+    objects = ProductoQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.nombre)
+        self.precio_final = calcular_precio_final(self.precio, self.precio_oferta)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'precio', 'precio_oferta'}.intersection(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'precio_final'}
         super().save(*args, **kwargs)
 
-    @property
-    def precio_final(self):
-        """Retorna el precio de oferta si existe, de lo contrario el normal."""
-        return self.precio_oferta if self.precio_oferta else self.precio
-
     def __str__(self):
         return self.nombre
 
@@ -85,6 +159,18 @@ class Producto(models.Model):
         verbose_name = 'Producto'
         verbose_name_plural = 'Productos'
         unique_together = ['nombre', 'categoria', 'codigo']
+        indexes = [
+            # Catálogo público: activo=True ordenado por (-fecha_creacion, id), con o sin categoría
+            models.Index(fields=['activo', '-fecha_creacion', 'id'], name='producto_activo_fecha_idx'),
+            models.Index(fields=['activo', 'categoria', '-fecha_creacion', 'id'], name='producto_act_cat_fecha_idx'),
+            # Filtros y orden por precio del catálogo como rangos sobre el índice
+            models.Index(fields=['activo', 'precio_final'], name='producto_activo_pfinal_idx'),
+            models.Index(fields=['activo', 'categoria', 'precio_final'], name='producto_act_cat_pfinal_idx'),
+            # Inventario (administración): listado por fecha y filtros de categoría y oferta
+            models.Index(fields=['-fecha_creacion'], name='producto_fecha_idx'),
+            models.Index(fields=['categoria', '-fecha_creacion'], name='producto_cat_fecha_idx'),
+            models.Index(fields=['precio_oferta', '-fecha_creacion'], name='producto_oferta_fecha_idx'),
+        ]
 
 # Tabla de Imágenes de Galería para Productos
 class ProductoImagen(models.Model):
@@ -94,9 +180,61 @@ class ProductoImagen(models.Model):
         related_name='imagenes' # Esto permite acceder como producto.imagenes.all()
     )
     imagen = models.ImageField(upload_to='productos/galeria/')
+    imagen_variantes = models.JSONField(default=dict, blank=True, editable=False)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'producto_imagen'
         verbose_name = "Imagen de Galería"
-        verbose_name_plural = "Galería de Imágenes"
\ No newline at end of file
+        verbose_name_plural = "Galería de Imágenes"
+
+# Índice invertido para la búsqueda de productos (ver productos/busqueda.py)
+class TerminoBusqueda(models.Model):
+    termino = models.CharField(max_length=40)
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='terminos_busqueda'
+    )
+    peso = models.PositiveSmallIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.termino} → {self.producto_id}"
+
+    class Meta:
+        db_table = 'producto_busqueda'
+        verbose_name = 'Término de Búsqueda'
+        verbose_name_plural = 'Términos de Búsqueda'
+        unique_together = ['producto', 'termino']
+        indexes = [
+            # Las búsquedas por prefijo se resuelven como rango sobre este índice
+            models.Index(fields=['termino', 'producto'], name='producto_busq_termino_idx'),
+        ]
+
+# "Comprados juntos con frecuencia": conteos precalculados desde los pedidos
+# (ver pedidos/recomendaciones.py). Solo se conservan los vecinos más frecuentes.
+class CompraConjunta(models.Model):
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='compras_conjuntas'
+    )
+    relacionado = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    veces = models.PositiveIntegerField(default=0) # Pedidos que contienen ambos productos
+
+    def __str__(self):
+        return f"{self.producto_id} + {self.relacionado_id} ({self.veces})"
+
+    class Meta:
+        db_table = 'producto_compra_conjunta'
+        verbose_name = 'Compra Conjunta'
+        verbose_name_plural = 'Compras Conjuntas'
+        unique_together = ['producto', 'relacionado']
+        indexes = [
+            # La página del producto lee sus vecinos más frecuentes sobre este índice
+            models.Index(fields=['producto', '-veces'], name='producto_compra_conj_idx'),
+        ]
@@ -0,0 +1,142 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .cache import invalidar_catalogo
+from .importacion import leer_filas, por_bloques
+from .models import Producto, expresion_precio_final
+
+
+def recalcular_precio_final(lote=1000, al_avanzar=None):
+    """
+    Recalcula precio_final en bloques de pk con un UPDATE por bloque.
+    Sirve para poblar la columna o repararla tras ediciones hechas por fuera
+    del ORM. Retorna la cantidad de filas actualizadas.
+    """
+    total = 0
+    ultimo_id = 0
+    while True:
+        ids = list(
+            Producto.objects.filter(pk__gt=ultimo_id).order_by('pk').values_list('pk', flat=True)[:lote]
+        )
+        if not ids:
+            return total
+        total += Producto.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]).update(
+            precio_final=expresion_precio_final()
+        )
+        ultimo_id = ids[-1]
+        if al_avanzar:
+            al_avanzar(total)
+
+
+#  *************************************************************
+#         OPERACIONES MASIVAS DE PRECIOS
+#  *************************************************************
+# Cada operación es un UPDATE sobre el conjunto (no un save() por producto)
+# dentro de una transacción. Como no hay señales, las cachés del catálogo se
+# invalidan una sola vez al final y fecha_actualizacion se fija a mano para
+# que cambien las claves de las tarjetas y los ETags.
+
+CAMPO_PRECIO = DecimalField(max_digits=10, decimal_places=2)
+# El factor lleva más decimales que un precio: con 2, un 12,5 % se redondearía a 13 %
+CAMPO_FACTOR = DecimalField(max_digits=12, decimal_places=6)
+
+
+def aplicar_descuento(productos, porcentaje):
+    """Fija precio_oferta = precio menos ``porcentaje`` % en los productos del queryset."""
+    porcentaje = Decimal(porcentaje)
+    if not 0 < porcentaje < 100:
+        raise ValueError('El porcentaje debe estar entre 0 y 100.')
+    factor = Value((100 - porcentaje) / 100, output_field=CAMPO_FACTOR)
+    with transaction.atomic():
+        actualizados = productos.update(
+            precio_oferta=Round(F('precio') * factor, 2, output_field=CAMPO_PRECIO),
+            fecha_actualizacion=timezone.now(),
+        )
+    invalidar_catalogo()
+    return {'actualizados': actualizados}
+
+
+def quitar_ofertas(productos):
+    """Elimina la oferta de los productos del queryset que la tengan."""
+    with transaction.atomic():
+        actualizados = productos.filter(precio_oferta__isnull=False).update(
+            precio_oferta=None, fecha_actualizacion=timezone.now(),
+        )
+    invalidar_catalogo()
+    return {'actualizados': actualizados}
+
+
+def cargar_lista_precios(filas, lote=1000):
+    """
+    ``filas`` es un iterable de dicts con codigo, precio y opcionalmente
+    precio_oferta (vacío = sin oferta). Se aplica con un UPDATE ... CASE por
+    bloque, todo en una transacción. Retorna actualizados y los códigos que
+    no existen.
+    """
+    actualizados = 0
+    no_encontrados = []
+    ahora = timezone.now()
+    with transaction.atomic():
+        for bloque in por_bloques(filas, lote):
+            precios = {fila['codigo']: fila for fila in bloque}
+            existentes = set(Producto.objects.filter(codigo__in=precios).values_list('codigo', flat=True))
+            no_encontrados += [codigo for codigo in precios if codigo not in existentes]
+            if not existentes:
+                continue
+
+            cambios = {
+                'precio': Case(
+                    *[When(codigo=codigo, then=Value(precios[codigo]['precio'])) for codigo in existentes],
+                    output_field=CAMPO_PRECIO,
+                ),
+                'fecha_actualizacion': ahora,
+            }
+            con_oferta = [codigo for codigo in existentes if 'precio_oferta' in precios[codigo]]
+            if con_oferta:
+                cambios['precio_oferta'] = Case(
+                    *[When(codigo=codigo, then=Value(precios[codigo]['precio_oferta'])) for codigo in con_oferta],
+                    default=F('precio_oferta'),
+                    output_field=CAMPO_PRECIO,
+                )
+            actualizados += Producto.objects.filter(codigo__in=existentes).update(**cambios)
+    invalidar_catalogo()
+    return {'actualizados': actualizados, 'no_encontrados': no_encontrados}
+
+
+def leer_lista_precios(archivo, formato='csv'):
+    """
+    Lee y valida una lista de precios (CSV o JSONL con codigo, precio y
+    precio_oferta opcional). Retorna (filas, errores); los errores son
+    mensajes con el número de línea.
+    """
+    filas, errores = [], []
+    for numero, fila in leer_filas(archivo, formato):
+        try:
+            if not isinstance(fila, dict) or not str(fila.get('codigo') or '').strip():
+                raise ValueError('falta el código')
+            convertida = {'codigo': str(fila['codigo']).strip(), 'precio': _precio(fila.get('precio'))}
+            if convertida['precio'] is None:
+                raise ValueError('falta el precio')
+            if 'precio_oferta' in fila:
+                convertida['precio_oferta'] = _precio(fila['precio_oferta'])
+        except ValueError as error:
+            errores.append(f'Línea {numero}: {error}')
+            continue
+        filas.append(convertida)
+    return filas, errores
+
+
+def _precio(valor):
+    if valor in ('', None):
+        return None
+    try:
+        precio = Decimal(str(valor).strip())
+    except InvalidOperation:
+        raise ValueError(f'precio inválido ({valor})')
+    if not precio.is_finite() or precio < 0:
+        raise ValueError(f'precio inválido ({valor})')
+    return precio.quantize(Decimal('0.01'))
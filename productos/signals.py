@@ -1,28 +1,121 @@
 import os
-from django.db.models.signals import post_delete, pre_save
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import Producto
+from .models import Producto, Categoria, ProductoImagen, UnidadMedida
+from .busqueda import indexar_productos
+from .cache import invalidar_catalogo
+from .tarjetas import invalidar_tarjetas
+from .imagenes import eliminar_variantes, variantes_pendientes
+from core.tareas import encolar
+
+# Campos que alimentan el índice de búsqueda
+CAMPOS_INDEXADOS = {'codigo', 'nombre', 'descripcion', 'categoria', 'categoria_id'}
 
 @receiver(post_delete, sender=Producto)
 def eliminar_imagen_producto(sender, instance, **kwargs):
     if instance.imagen:
         if os.path.isfile(instance.imagen.path):
             os.remove(instance.imagen.path)
+    eliminar_variantes(instance.imagen_variantes)
+
+@receiver(post_delete, sender=ProductoImagen)
+def eliminar_imagen_galeria(sender, instance, **kwargs):
+    # Cubre el can_delete del formset y el CASCADE al eliminar el producto.
+    # Se espera al commit: si la transacción se revierte la fila sigue existiendo
+    imagen = instance.imagen.name
+    variantes = instance.imagen_variantes
+
+    def eliminar():
+        if imagen and default_storage.exists(imagen):
+            default_storage.delete(imagen)
+        eliminar_variantes(variantes)
+
+    transaction.on_commit(eliminar)
 
 @receiver(pre_save, sender=Producto)
 def eliminar_imagen_anterior_si_se_reemplaza(sender, instance, **kwargs):
     if not instance.pk:
         return  # Producto nuevo, no hay imagen anterior
 
-    try:
-        producto_anterior = Producto.objects.get(pk=instance.pk)
-    except Producto.DoesNotExist:
+    # El valor cargado lo guarda SeguimientoCambiosMixin: no hace falta otra consulta
+    if not instance.ha_cambiado('imagen'):
         return
-
-    imagen_anterior = producto_anterior.imagen
-    imagen_nueva = instance.imagen
+    imagen_anterior = instance.valor_original('imagen')
 
     # Si se limpió la imagen o se reemplazó
-    if imagen_anterior and imagen_anterior != imagen_nueva:
-        if os.path.isfile(imagen_anterior.path):
-            os.remove(imagen_anterior.path)
\ No newline at end of file
+    if imagen_anterior:
+        ruta_anterior = instance.imagen.storage.path(imagen_anterior)
+        if os.path.isfile(ruta_anterior):
+            os.remove(ruta_anterior)
+        # Los derivados de la imagen anterior también sobran
+        eliminar_variantes(instance.valor_original('imagen_variantes'))
+        instance.imagen_variantes = {}
+
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=ProductoImagen)
+def generar_variantes_imagen(sender, instance, **kwargs):
+    # Solo cuando la imagen es nueva o fue reemplazada. Los derivados se generan
+    # en el worker (procesar_tareas); mientras tanto se sirve la original
+    if variantes_pendientes(instance):
+        encolar(
+            'productos.procesar_imagen',
+            modelo=sender._meta.model_name, pk=instance.pk, imagen=instance.imagen.name,
+        )
+
+@receiver(post_save, sender=Producto)
+def indexar_producto(sender, instance, created, update_fields=None, **kwargs):
+    # Un guardado que no toca campos indexados (precio, stock...) no necesita reindexar
+    if update_fields is not None and not CAMPOS_INDEXADOS.intersection(update_fields):
+        return
+    if not created and not CAMPOS_INDEXADOS.intersection(instance.campos_cambiados):
+        return
+    indexar_productos([instance])
+
+@receiver(post_save, sender=Categoria)
+def reindexar_productos_categoria(sender, instance, created, **kwargs):
+    # El nombre de la categoría forma parte del índice de sus productos
+    if created or not instance.ha_cambiado('nombre'):
+        return
+    productos = instance.producto_set.select_related('categoria').order_by('pk')
+    lote = []
+    for producto in productos.iterator(chunk_size=500):
+        lote.append(producto)
+        if len(lote) == 500:
+            indexar_productos(lote)
+            lote = []
+    indexar_productos(lote)
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=ProductoImagen)
+@receiver(post_delete, sender=ProductoImagen)
+@receiver(post_save, sender=UnidadMedida)
+@receiver(post_delete, sender=UnidadMedida)
+def invalidar_cache_catalogo(sender, **kwargs):
+    # Facetas, páginas y demás cachés del catálogo dependen de la versión
+    invalidar_catalogo()
+
+@receiver(pre_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def invalidar_tarjeta_producto(sender, instance, **kwargs):
+    # En pre_save fecha_actualizacion aún tiene el valor anterior, que es el de la clave cacheada
+    if instance.pk:
+        invalidar_tarjetas([(instance.pk, instance.fecha_actualizacion)])
+
+@receiver(post_save, sender=Categoria)
+def invalidar_tarjetas_categoria(sender, instance, created, **kwargs):
+    # Las tarjetas muestran el nombre de la categoría
+    if not created and instance.ha_cambiado('nombre'):
+        invalidar_tarjetas(instance.producto_set.values_list('pk', 'fecha_actualizacion'))
+
+@receiver(post_save, sender=ProductoImagen)
+@receiver(post_delete, sender=ProductoImagen)
+def actualizar_fecha_producto(sender, instance, **kwargs):
+    # La galería forma parte de la página del producto: quitar una imagen no
+    # cambia el MAX(fecha_creacion) de las restantes, así que se marca el producto
+    Producto.objects.filter(pk=instance.producto_id).update(fecha_actualizacion=timezone.now())
@@ -0,0 +1,16 @@
+from django.apps import apps
+
+from core.tareas import tarea
+
+from .imagenes import procesar_imagen, variantes_pendientes
+
+
+@tarea('productos.procesar_imagen')
+def procesar_imagen_tarea(modelo, pk, imagen):
+    """Genera los derivados de una imagen guardada (Producto o ProductoImagen)."""
+    instancia = apps.get_model('productos', modelo).objects.filter(pk=pk).first()
+    # Si el registro se eliminó o la imagen se reemplazó, la tarea ya no aplica
+    if instancia is None or instancia.imagen.name != imagen:
+        return
+    if variantes_pendientes(instancia):
+        procesar_imagen(instancia)
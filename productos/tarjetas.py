@@ -0,0 +1,56 @@
+from django.core.cache import cache
+from django.template.backends.utils import csrf_input
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+DURACION_CACHE = 60 * 60 * 24
+
+# El token CSRF es propio de cada visitante: el HTML se guarda con este
+# marcador y se reemplaza al servir la tarjeta
+MARCADOR_CSRF = '<!--csrf-->'
+
+
+def clave_tarjeta(producto_id, fecha_actualizacion, autenticado):
+    marca = int(fecha_actualizacion.timestamp() * 1_000_000)
+    return f'productos:tarjeta:{producto_id}:{marca}:{int(autenticado)}'
+
+
+def renderizar_tarjetas(productos, request):
+    """
+    Retorna el HTML de la tarjeta de cada producto. Las tarjetas se leen de la
+    caché en un solo get_many y solo se renderizan las que faltan.
+    """
+    autenticado = request.user.is_authenticated
+    claves = [clave_tarjeta(p.pk, p.fecha_actualizacion, autenticado) for p in productos]
+    en_cache = cache.get_many(claves)
+
+    nuevas = {}
+    fragmentos = []
+    for producto, clave in zip(productos, claves):
+        fragmento = en_cache.get(clave)
+        if fragmento is None:
+            fragmento = render_to_string('productos/_tarjeta_producto.html', {
+                'producto': producto,
+                'autenticado': autenticado,
+                'csrf_input': mark_safe(MARCADOR_CSRF),
+            })
+            nuevas[clave] = fragmento
+        fragmentos.append(fragmento)
+
+    if nuevas:
+        cache.set_many(nuevas, DURACION_CACHE)
+
+    token = csrf_input(request) if autenticado else ''
+    return [mark_safe(fragmento.replace(MARCADOR_CSRF, token)) for fragmento in fragmentos]
+
+
+def invalidar_tarjetas(productos):
+    """Recibe pares (id, fecha_actualizacion) y borra sus tarjetas para ambos estados de sesión."""
+    claves = [
+        clave_tarjeta(producto_id, fecha, autenticado)
+        for producto_id, fecha in productos
+        if fecha is not None
+        for autenticado in (False, True)
+    ]
+    if claves:
+        cache.delete_many(claves)
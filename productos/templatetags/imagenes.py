@@ -0,0 +1,58 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+TIPOS = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+
+def _srcset(variantes, formato):
+    # Varias variantes pueden tener el mismo ancho si la original es pequeña
+    anchos = {}
+    for datos in variantes.values():
+        if datos.get(formato):
+            anchos.setdefault(datos['ancho'], default_storage.url(datos[formato]))
+    return ', '.join(f'{url} {ancho}w' for ancho, url in sorted(anchos.items()))
+
+
+@register.simple_tag
+def imagen_responsive(objeto, sizes='100vw', alt='', clase='', estilo='', carga='lazy'):
+    """
+    Emite un <picture> con srcset en AVIF/WebP a partir de ``objeto.imagen_variantes``
+    y la imagen original como respaldo. Mientras los derivados no existan se
+    emite solo el <img> original.
+
+    Uso: {% imagen_responsive producto sizes="(min-width: 992px) 25vw, 50vw" alt=producto.nombre clase="w-100" %}
+    """
+    if not objeto.imagen:
+        return ''
+
+    img = format_html(
+        '<img src="{}" alt="{}" class="{}" style="{}" loading="{}" decoding="async"{}>',
+        objeto.imagen.url, alt, clase, estilo, carga, _dimensiones(objeto),
+    )
+    variantes = (objeto.imagen_variantes or {}).get('variantes')
+    if not variantes or objeto.imagen_variantes.get('origen') != objeto.imagen.name:
+        return img
+
+    fuentes = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (TIPOS[formato], srcset, sizes)
+            for formato in ('avif', 'webp')
+            for srcset in [_srcset(variantes, formato)]
+            if srcset
+        ),
+    )
+    # display: contents deja que el <img> siga dimensionándose respecto al contenedor
+    return format_html('<picture style="display: contents;">{}{}</picture>', fuentes, img)
+
+
+def _dimensiones(objeto):
+    # Ancho y alto reservan el espacio de la imagen antes de que cargue (evita saltos)
+    variantes = (objeto.imagen_variantes or {}).get('variantes') or {}
+    mayor = variantes.get('zoom')
+    if not mayor:
+        return ''
+    return format_html(' width="{}" height="{}"', mayor['ancho'], mayor['alto'])
@@ -1,3 +1,590 @@
-from django.test import TestCase
+import csv
+import json
+from datetime import timedelta
+import os
+import tempfile
+import time
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import messages
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.http import HttpResponse, QueryDict
+from django.db import IntegrityError, connection
+from django.db.models import F
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from PIL import Image
+
+from core.explain import escaneos_completos
+from productos.busqueda import buscar, tokenizar
+from productos.cache import cache_pagina_anonima, clave_pagina, invalidar_catalogo
+from productos.catalogo import (
+    ORDEN_BUSQUEDA, ORDEN_CATALOGO, ORDENES, PRODUCTOS_POR_PAGINA,
+    filtrar_catalogo, filtrar_inventario, leer_filtros, orden_catalogo, paginar_keyset,
+)
+from productos.detalle import detalle_producto
+from productos.facetas import calcular_facetas, categorias_catalogo
+from productos.imagenes import _ruta_variante, procesar_imagen
+from productos.importacion import COLUMNAS, Importador, fila_exportada
+from productos.precios import aplicar_descuento, quitar_ofertas
+from productos.tarjetas import clave_tarjeta, renderizar_tarjetas
+from productos.models import Categoria, Producto, UnidadMedida
+
+
+class PlanesDeConsultaTests(TestCase):
+    """Los querysets de catalogo y productosShow deben resolverse con índices, sin recorrer la tabla completa."""
+
+    @classmethod
+    def setUpTestData(cls):
+        anillos = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        cadenas = Categoria.objects.create(nombre='Cadenas', slug='cadenas')
+        for i in range(40):
+            Producto.objects.create(
+                codigo=f'P{i:03}',
+                nombre=f'Anillo plata {i}' if i % 2 else f'Cadena oro {i}',
+                descripcion='Pieza de plata 925',
+                precio=Decimal(50000 + i * 1000),
+                precio_oferta=Decimal(40000) if i % 5 == 0 else None,
+                categoria=anillos if i % 2 else cadenas,
+                activo=i % 7 != 0,
+            )
+
+    def assertSinEscaneoCompleto(self, queryset):
+        self.assertEqual(escaneos_completos(queryset), [], queryset.explain())
+
+    def catalogo(self, querystring=''):
+        productos, filtros = filtrar_catalogo(QueryDict(querystring))
+        return productos.order_by(*orden_catalogo(filtros))[:PRODUCTOS_POR_PAGINA + 1]
+
+    def inventario(self, querystring=''):
+        productos, filtros = filtrar_inventario(QueryDict(querystring))
+        return productos[:10]
+
+    def test_catalogo(self):
+        self.assertSinEscaneoCompleto(self.catalogo())
+
+    def test_catalogo_por_categoria(self):
+        self.assertSinEscaneoCompleto(self.catalogo('categoria=anillos'))
+
+    def test_catalogo_por_precio(self):
+        self.assertSinEscaneoCompleto(self.catalogo('min_p=55000&max_p=70000&orden=precio_asc'))
+
+    def test_catalogo_con_busqueda(self):
+        self.assertSinEscaneoCompleto(self.catalogo('q=anillo plata'))
+
+    def test_inventario(self):
+        self.assertSinEscaneoCompleto(self.inventario())
+
+    def test_inventario_por_oferta(self):
+        self.assertSinEscaneoCompleto(self.inventario('oferta=no'))
+
+    def test_inventario_por_categoria(self):
+        categoria = Categoria.objects.get(slug='cadenas')
+        self.assertSinEscaneoCompleto(self.inventario(f'categoria={categoria.pk}'))
+
+
+class PaginacionKeysetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        for i in range(7):
+            Producto.objects.create(
+                codigo=f'K{i}', nombre=f'Anillo {i}', descripcion='Plata' if i % 2 else 'Oro',
+                precio=Decimal(100 if i < 4 else 200), categoria=categoria,
+            )
+        # Empates en todas las columnas salvo el id: solo el desempate ordena
+        Producto.objects.filter(codigo__in=['K1', 'K2', 'K3', 'K4']).update(fecha_creacion=timezone.now())
+
+    def recorrer(self, productos, orden):
+        vistos, cursor = [], None
+        while True:
+            filas, cursor = paginar_keyset(productos, orden, cursor, tamano=2)
+            vistos += [p.codigo for p in filas]
+            if cursor is None:
+                return vistos
+
+    def test_recorre_todo_sin_repetir_con_empates(self):
+        catalogo = Producto.objects.all()
+        busqueda = filtrar_catalogo(QueryDict('q=anillo plata'))[0]
+        for productos, orden in [(catalogo, ORDEN_CATALOGO), (catalogo, ORDENES['precio_asc']),
+                                 (catalogo, ORDENES['precio_desc']), (busqueda, ORDEN_BUSQUEDA)]:
+            with self.subTest(orden=orden):
+                esperado = [p.codigo for p in productos.order_by(*orden)]
+                self.assertEqual(self.recorrer(productos, orden), esperado)
+
+    def test_cursor_invalido_es_la_primera_pagina(self):
+        primera, _ = paginar_keyset(Producto.objects.all(), ORDEN_CATALOGO, tamano=2)
+        for cursor in ['basura', 'W10', 'WzEsMiwzXQ']:
+            filas, _ = paginar_keyset(Producto.objects.all(), ORDEN_CATALOGO, cursor, tamano=2)
+            self.assertEqual(filas, primera)
+
+
+class FacetasTests(TestCase):
+    """Cada conteo del sidebar debe coincidir con el listado que se obtiene al elegir esa opción."""
+
+    @classmethod
+    def setUpTestData(cls):
+        anillos = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        cadenas = Categoria.objects.create(nombre='Cadenas', slug='cadenas')
+        ofertas = [None, Decimal('0'), Decimal('45000')]
+        for i in range(18):
+            Producto.objects.create(
+                codigo=f'T{i:02}', nombre=f'Anillo plata {i}' if i % 2 else f'Cadena oro {i}',
+                descripcion='Pieza de plata 925', precio=Decimal(40000 + i * 30000),
+                precio_oferta=ofertas[i % 3], categoria=anillos if i % 2 else cadenas,
+                activo=i % 7 != 0,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def contar(self, querystring, **cambios):
+        params = QueryDict(querystring, mutable=True)
+        for nombre, valor in cambios.items():
+            params.pop(nombre, None)
+            if valor is not None:
+                params[nombre] = str(valor)
+        return filtrar_catalogo(params)[0].count()
+
+    def test_conteos_coinciden_con_el_listado(self):
+        for querystring in ['', 'categoria=anillos', 'oferta=si', 'oferta=no',
+                            'min_p=100000&max_p=199999.99', 'q=plata&oferta=no&categoria=cadenas']:
+            with self.subTest(querystring=querystring):
+                facetas = calcular_facetas(leer_filtros(QueryDict(querystring)))
+                self.assertEqual(facetas['total'], self.contar(querystring))
+                for categoria, conteo in facetas['categorias']:
+                    self.assertEqual(conteo, self.contar(querystring, categoria=categoria.slug))
+                for valor, conteo in facetas['oferta'].items():
+                    self.assertEqual(conteo, self.contar(querystring, oferta=valor))
+                for desde, hasta, conteo in facetas['rangos']:
+                    self.assertEqual(conteo, self.contar(querystring, min_p=desde, max_p=hasta))
+
+    def test_oferta_en_cero_cuenta_como_precio_regular(self):
+        facetas = calcular_facetas(leer_filtros(QueryDict('')))
+        activos = Producto.objects.filter(activo=True)
+        self.assertEqual(facetas['oferta']['si'], activos.filter(precio_final__lt=F('precio')).count())
+        self.assertEqual(facetas['oferta']['no'], activos.filter(precio_final=F('precio')).count())
+
+    def test_una_sola_consulta(self):
+        categorias_catalogo()
+        with self.assertNumQueries(1):
+            calcular_facetas(leer_filtros(QueryDict('q=plata&categoria=anillos&min_p=50000')))
+        # Los mismos filtros en otro orden salen de la caché
+        with self.assertNumQueries(0):
+            calcular_facetas(leer_filtros(QueryDict('q=plata&categoria=anillos&min_p=50000&orden=precio_asc')))
+
+
+class TarjetasTests(TestCase):
+    """Una tarjeta cacheada no debe sobrevivir a un cambio de lo que muestra."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        cls.producto = Producto.objects.create(
+            codigo='C1', nombre='Anillo liso', descripcion='Plata', precio=Decimal('90000'),
+            stock=10, categoria=cls.categoria,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/')
+        self.request.user = AnonymousUser()
+
+    def tarjeta(self):
+        producto = Producto.objects.select_related('categoria').get(pk=self.producto.pk)
+        html = renderizar_tarjetas([producto], self.request)[0]
+        return clave_tarjeta(producto.pk, producto.fecha_actualizacion, False), html
+
+    def test_edicion_del_producto(self):
+        clave, html = self.tarjeta()
+        self.assertIn('Anillo liso', html)
+        producto = Producto.objects.get(pk=self.producto.pk)
+        producto.nombre = 'Anillo trenzado'
+        producto.save()
+        self.assertIsNone(cache.get(clave))
+        self.assertIn('Anillo trenzado', self.tarjeta()[1])
+
+    def test_cambio_de_stock(self):
+        clave, html = self.tarjeta()
+        self.assertIn('En Stock', html)
+        Producto.objects.filter(pk=self.producto.pk).update(stock=F('stock') - 7)
+        nueva, html = self.tarjeta()
+        self.assertNotEqual(nueva, clave)
+        self.assertIn('SOLO QUEDAN 3', html)
+
+    def test_renombrar_la_categoria(self):
+        clave, html = self.tarjeta()
+        self.assertIn('Anillos', html)
+        self.categoria.nombre = 'Argollas'
+        self.categoria.save()
+        self.assertIsNone(cache.get(clave))
+        self.assertIn('Argollas', self.tarjeta()[1])
+
+
+class PrecioFinalTests(TestCase):
+    """precio_final debe seguir a precio y precio_oferta por cualquier vía de escritura."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = Categoria.objects.create(nombre='Anillos', slug='anillos')
+
+    def setUp(self):
+        self.producto = Producto.objects.create(
+            codigo='F1', nombre='Anillo', descripcion='Plata', precio=Decimal('100.00'),
+            precio_oferta=Decimal('80.00'), categoria=self.categoria,
+        )
+
+    def precio_final(self, producto=None):
+        return Producto.objects.values_list('precio_final', flat=True).get(pk=(producto or self.producto).pk)
+
+    def test_save(self):
+        self.assertEqual(self.precio_final(), Decimal('80.00'))
+        self.producto.precio_oferta = None
+        self.producto.save(update_fields=['precio_oferta'])
+        self.assertEqual(self.precio_final(), Decimal('100.00'))
+
+    def test_update(self):
+        productos = Producto.objects.filter(pk=self.producto.pk)
+        productos.update(precio=F('precio') * 2)
+        self.assertEqual(self.precio_final(), Decimal('80.00'))
+        # Una oferta en 0 cuenta como sin oferta; se usa el precio ya duplicado
+        productos.update(precio_oferta=0)
+        self.assertEqual(self.precio_final(), Decimal('200.00'))
+        productos.update(precio=Decimal('150.00'), precio_oferta=Decimal('120.00'))
+        self.assertEqual(self.precio_final(), Decimal('120.00'))
+
+    def test_bulk_update(self):
+        self.producto.precio_oferta = None
+        Producto.objects.bulk_update([self.producto], ['precio_oferta'])
+        self.assertEqual(self.precio_final(), Decimal('100.00'))
+
+    def test_bulk_create(self):
+        Producto.objects.bulk_create([Producto(
+            codigo='F2', nombre='Cadena', slug='cadena', descripcion='Oro', precio=Decimal('300.00'),
+            precio_oferta=Decimal('250.00'), categoria=self.categoria,
+        )])
+        self.assertEqual(self.precio_final(Producto.objects.get(codigo='F2')), Decimal('250.00'))
+
+        # Como upsert: el conflicto por código actualiza el precio y también precio_final
+        Producto.objects.bulk_create(
+            [Producto(codigo='F2', nombre='Cadena', slug='cadena-2', descripcion='Oro', precio=Decimal('310.00'),
+                      categoria=self.categoria)],
+            update_conflicts=True, unique_fields=['codigo'], update_fields=['precio', 'precio_oferta'],
+        )
+        self.assertEqual(self.precio_final(Producto.objects.get(codigo='F2')), Decimal('310.00'))
+
+
+class PreciosMasivosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        anillos = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        cadenas = Categoria.objects.create(nombre='Cadenas', slug='cadenas')
+        for codigo, nombre, oferta, categoria in [('M1', 'Anillo plata', None, anillos),
+                                                  ('M2', 'Anillo oro', Decimal('90.00'), anillos),
+                                                  ('M3', 'Cadena plata', Decimal('70.00'), cadenas)]:
+            Producto.objects.create(
+                codigo=codigo, nombre=nombre, descripcion='Pieza', precio=Decimal('100.00'),
+                precio_oferta=oferta, categoria=categoria,
+            )
+
+    def precios(self):
+        return dict(Producto.objects.values_list('codigo', 'precio_final'))
+
+    def test_descuento_y_quitar_ofertas(self):
+        self.assertEqual(aplicar_descuento(Producto.objects.filter(codigo__in=['M1', 'M2']), 15), {'actualizados': 2})
+        self.assertEqual(self.precios(), {'M1': Decimal('85.00'), 'M2': Decimal('85.00'), 'M3': Decimal('70.00')})
+        with self.assertRaises(ValueError):
+            aplicar_descuento(Producto.objects.all(), 100)
+
+        # Porcentajes con decimales, como los acepta el formulario
+        Producto.objects.filter(codigo='M1').update(precio=Decimal('100000.00'))
+        aplicar_descuento(Producto.objects.filter(codigo='M1'), Decimal('12.5'))
+        aplicar_descuento(Producto.objects.filter(codigo='M2'), Decimal('33.33'))
+        self.assertEqual(self.precios(), {'M1': Decimal('87500.00'), 'M2': Decimal('66.67'), 'M3': Decimal('70.00')})
+
+        # Solo cuenta los que tenían oferta
+        self.assertEqual(quitar_ofertas(Producto.objects.filter(codigo__in=['M2', 'M3'])), {'actualizados': 2})
+        self.assertEqual(quitar_ofertas(Producto.objects.all()), {'actualizados': 1})
+        self.assertEqual(self.precios(), {'M1': Decimal('100000.00'), 'M2': Decimal('100.00'), 'M3': Decimal('100.00')})
+
+    def test_respeta_la_busqueda_del_inventario(self):
+        self.client.force_login(get_user_model().objects.create_user(username='admin', password='x'))
+        url = reverse('productos:preciosmasivos') + '?q=anillo'
+
+        self.client.post(url, {'operacion': 'descuento', 'porcentaje': '50'})
+        self.assertEqual(self.precios(), {'M1': Decimal('50.00'), 'M2': Decimal('50.00'), 'M3': Decimal('70.00')})
+        self.client.post(url, {'operacion': 'quitar_ofertas'})
+        self.assertEqual(self.precios(), {'M1': Decimal('100.00'), 'M2': Decimal('100.00'), 'M3': Decimal('70.00')})
+
+
+class ImportacionTests(TestCase):
+
+    def test_exportar_e_importar_con_filas_invalidas(self):
+        categoria = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        milimetros = UnidadMedida.objects.create(nombre='Milímetros', simbolo='mm')
+        for codigo, oferta in [('I1', Decimal('90.00')), ('I2', None)]:
+            Producto.objects.create(
+                codigo=codigo, nombre=f'Anillo {codigo}', descripcion='Plata, "925"', precio=Decimal('100.00'),
+                precio_oferta=oferta, tamano=Decimal('2.500'), unidad_tamano=milimetros, categoria=categoria,
+                stock=3, activo=codigo == 'I1',
+            )
+        exportados = [fila_exportada(p) for p in Producto.objects.order_by('codigo')]
+
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        ruta = os.path.join(carpeta.name, 'productos.csv')
+        call_command('exportar_productos', ruta, stdout=StringIO())
+        with open(ruta, 'a', encoding='utf-8', newline='') as archivo:
+            escritor = csv.DictWriter(archivo, fieldnames=COLUMNAS)
+            escritor.writerow({'codigo': 'I3', 'nombre': 'Nuevo', 'descripcion': 'x', 'precio': 'abc', 'categoria': 'Anillos'})
+            escritor.writerow({'codigo': 'I4', 'nombre': 'Nuevo', 'descripcion': 'x', 'precio': '5', 'categoria': 'Aros'})
+            escritor.writerow({'codigo': 'I1', 'nombre': 'Repetido', 'descripcion': 'x', 'precio': '5', 'categoria': 'Anillos'})
+
+        Producto.objects.filter(codigo='I1').update(precio=Decimal('1.00'), stock=0)
+        Producto.objects.filter(codigo='I2').delete()
+        call_command('importar_productos', ruta, stdout=StringIO())
+
+        # Las filas válidas dejan el catálogo como se exportó; las otras quedan en el archivo de errores
+        self.assertEqual([fila_exportada(p) for p in Producto.objects.order_by('codigo')], exportados)
+        with open(f'{ruta}.errores.csv', encoding='utf-8') as archivo:
+            errores = list(csv.DictReader(archivo))
+        self.assertEqual([(e['linea'], e['codigo']) for e in errores], [('4', 'I3'), ('5', 'I4'), ('6', 'I1')])
+        self.assertIn('precio', errores[0]['error'])
+
+    def test_reintento_fila_por_fila_no_cuenta_dos_veces(self):
+        categoria = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        igual = Producto.objects.create(
+            codigo='R1', nombre='Anillo', descripcion='Plata', precio=Decimal('100.00'), categoria=categoria,
+        )
+        nueva = {'codigo': 'R2', 'nombre': 'Nuevo', 'descripcion': 'x', 'precio': '5', 'categoria': 'Anillos'}
+
+        def indexar(productos):
+            # Un error de base de datos con la fila nueva: el bloque se reintenta fila por fila
+            if any(p.codigo == 'R2' for p in productos):
+                raise IntegrityError('fila nueva rechazada')
+
+        importador = Importador()
+        with mock.patch('productos.importacion.indexar_productos', side_effect=indexar):
+            importador.importar_bloque([(2, fila_exportada(igual)), (3, nueva)])
+        self.assertEqual((importador.creados, importador.actualizados, importador.sin_cambios, importador.errores), (0, 0, 1, 1))
+        self.assertFalse(Producto.objects.filter(codigo='R2').exists())
+
+
+class BusquedaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        collares = Categoria.objects.create(nombre='Collares', slug='collares')
+        for codigo, nombre in [('C1', 'Collar de perlas'), ('C2', 'Colgante corazón'), ('C3', 'Anillos de plata')]:
+            Producto.objects.create(
+                codigo=codigo, nombre=nombre, descripcion='Pieza única', precio=Decimal(100), categoria=collares,
+            )
+
+    def codigos(self, consulta):
+        return sorted(buscar(Producto.objects.exclude(nombre__startswith='Anillo'), consulta).values_list('codigo', flat=True))
+
+    def test_tokenizar(self):
+        self.assertEqual(tokenizar('Collares de Plata'), ['collar', 'plata'])
+        self.assertEqual(tokenizar('Corazón 925'), ['corazon', '925'])
+
+    def test_prefijos_de_un_plural(self):
+        # 'Collares' (la categoría) se indexa como 'collar': escribir 'collare' no lo pierde
+        self.assertEqual(self.codigos('col'), ['C1', 'C2'])
+        self.assertEqual(self.codigos('collare'), ['C1', 'C2'])
+        self.assertEqual(self.codigos('collares perla'), ['C1'])
+        self.assertEqual(self.codigos('corazones'), ['C2'])
+
+    def test_busca_el_plural_y_el_singular(self):
+        self.assertEqual(list(buscar(Producto.objects.all(), 'anillo').values_list('codigo', flat=True)), ['C3'])
+
+
+class CachePaginaAnonimaTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.calculos = 0
+
+        @cache_pagina_anonima
+        def pagina(request):
+            self.calculos += 1
+            return HttpResponse(f'calculo {self.calculos}')
+
+        self.pagina = pagina
+
+    def peticion(self, usuario=None):
+        request = RequestFactory().get('/pagina/', {'b': '2', 'a': '1'})
+        request.user = usuario or AnonymousUser()
+        return request
+
+    def test_la_segunda_visita_anonima_es_un_hit(self):
+        self.assertEqual(self.pagina(self.peticion())['X-Cache'], 'MISS')
+        respuesta = self.pagina(self.peticion())
+        self.assertEqual((respuesta['X-Cache'], respuesta.content, self.calculos), ('HIT', b'calculo 1', 1))
+
+    def test_sesion_y_mensajes_no_usan_la_cache(self):
+        self.pagina(self.peticion())
+        usuario = mock.Mock(is_authenticated=True)
+        self.assertNotIn('X-Cache', self.pagina(self.peticion(usuario)))
+
+        con_mensaje = self.peticion()
+        con_mensaje.session = {}
+        con_mensaje._messages = FallbackStorage(con_mensaje)
+        con_mensaje._messages.add(messages.INFO, 'Cerraste sesión')
+        self.assertNotIn('X-Cache', self.pagina(con_mensaje))
+        self.assertEqual(self.calculos, 3)
+
+    def test_con_el_candado_tomado_no_se_recalcula(self):
+        self.pagina(self.peticion())
+        invalidar_catalogo()
+        # Otra petición está recalculando: las demás reciben la copia vieja
+        candado = f"{clave_pagina(self.peticion(), 'pagina')}:candado"
+        cache.add(candado, 1)
+        respuesta = self.pagina(self.peticion())
+        self.assertEqual((respuesta['X-Cache'], respuesta.content, self.calculos), ('STALE', b'calculo 1', 1))
+
+        # Sin copia vieja se espera un momento y, si nadie la guardó, se calcula sin guardar
+        cache.delete(clave_pagina(self.peticion(), 'pagina'))
+        with mock.patch('productos.cache.ESPERA_MAXIMA', 0.1):
+            self.assertNotIn('X-Cache', self.pagina(self.peticion()))
+        self.assertEqual(self.calculos, 2)
+
+        cache.delete(candado)
+        self.assertEqual(self.pagina(self.peticion())['X-Cache'], 'MISS')
+        self.assertEqual(self.pagina(self.peticion())['X-Cache'], 'HIT')
+
+
+class RespuestaCondicionalTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        categoria = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        self.producto = Producto.objects.create(
+            codigo='R1', nombre='Anillo', descripcion='Plata', precio=Decimal(100), categoria=categoria,
+        )
+        # Last-Modified tiene resolución de segundos: la edición debe quedar después
+        Producto.objects.update(fecha_actualizacion=timezone.now() - timedelta(hours=1))
+        invalidar_catalogo()
+
+    def test_304_hasta_que_se_edita_el_producto(self):
+        urls = [reverse('productos:catalogo'), reverse('productos:productodetalle', args=[self.producto.pk])]
+        anteriores = {url: self.client.get(url) for url in urls}
+
+        def estados():
+            return [
+                self.client.get(url, **{cabecera: anteriores[url][campo]}).status_code
+                for url in urls
+                for cabecera, campo in [('HTTP_IF_NONE_MATCH', 'ETag'), ('HTTP_IF_MODIFIED_SINCE', 'Last-Modified')]
+            ]
+
+        self.assertEqual(estados(), [304] * 4)
+        self.producto.precio = Decimal(90)
+        self.producto.save()
+        self.assertEqual(estados(), [200] * 4)
+
+
+class ApiCatalogoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        anillos = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        for i in range(3):
+            Producto.objects.create(
+                codigo=f'A{i}', nombre=f'Anillo {i}', descripcion='Pieza de plata 925',
+                precio=Decimal('1500.00'), precio_oferta=Decimal('1200.50') if i else None, categoria=anillos,
+            )
+
+    def test_solo_carga_los_campos_pedidos(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('productos:apiproductos'), {'fields': 'codigo,precio_final', 'limite': 2})
+        datos = json.loads(respuesta.content)
+
+        self.assertEqual(datos['resultados'][0], {'codigo': 'A2', 'precio_final': '1200.5'})
+        self.assertIsNotNone(datos['siguiente'])
+        self.assertFalse([c for c in consultas.captured_queries if 'descripcion' in c['sql']])
+
+    def test_etag_distinto_del_html(self):
+        producto = Producto.objects.get(codigo='A1')
+        html = self.client.get(reverse('productos:productodetalle', args=[producto.id]))['ETag']
+        api = self.client.get(reverse('productos:apiproductodetalle', args=[producto.id]))
+        parcial = self.client.get(reverse('productos:apiproductodetalle', args=[producto.id]), {'fields': 'nombre'})
+        self.assertEqual(len({html, api['ETag'], parcial['ETag']}), 3)
+
+        revalidada = self.client.get(
+            reverse('productos:apiproductodetalle', args=[producto.id]), HTTP_IF_NONE_MATCH=api['ETag'],
+        )
+        self.assertEqual(revalidada.status_code, 304)
+
+    def test_campo_desconocido(self):
+        respuesta = self.client.get(reverse('productos:apiproductos'), {'fields': 'codigo,costo'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class DetalleProductoTests(TestCase):
+
+    def test_el_stock_no_queda_cacheado(self):
+        categoria = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        producto = Producto.objects.create(
+            codigo='D1', nombre='Anillo', descripcion='Plata 925', precio=Decimal(100), categoria=categoria, stock=5,
+        )
+        self.assertEqual(detalle_producto(producto.id).stock, 5)
+
+        # Un UPDATE de stock (como el de las reservas) no pasa por las señales
+        Producto.objects.filter(pk=producto.pk).update(stock=F('stock') - 5)
+        self.assertEqual(detalle_producto(producto.id).stock, 0)
+
+
+class VariantesImagenTests(TestCase):
+
+    def test_originales_con_el_mismo_nombre_no_chocan(self):
+        jpg = _ruta_variante('productos/a.jpg', 'card', 'webp')
+        png = _ruta_variante('productos/a.png', 'card', 'webp')
+        self.assertEqual(jpg, 'productos/variantes/a-jpg-card.webp')
+        self.assertNotEqual(jpg, png)
+
+    def test_limpiar_media_conserva_los_derivados_generados(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=carpeta.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        categoria = Categoria.objects.create(nombre='Anillos', slug='anillos')
+        productos = []
+        for codigo, formato in [('V1', 'PNG'), ('V2', 'JPEG')]:
+            contenido = BytesIO()
+            Image.new('RGB', (40, 30), 'gold').save(contenido, format=formato)
+            producto = Producto(codigo=codigo, nombre=f'Anillo {codigo}', descripcion='Plata', precio=100, categoria=categoria)
+            # El mismo nombre de archivo con distinta extensión
+            producto.imagen.save(f'a.{formato.lower()}', ContentFile(contenido.getvalue()))
+            procesar_imagen(producto)
+            productos.append(producto)
+        # Derivado con el nombre de antes, que ninguna fila lista
+        viejo = os.path.join(carpeta.name, 'productos', 'variantes', 'a-card.webp')
+        with open(viejo, 'wb') as archivo:
+            archivo.write(b'x')
+
+        generados = [
+            os.path.join(carpeta.name, ruta)
+            for producto in productos
+            for datos in producto.imagen_variantes['variantes'].values()
+            for ruta in (datos.get('webp'), datos.get('avif')) if ruta
+        ]
+        self.assertEqual(len(set(generados)), len(generados))
+        hace_dos_horas = time.time() - 7200
+        for ruta in [*generados, viejo]:
+            os.utime(ruta, (hace_dos_horas, hace_dos_horas))
+
+        call_command('limpiar_media', stdout=StringIO())
+        self.assertTrue(all(os.path.isfile(ruta) for ruta in generados))
+        self.assertFalse(os.path.exists(viejo))
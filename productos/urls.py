@@ -42,9 +42,15 @@ urlpatterns = [
     path('productos/edit/<int:id>/', views.productosEdit, name='productosedit'),
     path('productos/update/<int:id>/', views.productosUpdate, name='productosupdate'),
     path('productos/delete/<int:id>/', views.productosDestroy, name='productosdelete'),
+    path('productos/precios/', views.preciosMasivos, name='preciosmasivos'),
     # Catalogo de productos
     path('productos/catalogo/', views.catalogo, name='catalogo'),
+    path('productos/catalogo/mas/', views.catalogoMas, name='catalogomas'),
     path('productos/detalle/<int:id>/', views.productoDetalle, name='productodetalle'),
+    # API JSON de solo lectura
+    path('api/productos/', views.apiProductos, name='apiproductos'),
+    path('api/productos/<int:id>/', views.apiProductoDetalle, name='apiproductodetalle'),
+    path('api/categorias/', views.apiCategorias, name='apicategorias'),
 ]
 
 # Solo para servir archivos multimedia durante el desarrollo
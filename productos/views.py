@@ -1,10 +1,25 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib import messages
 from productos.models import UnidadMedida, Categoria, Producto
-from productos.forms import UnidadMedidaForm, CategoriaForm, ProductoForm, ProductoImagenFormSet
+from productos.forms import UnidadMedidaForm, CategoriaForm, ProductoForm, ProductoImagenFormSet, PreciosMasivosForm
 from django.db import IntegrityError
 from django.db.models import Q 
 from django.core.paginator import Paginator 
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from productos.catalogo import filtrar_catalogo, filtrar_inventario, paginar_keyset, orden_catalogo, PRODUCTOS_POR_PAGINA
+from productos.facetas import calcular_facetas, opciones_sidebar
+from productos.tarjetas import renderizar_tarjetas
+from productos.detalle import detalle_producto
+from productos.cache import cache_pagina_anonima
+from productos.condicional import (
+    respuesta_condicional, validadores_api, validadores_catalogo, validadores_categorias, validadores_detalle,
+)
+from productos.api import CAMPOS_DETALLE, CAMPOS_LISTADO, CampoInvalido, categorias_api, leer_campos, leer_limite, producto_api, seleccionar, serializar
+from core.replicas import usar_replica
+from productos.precios import aplicar_descuento, quitar_ofertas, cargar_lista_precios, leer_lista_precios
+import io
 # Importamos el decorador para restringir el acceso
 from django.contrib.auth.decorators import login_required
 
@@ -143,28 +158,12 @@ def productosNew(request):
 
 @login_required
 def productosShow(request):
-    # 1. Obtener todos los productos base
-    productos_list = Producto.objects.all().order_by('-fecha_creacion')
+    # 1-3. Productos filtrados por búsqueda, categoría y oferta (ver productos/catalogo.py)
+    productos_list, filtros = filtrar_inventario(request.GET)
     categorias = Categoria.objects.all()
-
-    # 2. Capturar parámetros del formulario GET
-    query = request.GET.get('q')
-    categoria_id = request.GET.get('categoria')
-    oferta = request.GET.get('oferta')
-
-    # 3. Aplicar filtros si existen
-    if query:
-        productos_list = productos_list.filter(
-            Q(nombre__icontains=query) | Q(codigo__icontains=query)
-        )
-    
-    if categoria_id:
-        productos_list = productos_list.filter(categoria_id=categoria_id)
-
-    if oferta == 'si':
-        productos_list = productos_list.filter(precio_oferta__isnull=False)
-    elif oferta == 'no':
-        productos_list = productos_list.filter(precio_oferta__isnull=True)
+    query = filtros['q']
+    categoria_id = filtros['categoria_id']
+    oferta = filtros['oferta']
 
     # 4. Configurar Paginación (ejemplo: 10 productos por página)
     paginator = Paginator(productos_list, 10)
@@ -220,52 +219,150 @@ def productosDestroy(request, id):
     messages.success(request, "Producto eliminado.")
     return redirect('productos:productosshow')
 
+@login_required
+def preciosMasivos(request):
+    # Descuentos y ofertas se aplican a los productos filtrados en el inventario
+    # (los filtros viajan en el querystring); la lista de precios va por código
+    productos, filtros = filtrar_inventario(request.GET)
+    if request.method == "POST":
+        form = PreciosMasivosForm(request.POST, request.FILES)
+        if form.is_valid():
+            operacion = form.cleaned_data['operacion']
+            if operacion == 'descuento':
+                resumen = aplicar_descuento(productos, form.cleaned_data['porcentaje'])
+                messages.success(request, f"Descuento aplicado a {resumen['actualizados']} productos.")
+            elif operacion == 'quitar_ofertas':
+                resumen = quitar_ofertas(productos)
+                messages.success(request, f"Se quitó la oferta de {resumen['actualizados']} productos.")
+            else:
+                archivo = io.TextIOWrapper(form.cleaned_data['archivo'].file, encoding='utf-8-sig')
+                filas, errores = leer_lista_precios(archivo)
+                if errores:
+                    messages.error(request, "La lista tiene errores y no se aplicó: " + "; ".join(errores[:10]))
+                    return redirect(request.get_full_path())
+                resumen = cargar_lista_precios(filas)
+                messages.success(request, f"Lista aplicada: {resumen['actualizados']} productos actualizados.")
+                if resumen['no_encontrados']:
+                    messages.warning(request, "Códigos no encontrados: " + ", ".join(resumen['no_encontrados'][:20]))
+            return redirect(f"{reverse('productos:productosshow')}?{request.GET.urlencode()}")
+    else:
+        form = PreciosMasivosForm()
+
+    return render(request, 'productos/preciosMasivos.html', {
+        'form': form,
+        'total': productos.count(),
+        'filtros': filtros,
+        'querystring': request.GET.urlencode(),
+    })
+
 
 #  *************************************************************
 #         VISTAS PÚBLICAS (CATÁLOGO Y DETALLE)
 #  *************************************************************
 
+@usar_replica
+@respuesta_condicional(validadores_catalogo)
+@cache_pagina_anonima
 def catalogo(request):
-    # Optimizamos la consulta
-    productos = Producto.objects.select_related('categoria').filter(activo=True).order_by('-fecha_creacion')
-    categorias = Categoria.objects.all()
+    productos, filtros = filtrar_catalogo(request.GET)
+    # Conteos del sidebar en una sola consulta agregada (cacheada por filtros)
+    facetas = opciones_sidebar(request.GET, filtros, calcular_facetas(filtros))
 
-    # Captura de filtros desde el GET
-    query = request.GET.get('q')
-    min_p = request.GET.get('min_p')
-    max_p = request.GET.get('max_p')
-    categoria_slug = request.GET.get('categoria')
-
-    if query:
-        productos = productos.filter(nombre__icontains=query)
-    
-    if categoria_slug:
-        productos = productos.filter(categoria__slug=categoria_slug)
-
-    if min_p:
-        productos = productos.filter(precio__gte=min_p)
-        
-    if max_p:
-        productos = productos.filter(precio__lte=max_p)
+    # Paginación por cursor: solo se consulta la página pedida, sin COUNT total
+    productos, siguiente = paginar_keyset(productos, orden_catalogo(filtros), request.GET.get('cursor'))
 
     return render(request, 'productos/catalogo.html', {
         'productos': productos,
-        'categorias': categorias,
-        'query': query,
-        'min_p': min_p,
-        'max_p': max_p
+        'tarjetas': renderizar_tarjetas(productos, request),
+        'facetas': facetas,
+        'query': filtros['q'],
+        'min_p': filtros['min_p'],
+        'max_p': filtros['max_p'],
+        'orden': filtros['orden'],
+        'siguiente_qs': _querystring_siguiente(request, siguiente),
     })
 
-def productoDetalle(request, id):
-    producto = get_object_or_404(Producto, id=id, activo=True)
-    
-    # Calculamos el porcentaje de ahorro
-    ahorro_porcentaje = 0
-    if producto.precio_oferta and producto.precio > 0:
-        descuento = producto.precio - producto.precio_oferta
-        ahorro_porcentaje = (descuento / producto.precio) * 100
+@usar_replica
+def catalogoMas(request):
+    """Endpoint de scroll infinito: retorna el HTML de la siguiente página de tarjetas."""
+    productos, filtros = filtrar_catalogo(request.GET)
+    productos, siguiente = paginar_keyset(productos, orden_catalogo(filtros), request.GET.get('cursor'))
 
+    html = render_to_string('productos/_tarjetas_producto.html', {
+        'tarjetas': renderizar_tarjetas(productos, request),
+    })
+    return JsonResponse({
+        'html': html,
+        'cantidad': len(productos),
+        'siguiente': _querystring_siguiente(request, siguiente),
+    })
+
+def _querystring_siguiente(request, cursor):
+    """Conserva los filtros actuales y reemplaza el cursor por el de la siguiente página."""
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return params.urlencode()
+
+@usar_replica
+@respuesta_condicional(validadores_detalle)
+@cache_pagina_anonima
+def productoDetalle(request, id):
+    # Vista ya resuelta y cacheada (ver productos/detalle.py)
+    producto = detalle_producto(id)
     return render(request, 'productos/productoDetalle.html', {
         'producto': producto,
-        'ahorro_porcentaje': ahorro_porcentaje
-    })
\ No newline at end of file
+        'ahorro_porcentaje': producto.ahorro_porcentaje,
+    })
+
+
+#  *************************************************************
+#         API JSON DE SOLO LECTURA (ver productos/api.py)
+#  *************************************************************
+
+def _respuesta_api(datos, status=200):
+    # Salida compacta: sin espacios y con los acentos tal cual
+    return JsonResponse(datos, status=status, json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+@usar_replica
+@respuesta_condicional(validadores_api(validadores_catalogo, CAMPOS_LISTADO))
+@cache_pagina_anonima
+def apiProductos(request):
+    """Listado con los mismos filtros que el catálogo, paginado por cursor (?cursor=)."""
+    try:
+        campos = leer_campos(request.GET.get('fields'), CAMPOS_LISTADO)
+    except CampoInvalido as error:
+        return _respuesta_api({'error': str(error)}, status=400)
+
+    productos, filtros = filtrar_catalogo(request.GET)
+    orden = orden_catalogo(filtros)
+    productos, siguiente = paginar_keyset(
+        seleccionar(productos, campos, orden), orden, request.GET.get('cursor'),
+        tamano=leer_limite(request.GET.get('limite'), PRODUCTOS_POR_PAGINA),
+    )
+    siguiente_qs = _querystring_siguiente(request, siguiente)
+    return _respuesta_api({
+        'resultados': [serializar(producto, campos) for producto in productos],
+        'siguiente': f'{request.path}?{siguiente_qs}' if siguiente_qs else None,
+    })
+
+@usar_replica
+@respuesta_condicional(validadores_api(validadores_detalle, CAMPOS_DETALLE))
+@cache_pagina_anonima
+def apiProductoDetalle(request, id):
+    try:
+        campos = leer_campos(request.GET.get('fields'), CAMPOS_DETALLE)
+    except CampoInvalido as error:
+        return _respuesta_api({'error': str(error)}, status=400)
+
+    producto = producto_api(id, campos)
+    if producto is None:
+        return _respuesta_api({'error': 'Producto no encontrado'}, status=404)
+    return _respuesta_api(serializar(producto, campos))
+
+@usar_replica
+@respuesta_condicional(validadores_categorias)
+@cache_pagina_anonima
+def apiCategorias(request):
+    return _respuesta_api({'resultados': categorias_api()})